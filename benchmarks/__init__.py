@@ -0,0 +1 @@
+"""Microbenchmarks for the identity hot paths, see `python -m benchmarks --help`."""
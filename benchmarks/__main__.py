@@ -0,0 +1,70 @@
+"""
+Run the benchmark suite offline against the test settings.
+
+    python -m benchmarks --output results.json
+    python -m benchmarks --baseline results.json --threshold 0.1
+
+Exits with status 1 when any benchmark is slower than the baseline by more than the threshold.
+"""
+
+import argparse
+import os
+import sys
+
+import django
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__.splitlines()[1])
+    parser.add_argument("names", nargs="*", help="Benchmarks to run, e.g. claims or import:cdt_identity.urls, default all")
+    parser.add_argument("--output", help="Path to save the results as JSON")
+    parser.add_argument("--baseline", help="Path to saved results to compare against")
+    parser.add_argument(
+        "--threshold", type=float, default=0.1, help="Allowed slowdown against the baseline, as a fraction (default 0.1)"
+    )
+    parser.add_argument("--rounds", type=int, default=5, help="Timed rounds per benchmark, the best is reported")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum seconds per timed round")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tests.settings")
+    django.setup()
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    from . import runner
+    from .cases import BENCHMARKS
+    from .imports import MODULES, measure_import
+
+    imports = [f"import:{module}" for module in MODULES]
+    names = args.names or list(BENCHMARKS) + imports
+    unknown = set(names) - set(BENCHMARKS) - set(imports)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+
+    results = []
+    for name in names:
+        if name.startswith("import:"):
+            results.append(measure_import(name.removeprefix("import:"), rounds=args.rounds))
+        else:
+            results.append(runner.measure(name, BENCHMARKS[name](), rounds=args.rounds, min_time=args.min_time))
+    print(runner.report(results))
+
+    if args.output:
+        runner.save(results, args.output)
+
+    if args.baseline:
+        regressions = runner.compare(results, runner.load(args.baseline), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
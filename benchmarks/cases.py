@@ -0,0 +1,128 @@
+"""
+The identity hot paths under benchmark. Requires a configured Django with a test database.
+"""
+
+from urllib.parse import urlsplit
+
+import requests
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.test import Client, RequestFactory
+from django.urls import reverse
+
+from cdt_identity import redirects
+from cdt_identity.claims import Claims, ClaimSchema
+from cdt_identity.client import create_client, oauth
+from cdt_identity.models import ClientConfig
+from cdt_identity.routes import Routes
+from cdt_identity.session import Session
+from cdt_identity.stub import StubGateway
+from cdt_identity.transport import transport
+
+EXPECTED_CLAIMS = "eligible:boolean age code:error-code name:value"
+USERINFO = {"eligible": "true", "age": "1", "code": "0", "name": "Jane Doe", "email": "jane@example.com"}
+
+
+def _request():
+    request = RequestFactory().get("/some/arbitrary/path")
+    SessionMiddleware(lambda r: r).process_request(request)
+    return request
+
+
+def _config() -> ClientConfig:
+    config, _ = ClientConfig.objects.update_or_create(
+        client_name="benchmark",
+        defaults={"client_id": "benchmark", "authority": "https://identity-gateway.test", "scheme": "benchmark"},
+    )
+    return config
+
+
+def claims():
+    schema = ClaimSchema.from_string(EXPECTED_CLAIMS)
+
+    def run():
+        Claims(USERINFO, schema)
+
+    return run
+
+
+def session():
+    config = _config()
+    request = _request()
+    Session(request, authorize_fail="/fail", authorize_sucess="/success", scopes="profile", scheme="benchmark")
+    Session(request).oidc_config = config
+
+    def run():
+        session = Session(request)
+        session.oidc_config
+        session.oidc_scopes
+        session.oidc_expected_claims
+        session.oidc_token = "token"
+        session.has_oidc_token()
+        session.clear_oidc_token()
+
+    return run
+
+
+def redirect_uri():
+    request = _request()
+
+    def run():
+        redirects.redirect_uri(request, Routes.route_authorize)
+
+    return run
+
+
+def client_lookup():
+    config = _config()
+
+    def run():
+        create_client(oauth, config, "profile", "benchmark")
+
+    return run
+
+
+def _client() -> Client:
+    client = Client()
+    session = client.session
+    request = _request()
+    request.session = session
+    oidc = Session(request, authorize_fail="/fail", authorize_sucess="/success", scheme="benchmark")
+    oidc.oidc_config = _config()
+    oidc.oidc_expected_claims = EXPECTED_CLAIMS
+    oidc.oidc_eligibility_claims = "eligible"
+    session.save()
+    client.cookies["sessionid"] = session.session_key
+    return client
+
+
+def view_round_trip():
+    """Log in, authorize with the stub Identity Gateway and log out, through the full request/response cycle."""
+    gateway = StubGateway(claims=USERINFO)
+    # every OAuth client, and the metadata and JWKS caches, send their requests through the shared adapter
+    transport.close()
+    transport._adapter = gateway.adapter()
+    browser = requests.Session()
+    browser.mount(gateway.authority, gateway.adapter())
+
+    client = _client()
+    login, logout = reverse(Routes.route_login), reverse(Routes.route_logout)
+
+    def run():
+        response = client.get(login)
+        # the gateway authenticates immediately and redirects back to the authorize view
+        response = browser.get(response["Location"], allow_redirects=False)
+        callback = urlsplit(response.headers["Location"])
+        response = client.get(f"{callback.path}?{callback.query}")
+        assert response["Location"] == "/success", response
+        client.get(logout)
+
+    return run
+
+
+BENCHMARKS = {
+    "claims": claims,
+    "session": session,
+    "redirect_uri": redirect_uri,
+    "client_lookup": client_lookup,
+    "view_round_trip": view_round_trip,
+}
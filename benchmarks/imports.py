@@ -0,0 +1,43 @@
+"""
+Import-time benchmarks, each measured in a fresh interpreter after Django has been set up.
+"""
+
+import json
+import statistics
+import subprocess
+import sys
+
+from .runner import Result
+
+# Authlib is listed to show the cost deferred until the first OAuth client is created
+MODULES = ["cdt_identity.urls", "cdt_identity.views", "cdt_identity.client", "authlib.integrations.django_client"]
+
+# prints the seconds taken to import sys.argv[1], or with a second argument, the memory allocated by the import
+_SCRIPT = """
+import importlib, json, os, sys, time, tracemalloc
+import django
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tests.settings")
+django.setup()
+trace = len(sys.argv) > 2
+if trace:
+    tracemalloc.start()
+start = time.perf_counter()
+importlib.import_module(sys.argv[1])
+result = {"seconds": time.perf_counter() - start}
+if trace:
+    result["bytes"] = tracemalloc.get_traced_memory()[0]
+    result["blocks"] = len(tracemalloc.take_snapshot().traces)
+print(json.dumps(result))
+"""
+
+
+def _run(*args: str) -> dict:
+    result = subprocess.run([sys.executable, "-c", _SCRIPT, *args], capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+
+def measure_import(module: str, rounds: int = 5) -> Result:
+    """Benchmark importing module, reporting the median time of several fresh interpreters."""
+    seconds = statistics.median(_run(module)["seconds"] for _ in range(rounds))
+    allocations = _run(module, "trace")
+    return Result(f"import:{module}", 1 / seconds, allocations["bytes"], allocations["blocks"], rounds, iterations=1)
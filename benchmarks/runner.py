@@ -0,0 +1,99 @@
+"""
+Timing, allocation tracking and baseline comparison for the benchmark suite.
+"""
+
+import json
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from typing import Callable
+
+
+@dataclass
+class Result:
+    name: str
+    ops_per_sec: float
+    # bytes allocated (peak traced memory) and memory blocks still held after a single call
+    alloc_bytes: int
+    alloc_blocks: int
+    rounds: int
+    iterations: int
+
+
+def _time(fn: Callable, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return time.perf_counter() - start
+
+
+def _calibrate(fn: Callable, min_time: float) -> int:
+    """The number of iterations of fn that take at least min_time seconds."""
+    iterations = 1
+    while True:
+        if _time(fn, iterations) >= min_time:
+            return iterations
+        iterations *= 2
+
+
+def _allocations(fn: Callable) -> tuple[int, int]:
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+    return max(peak - baseline, 0), max(blocks, 0)
+
+
+def measure(name: str, fn: Callable, rounds: int = 5, min_time: float = 0.2) -> Result:
+    """Benchmark fn, reporting the best of several rounds of at least min_time seconds each."""
+    # warm up caches and lazy imports before timing anything
+    fn()
+    iterations = _calibrate(fn, min_time)
+    best = min(_time(fn, iterations) for _ in range(rounds))
+    alloc_bytes, alloc_blocks = _allocations(fn)
+    return Result(name, iterations / best, alloc_bytes, alloc_blocks, rounds, iterations)
+
+
+def save(results: list[Result], path: str) -> None:
+    with open(path, "w") as f:
+        json.dump({"results": [asdict(result) for result in results]}, f, indent=2)
+        f.write("\n")
+
+
+def load(path: str) -> list[Result]:
+    with open(path) as f:
+        return [Result(**result) for result in json.load(f)["results"]]
+
+
+def compare(results: list[Result], baseline: list[Result], threshold: float = 0.1) -> list[str]:
+    """Return a message for each result slower than its baseline by more than threshold (a fraction, e.g. 0.1 = 10%)."""
+    baseline = {result.name: result for result in baseline}
+    regressions = []
+    for result in results:
+        base = baseline.get(result.name)
+        if base is None:
+            continue
+        change = result.ops_per_sec / base.ops_per_sec - 1
+        if change < -threshold:
+            regressions.append(
+                f"{result.name}: {result.ops_per_sec:,.0f} ops/sec is {-change:.1%} slower than "
+                f"the baseline {base.ops_per_sec:,.0f} ops/sec"
+            )
+    return regressions
+
+
+def report(results: list[Result]) -> str:
+    width = max(len(result.name) for result in results)
+    lines = [f"{'benchmark':<{width}}  {'ops/sec':>12}  {'alloc bytes':>12}  {'alloc blocks':>12}"]
+    for result in results:
+        lines.append(
+            f"{result.name:<{width}}  {result.ops_per_sec:>12,.0f}  {result.alloc_bytes:>12,}  {result.alloc_blocks:>12,}"
+        )
+    return "\n".join(lines)
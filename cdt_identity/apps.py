@@ -2,9 +2,31 @@
 Identity proofing and claims verification from the California Department of Techonology Identity Gateway.
 """
 
+import logging
+
 from django.apps import AppConfig
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from . import conf
+
+logger = logging.getLogger(__name__)
 
 
 class CDTIdentityAppConfig(AppConfig):
     name = "cdt_identity"
     verbose_name = "CDT Identity Gateway"
+
+    def ready(self):
+        # connect the signal receivers that keep cached ClientConfig rows up to date
+        from . import cache  # noqa: F401
+
+        if conf.get("TRANSACTION_STORE") and isinstance(caches["default"], (LocMemCache, DummyCache)):
+            # each process would have its own, so a callback handled by another process than its login would fail
+            logger.warning("CDT_IDENTITY_TRANSACTION_STORE needs a cache shared between processes, not a local-memory cache")
+
+        if conf.get("WARMUP_ON_STARTUP"):
+            from .warmup import warm_up_in_background
+
+            warm_up_in_background()
@@ -0,0 +1,147 @@
+"""
+Async OAuth clients built on Authlib's httpx integration, used by `cdt_identity.async_views`.
+
+Requires the `httpx` package, e.g. `pip install django-cdt-identity[async]`.
+"""
+
+from authlib.integrations.base_client import BaseApp, OAuthError
+from authlib.integrations.base_client.async_app import AsyncOAuth2Mixin
+from authlib.integrations.base_client.async_openid import AsyncOpenIDMixin
+from authlib.integrations.django_client.apps import DjangoAppMixin
+from authlib.integrations.httpx_client import AsyncOAuth2Client
+from django.http import HttpResponseRedirect
+from joserfc.jws import extract_compact
+from joserfc.util import to_bytes
+
+from cdt_identity import hedging, metrics, resilience, tracing
+from cdt_identity.client import _jwks_uri
+from cdt_identity.jwks import key_sets
+from cdt_identity.metadata import metadata_store
+from cdt_identity.oauth_app import _fresh_metadata, _parse_id_token
+from cdt_identity.transport import transport
+
+
+class AsyncOAuth2App(DjangoAppMixin, AsyncOAuth2Mixin, AsyncOpenIDMixin, BaseApp):
+    """An async OAuth client for Django, reading from the same metadata and key set caches as `client.OAuth2App`.
+
+    Authorization state is kept by the framework integration, using its async methods if it has them, e.g.
+    `cdt_identity.transactions.CacheTransactionStore`; otherwise in `request.session`, which must already be loaded,
+    e.g. by `Session.aoidc_config()`.
+    """
+
+    client_cls = AsyncOAuth2Client
+
+    def __init__(self, *args, authority: str = None, authorities: list[str] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.authority = authority
+        self.authorities = authorities or ([authority] if authority else [])
+
+    def _get_session(self):
+        session = self.client_cls(
+            transport=transport.async_transport(),
+            timeout=transport.async_timeout(),
+            event_hooks=transport.async_event_hooks(),
+            **self.client_kwargs,
+        )
+        session.headers["User-Agent"] = self._user_agent
+        return session
+
+    def _get_oauth_client(self, **metadata):
+        return super()._get_oauth_client(
+            transport=transport.async_transport(),
+            timeout=transport.async_timeout(),
+            event_hooks=transport.async_event_hooks(),
+            **metadata,
+        )
+
+    async def load_server_metadata(self):
+        with metrics.phase("metadata"), tracing.span("metadata", {tracing.AUTHORITY: self.authority}):
+            if len(self.authorities) > 1:
+                metadata = _fresh_metadata(self.authorities) or await hedging.ahedge(self.authorities, metadata_store.aget)
+                self.server_metadata.update(metadata)
+                return self.server_metadata
+            if self.authority:
+                self.server_metadata.update(await metadata_store.aget(self.authority))
+                return self.server_metadata
+            return await super().load_server_metadata()
+
+    async def fetch_access_token(self, redirect_uri=None, **kwargs):
+        with metrics.phase("token"), tracing.span("token", {tracing.AUTHORITY: self.authority}):
+            if self.access_token_url or not self.authorities:
+                return await super().fetch_access_token(redirect_uri, **kwargs)
+            if len(self.authorities) == 1:
+                return await self._fetch_access_token_from(self.authority, redirect_uri, **kwargs)
+            # the authorization code may only be used once, so it is never sent to two authorities at once
+            return await hedging.afailover(
+                self.authorities, lambda authority: self._fetch_access_token_from(authority, redirect_uri, **kwargs)
+            )
+
+    async def _fetch_access_token_from(self, authority, redirect_uri=None, **kwargs):
+        """
+        Fetch an access token from the token endpoint of one of the authorities.
+
+        Adapted from `authlib.integrations.base_client.async_app.AsyncOAuth2Mixin.fetch_access_token`.
+        """
+        metadata = await metadata_store.aget(authority)
+        token_endpoint = metadata.get("token_endpoint")
+        async with resilience.aguard(token_endpoint), self._get_oauth_client(**metadata) as client:
+            if redirect_uri is not None:
+                client.redirect_uri = redirect_uri
+            params = dict(self.access_token_params or {}, **kwargs)
+            return await client.fetch_token(token_endpoint, **params)
+
+    async def parse_id_token(self, token, nonce, claims_options=None, claims_cls=None, leeway=120):
+        if not self.authority or "id_token" not in token:
+            return await super().parse_id_token(token, nonce, claims_options, claims_cls, leeway)
+
+        metadata = await self.load_server_metadata()
+        kid = extract_compact(to_bytes(token["id_token"])).headers().get("kid")
+        with metrics.phase("id_token"), tracing.span("id_token", {tracing.AUTHORITY: self.authority}):
+            key_set = await key_sets.aget(self.authority, _jwks_uri(metadata), kid=kid)
+            return _parse_id_token(self, token, nonce, metadata, key_set, claims_options, claims_cls, leeway)
+
+    async def authorize_redirect(self, request, redirect_uri=None, **kwargs):
+        """Create a HTTP Redirect for Authorization Endpoint."""
+        rv = await self.create_authorization_url(redirect_uri, **kwargs)
+        state = rv.pop("state", None)
+        if not state:
+            raise RuntimeError("Missing state value")
+        if hasattr(self.framework, "aset_state_data"):
+            await self.framework.aset_state_data(request.session, state, dict(rv, redirect_uri=redirect_uri))
+        else:
+            self.framework.set_state_data(request.session, state, dict(rv, redirect_uri=redirect_uri))
+        return HttpResponseRedirect(rv["url"])
+
+    async def authorize_access_token(self, request, **kwargs):
+        """Fetch access token in one step.
+
+        Adapted from `authlib.integrations.django_client.DjangoOAuth2App.authorize_access_token`.
+        """
+        data = request.GET if request.method == "GET" else request.POST
+        error = data.get("error")
+        if error:
+            raise OAuthError(error=error, description=data.get("error_description"))
+        params = {"code": data.get("code"), "state": data.get("state")}
+
+        if hasattr(self.framework, "aget_state_data"):
+            state_data = await self.framework.aget_state_data(request.session, params.get("state"))
+            await self.framework.aclear_state_data(request.session, params.get("state"))
+        else:
+            state_data = self.framework.get_state_data(request.session, params.get("state"))
+            self.framework.clear_state_data(request.session, params.get("state"))
+        params = self._format_state_params(state_data, params)
+
+        claims_options = kwargs.pop("claims_options", None)
+        claims_cls = kwargs.pop("claims_cls", None)
+        leeway = kwargs.pop("leeway", 120)
+        token = await self.fetch_access_token(**params, **kwargs)
+
+        if "id_token" in token and "nonce" in state_data:
+            token["userinfo"] = await self.parse_id_token(
+                token,
+                nonce=state_data["nonce"],
+                claims_options=claims_options,
+                claims_cls=claims_cls,
+                leeway=leeway,
+            )
+        return token
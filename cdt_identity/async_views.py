@@ -0,0 +1,140 @@
+"""
+Native async versions of the views in `cdt_identity.views`, for ASGI deployments.
+
+Enable with `CDT_IDENTITY_ASYNC_VIEWS = True`; requires the `httpx` package.
+"""
+
+import logging
+
+from django.http import HttpRequest
+
+from . import backchannel, callbacks, decisions, metrics, ratelimit, redirects, tracing
+from .async_client import AsyncOAuth2App
+from .client import create_client
+from .client import oauth as registry
+from .routes import Routes
+from .session import Session
+from .views import _fail_fast, _recalled_decision, _redirect_decision, _verify_claims, _waiting_page
+
+# called by the Identity Gateway rather than the user's browser, so the sync view is used, in a thread under ASGI
+from .views import backchannel_logout  # noqa: F401
+
+logger = logging.getLogger(__name__)
+
+
+async def _client_or_error_redirect(request: HttpRequest):
+    """Async version of `cdt_identity.views._client_or_error_redirect()`."""
+    client = None
+    session = Session(request)
+
+    with metrics.phase("client"), tracing.span("client"):
+        config = await session.aoidc_config()
+        if not config:
+            raise Exception("No oauth_config in session")
+
+        metrics.set_client_name(config.client_name)
+        scheme = session.oidc_scheme
+        scopes = session.oidc_scopes
+        tracing.set_attributes(
+            {
+                tracing.CLIENT_NAME: config.client_name,
+                tracing.AUTHORITY: config.authority,
+                tracing.SCHEME: scheme or config.scheme,
+            }
+        )
+        client = create_client(registry, config, scopes, scheme, client_cls=AsyncOAuth2App)
+    if not client:
+        raise Exception(f"oauth_client not registered: {config.client_name}")
+
+    return client
+
+
+@metrics.timed("authorize")
+@_fail_fast
+async def authorize(request: HttpRequest):
+    """View implementing OIDC token authorization."""
+    logger.debug(Routes.route_authorize)
+
+    state = request.GET.get("state")
+    if not state:
+        return await _authorize(request)
+    # repeats of this callback wait for, and redirect like, the first
+    return await callbacks.acoalesce(request, state, lambda: _authorize(request))
+
+
+async def _authorize(request: HttpRequest):
+    oauth_client = await _client_or_error_redirect(request)
+    session = Session(request)
+
+    logger.debug("Attempting to authorize OIDC access token")
+    token = await oauth_client.authorize_access_token(request)
+
+    if token is None:
+        logger.warning("Could not authorize OIDC access token")
+        raise Exception("authorize_access_token returned None")
+
+    logger.debug("OIDC access token authorized")
+
+    await session.aset_oidc_token(token["id_token"])
+    await backchannel.aremember(request, await session.aoidc_config(), token)
+
+    decision_key = decisions.key(session, await session.aoidc_config(), token)
+    decision = await decisions.aget(decision_key)
+    if decision is None:
+        decision = _verify_claims(session, token)
+        await decisions.aremember(decision_key, decision)
+    return _redirect_decision(session, decision, decision_key)
+
+
+@metrics.timed("login")
+@_fail_fast
+async def login(request: HttpRequest):
+    """View implementing OIDC authorize_redirect."""
+    logger.debug(Routes.route_login)
+
+    session = Session(request)
+    config = await session.aoidc_config()
+    decision = await decisions.arecall(session, config)
+    if decision is not None:
+        return _recalled_decision(session, decision)
+
+    retry_after = await ratelimit.aadmit(config) if config else 0
+    if retry_after:
+        return _waiting_page(request, retry_after)
+
+    oauth_client = await _client_or_error_redirect(request)
+
+    redirect_uri = redirects.redirect_uri(request, Routes.route_authorize)
+
+    logger.debug(f"OAuth authorize_redirect with redirect_uri: {redirect_uri}")
+
+    with tracing.span("authorize_redirect", {tracing.AUTHORITY: getattr(oauth_client, "authority", None)}):
+        result = await oauth_client.authorize_redirect(request, redirect_uri)
+
+    if result is None:
+        raise Exception("authorize_redirect returned None")
+    if result.status_code >= 400:
+        raise Exception(f"authorize_redirect error response [{result.status_code}]: {result.content.decode()}")
+
+    return result
+
+
+@metrics.timed("logout")
+async def logout(request: HttpRequest):
+    """View handler for OIDC sign out."""
+    logger.debug(Routes.route_logout)
+
+    oauth_client = await _client_or_error_redirect(request)
+    session = Session(request)
+
+    # overwrite the session token, the user is signed out of the app
+    token = await session.aoidc_token()
+    await session.aclear_oidc_token()
+    session.oidc_decision = ""
+    await backchannel.aforget(request)
+
+    redirect_uri = redirects.redirect_uri(request, Routes.route_post_logout)
+
+    logger.debug(f"OAuth end_session_endpoint with redirect_uri: {redirect_uri}")
+
+    return await redirects.adeauthorize_redirect(request, oauth_client, token, redirect_uri)
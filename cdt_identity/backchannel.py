@@ -0,0 +1,206 @@
+"""
+OIDC Back-Channel Logout: the Identity Gateway ending a user's sessions by posting a logout token to this app.
+
+With `CDT_IDENTITY_BACKCHANNEL_LOGOUT = True`, the authorize views record a `SessionMapping` from the id_token's issuer,
+`sub` and `sid` to the Django session it was authorized in. A logout token naming a `sid` then deletes that session,
+and one naming only a `sub` deletes every session of that user, each looked up by index rather than by loading sessions.
+
+`invalidate()` deletes the sessions of any set of mappings in batches, e.g. every session of a ClientConfig from the
+`identity_logout` management command.
+
+Sessions must be stored server-side, e.g. by Django's db or cache session engines, to be ended this way.
+
+See https://openid.net/specs/openid-connect-backchannel-1_0.html
+"""
+
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.sessions.backends import cached_db
+from django.contrib.sessions.backends import db as db_sessions
+from django.core.cache import caches
+from django.http import HttpRequest
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import conf
+from .client import _jwks_uri
+from .jwks import key_sets
+from .metadata import metadata_store
+from .models import ClientConfig, SessionMapping
+
+logger = logging.getLogger(__name__)
+
+LOGOUT_EVENT = "http://schemas.openid.net/event/backchannel-logout"
+
+# sessions deleted at a time by invalidate()
+INVALIDATE_BATCH_SIZE = 500
+
+# seconds of clock skew allowed when validating a logout token's iat
+LEEWAY = 120
+
+
+class InvalidLogoutToken(Exception):
+    pass
+
+
+def enabled() -> bool:
+    return bool(conf.get("BACKCHANNEL_LOGOUT"))
+
+
+def _expires():
+    return timezone.now() + timedelta(seconds=settings.SESSION_COOKIE_AGE)
+
+
+def _mapping(userinfo: dict) -> dict:
+    return {"issuer": userinfo.get("iss", ""), "sub": userinfo["sub"], "sid": userinfo.get("sid", ""), "expires": _expires()}
+
+
+def remember(request: HttpRequest, config: ClientConfig, token: dict) -> None:
+    """Record the session of request as authorized for the user of token."""
+    userinfo = token.get("userinfo", {})
+    if not enabled() or not config or "sub" not in userinfo:
+        return
+    if request.session.session_key is None:
+        request.session.save()
+    SessionMapping.objects.update_or_create(
+        session_key=request.session.session_key, client=config, defaults=_mapping(userinfo)
+    )
+
+
+async def aremember(request: HttpRequest, config: ClientConfig, token: dict) -> None:
+    """Async version of `remember()`."""
+    userinfo = token.get("userinfo", {})
+    if not enabled() or not config or "sub" not in userinfo:
+        return
+    if request.session.session_key is None:
+        await request.session.asave()
+    await SessionMapping.objects.aupdate_or_create(
+        session_key=request.session.session_key, client=config, defaults=_mapping(userinfo)
+    )
+
+
+def forget(request: HttpRequest) -> None:
+    """Drop the mappings of the session of request, e.g. when the user logs out."""
+    if enabled() and request.session.session_key:
+        SessionMapping.objects.filter(session_key=request.session.session_key).delete()
+
+
+async def aforget(request: HttpRequest) -> None:
+    """Async version of `forget()`."""
+    if enabled() and request.session.session_key:
+        await SessionMapping.objects.filter(session_key=request.session.session_key).adelete()
+
+
+def _delete_sessions(session_keys: list[str]) -> None:
+    store_cls = import_string(f"{settings.SESSION_ENGINE}.SessionStore")
+    if issubclass(store_cls, db_sessions.SessionStore):
+        # one query for the whole batch
+        store_cls.get_model_class().objects.filter(session_key__in=session_keys).delete()
+        if issubclass(store_cls, cached_db.SessionStore):
+            caches[settings.SESSION_CACHE_ALIAS].delete_many([f"{cached_db.KEY_PREFIX}{key}" for key in session_keys])
+        return
+    for session_key in session_keys:
+        store_cls(session_key).delete(session_key)
+
+
+def invalidate(mappings, batch_size: int = None) -> int:
+    """Delete the sessions of mappings, a SessionMapping queryset, and the mappings, batch_size at a time.
+
+    Returns the number of mappings deleted.
+    """
+    batch_size = batch_size or INVALIDATE_BATCH_SIZE
+    deleted = 0
+    while True:
+        batch = list(mappings.values_list("id", "session_key")[:batch_size])
+        if not batch:
+            return deleted
+        ids, session_keys = zip(*batch)
+        _delete_sessions(list(set(session_keys)))
+        deleted += SessionMapping.objects.filter(id__in=ids).delete()[0]
+
+
+def purge(batch_size: int = None, now=None) -> int:
+    """Delete mappings of sessions that have expired, batch_size at a time. Returns the number deleted."""
+    batch_size = batch_size or INVALIDATE_BATCH_SIZE
+    expired = SessionMapping.objects.filter(expires__lte=now or timezone.now())
+    deleted = 0
+    while True:
+        ids = list(expired.values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += SessionMapping.objects.filter(id__in=ids).delete()[0]
+
+
+def _claims(logout_token: str, config: ClientConfig, authority: str) -> dict:
+    """The claims of logout_token, validated as issued for config by authority."""
+    from joserfc import jwt
+    from joserfc.errors import JoseError
+    from joserfc.jws import JWSRegistry, extract_compact
+    from joserfc.util import to_bytes
+
+    metadata = metadata_store.get(authority)
+    kid = extract_compact(to_bytes(logout_token)).headers().get("kid")
+    key_set = key_sets.get(authority, _jwks_uri(metadata), kid=kid)
+    alg_values = metadata.get("id_token_signing_alg_values_supported")
+    registry = jwt.JWTClaimsRegistry(
+        leeway=LEEWAY,
+        iss={"essential": True, "value": metadata.get("issuer")},
+        aud={"essential": True, "value": config.client_id},
+        iat={"essential": True},
+        jti={"essential": True},
+    )
+    try:
+        token = jwt.decode(logout_token, key_set, registry=JWSRegistry(algorithms=alg_values, strict_check_header=False))
+        registry.validate(token.claims)
+    except JoseError as ex:
+        raise InvalidLogoutToken(f"Invalid logout token: {ex.error}")
+
+    claims = token.claims
+    events = claims.get("events")
+    if not isinstance(events, dict) or not isinstance(events.get(LOGOUT_EVENT), dict):
+        raise InvalidLogoutToken("Logout token without a back-channel logout event")
+    if not claims.get("sid") and not claims.get("sub"):
+        raise InvalidLogoutToken("Logout token without sid or sub")
+    if "nonce" in claims:
+        # so an id_token can't be used as a logout token
+        raise InvalidLogoutToken("Logout token with a nonce")
+    return claims
+
+
+def verify(logout_token: str):
+    """Validate logout_token, returning (the ClientConfig it was issued for, its claims), or raise InvalidLogoutToken."""
+    # joserfc is imported on first use
+    from joserfc.errors import JoseError
+    from joserfc.jws import extract_compact
+    from joserfc.util import to_bytes
+
+    if not logout_token:
+        raise InvalidLogoutToken("Missing logout_token")
+    try:
+        # unverified, to find the ClientConfig and authority whose keys it must be signed with
+        payload = json.loads(extract_compact(to_bytes(logout_token)).payload)
+        issuer, audience = payload.get("iss"), payload.get("aud")
+    except (JoseError, ValueError, AttributeError):
+        raise InvalidLogoutToken("Malformed logout token")
+
+    audiences = [audience] if isinstance(audience, str) else audience
+    if not issuer or not isinstance(audiences, list):
+        raise InvalidLogoutToken("Logout token without iss or aud")
+    for config in ClientConfig.objects.filter(client_id__in=audiences):
+        for authority in config.authorities:
+            if metadata_store.get(authority).get("issuer") == issuer:
+                return config, _claims(logout_token, config, authority)
+    raise InvalidLogoutToken("Logout token not issued for a known client")
+
+
+def sessions(config: ClientConfig, claims: dict):
+    """The mappings of the sessions a logout token with claims, issued for config, ends."""
+    mappings = SessionMapping.objects.filter(issuer=claims["iss"], client__client_id=config.client_id)
+    if claims.get("sid"):
+        mappings = mappings.filter(sid=claims["sid"])
+    if claims.get("sub"):
+        mappings = mappings.filter(sub=claims["sub"])
+    return mappings
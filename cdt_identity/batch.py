@@ -0,0 +1,131 @@
+"""
+Batch and streaming claims verification, for reprocessing archived userinfo payloads offline.
+
+Records are read lazily and processed in fixed-size chunks, optionally across a process pool, so memory stays bounded
+by the chunk size and the number of chunks in flight regardless of the total number of records.
+"""
+
+import json
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import IO, Iterable, Iterator
+
+from .claims import ClaimSchema
+
+
+class InvalidRecord(ValueError):
+    """A line of a JSONL file that is not a JSON object."""
+
+
+class ChunkResult:
+    """The outcome for one chunk of records, as compact per-claim columns.
+
+    `claims[claim][i]` is the verified value of claim for the i-th record of the chunk, or None.
+    `errors[claim][i]` is the error code of claim for the i-th record of the chunk, or None.
+    """
+
+    def __init__(self, claims: dict[str, list], errors: dict[str, list]):
+        self.claims = claims
+        self.errors = errors
+
+    def __len__(self):
+        return len(next(iter(self.claims.values()), []))
+
+    def as_dict(self) -> dict:
+        return {"claims": self.claims, "errors": self.errors}
+
+
+class Summary:
+    """Running totals across all processed chunks."""
+
+    def __init__(self, expected_claims: Iterable[str]):
+        self.records = 0
+        self.verified = Counter({claim: 0 for claim in expected_claims})
+        self.errors = {claim: Counter() for claim in expected_claims}
+
+    def add(self, chunk: ChunkResult) -> None:
+        self.records += len(chunk)
+        for claim, column in chunk.claims.items():
+            self.verified[claim] += sum(1 for value in column if value is not None)
+        for claim, column in chunk.errors.items():
+            self.errors[claim].update(code for code in column if code is not None)
+
+    def as_dict(self) -> dict:
+        return {
+            "records": self.records,
+            "verified": dict(self.verified),
+            "errors": {claim: {str(code): count for code, count in tally.items()} for claim, tally in self.errors.items()},
+        }
+
+
+def read_jsonl(file: IO) -> Iterator[dict]:
+    """Lazily yield a dict for each non-blank line of a JSONL file.
+
+    Raises InvalidRecord, naming the line, for a line that is not a JSON object.
+    """
+    for number, line in enumerate(file, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as ex:
+            raise InvalidRecord(f"Line {number} is not valid JSON: {ex}") from ex
+        if not isinstance(record, dict):
+            raise InvalidRecord(f"Line {number} is not a JSON object")
+        yield record
+
+
+def chunked(records: Iterable[dict], size: int) -> Iterator[list[dict]]:
+    """Lazily split records into lists of at most size records."""
+    records = iter(records)
+    while chunk := list(islice(records, size)):
+        yield chunk
+
+
+def verify_chunk(claims: ClaimSchema | dict[str, str], records: list[dict]) -> ChunkResult:
+    """Verify one chunk of records against a compiled schema or the expected `{claim: type}` claims."""
+    schema = claims if isinstance(claims, ClaimSchema) else ClaimSchema(claims)
+    columns = {claim: [None] * len(records) for claim in schema}
+    errors = {claim: [None] * len(records) for claim in schema}
+
+    for i, userinfo in enumerate(records):
+        verified, failed = schema.decode(userinfo, warn=False)
+        for claim, value in verified.items():
+            columns[claim][i] = value
+        for claim, code in failed.items():
+            errors[claim][i] = code
+
+    return ChunkResult(columns, errors)
+
+
+def verify_claims(
+    records: Iterable[dict], expected_claims: ClaimSchema | str, chunk_size: int = 10_000, processes: int = None
+) -> Iterator[ChunkResult]:
+    """Verify a stream of userinfo dicts, yielding a ChunkResult per chunk of records in input order.
+
+    With `processes` > 1, chunks are verified in a pool of that many processes with at most two chunks per process in
+    flight at a time.
+    """
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be at least 1, not {chunk_size}")
+    if not isinstance(expected_claims, ClaimSchema):
+        expected_claims = ClaimSchema.from_string(expected_claims)
+
+    chunks = chunked(records, chunk_size)
+
+    if not processes or processes < 2:
+        for chunk in chunks:
+            yield verify_chunk(expected_claims, chunk)
+        return
+
+    # workers get the plain {claim: type} mapping and compile their own schema
+    claims = expected_claims.claims
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(verify_chunk, claims, chunk))
+            if len(pending) >= processes * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -0,0 +1,129 @@
+"""
+Process-local cache of ClientConfig rows, keyed by id and by client_name.
+
+Entries expire after `CDT_IDENTITY_CLIENT_CONFIG_CACHE_TTL` seconds and are dropped whenever a transaction saving or
+deleting a ClientConfig commits. With `CDT_IDENTITY_CLIENT_CONFIG_CACHE_SHARED = True`, a version key in Django's cache
+lets every process drop its entries when any one of them sees a change.
+"""
+
+import logging
+import threading
+import time
+
+from django.core.cache import cache as shared_cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import conf, tracing
+from .models import ClientConfig
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "cdt_identity:client_config:version"
+
+
+class ClientConfigCache:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_id = {}
+        self._by_name = {}
+        self._version = None
+
+    def _shared_version(self):
+        if not conf.get("CLIENT_CONFIG_CACHE_SHARED"):
+            return None
+        return shared_cache.get(VERSION_KEY, 0)
+
+    async def _ashared_version(self):
+        if not conf.get("CLIENT_CONFIG_CACHE_SHARED"):
+            return None
+        return await shared_cache.aget(VERSION_KEY, 0)
+
+    def _lookup(self, index: dict, key, version):
+        entry = index.get(key)
+        if entry is None:
+            return None
+        config, expires_at = entry
+        if expires_at < time.monotonic() or version != self._version:
+            return None
+        return config
+
+    def _store(self, config: ClientConfig, version) -> None:
+        ttl = conf.get("CLIENT_CONFIG_CACHE_TTL")
+        if not ttl:
+            return
+        entry = (config, time.monotonic() + ttl)
+        with self._lock:
+            if version != self._version:
+                # another process changed a ClientConfig, drop everything cached under the old version
+                self._by_id.clear()
+                self._by_name.clear()
+                self._version = version
+            self._by_id[config.id] = entry
+            self._by_name[config.client_name] = entry
+
+    def _cached(self, id, client_name: str, version) -> ClientConfig | None:
+        if id is not None:
+            return self._lookup(self._by_id, id, version)
+        return self._lookup(self._by_name, client_name, version)
+
+    def _queryset(self, id, client_name: str):
+        if id is not None:
+            return ClientConfig.objects.filter(id=id)
+        return ClientConfig.objects.filter(client_name=client_name)
+
+    def get(self, id=None, client_name: str = None) -> ClientConfig | None:
+        """Return the ClientConfig with the given id or client_name, querying the database only on a cache miss."""
+        if id is None and client_name is None:
+            return None
+
+        version = self._shared_version()
+        config = self._cached(id, client_name, version)
+        tracing.cache_result("client_config", config is not None)
+        if config is None:
+            config = self._queryset(id, client_name).first()
+            if config is not None:
+                self._store(config, version)
+
+        return config
+
+    async def aget(self, id=None, client_name: str = None) -> ClientConfig | None:
+        """Async version of `get()`."""
+        if id is None and client_name is None:
+            return None
+
+        version = await self._ashared_version()
+        config = self._cached(id, client_name, version)
+        tracing.cache_result("client_config", config is not None)
+        if config is None:
+            config = await self._queryset(id, client_name).afirst()
+            if config is not None:
+                self._store(config, version)
+
+        return config
+
+    def clear(self) -> None:
+        """Drop all entries cached in this process."""
+        with self._lock:
+            self._by_id.clear()
+            self._by_name.clear()
+
+    def invalidate(self) -> None:
+        """Drop all entries cached in this process and, if enabled, signal other processes to do the same."""
+        self.clear()
+        if conf.get("CLIENT_CONFIG_CACHE_SHARED"):
+            if not shared_cache.add(VERSION_KEY, 1, timeout=None):
+                shared_cache.incr(VERSION_KEY)
+
+
+client_configs = ClientConfigCache()
+
+
+@receiver(post_save, sender=ClientConfig, dispatch_uid="cdt_identity.cache.client_config_saved")
+@receiver(post_delete, sender=ClientConfig, dispatch_uid="cdt_identity.cache.client_config_deleted")
+def client_config_changed(sender, instance: ClientConfig, **kwargs):
+    logger.debug(f"Invalidating cached ClientConfig: {instance.client_name}")
+    # until the change commits, other requests still read, and may cache, the old row
+    transaction.on_commit(client_configs.invalidate, using=kwargs.get("using"))
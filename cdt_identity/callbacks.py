@@ -0,0 +1,131 @@
+"""
+Single-flight handling of repeated authorize callbacks, e.g. from a double-click or a browser retrying the redirect.
+
+The first callback for a session and `state` takes a short-lived lock in Django's cache and exchanges the code. Repeats
+arriving meanwhile wait for it, then send the user to the same place, without a second token exchange or touching the
+session. If the first callback fails without redirecting, the next repeat handles the callback itself.
+"""
+
+import asyncio
+import hashlib
+import logging
+import time
+from typing import Awaitable, Callable
+
+from django.core.cache import cache as shared_cache
+from django.http import HttpRequest, HttpResponse, HttpResponseRedirect
+
+from . import conf, resilience
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "cdt_identity:callback"
+
+# seconds between checks for the first callback's result
+POLL_INTERVAL = 0.05
+
+# seconds the lock outlives the request deadline, for the first callback's work after its last Identity Gateway call
+LOCK_MARGIN = 5
+
+
+def _key(request: HttpRequest, state: str) -> str:
+    digest = hashlib.sha256(f"{request.session.session_key}:{state}".encode()).hexdigest()
+    return f"{KEY_PREFIX}:{digest}"
+
+
+def _lock_timeout() -> float:
+    """Longer than the first callback may run for, so that a repeat never exchanges the same code while it does.
+
+    Without a `CDT_IDENTITY_REQUEST_DEADLINE`, the first callback is only bounded by its HTTP timeouts.
+    """
+    return max(conf.get("CALLBACK_WAIT"), conf.get("REQUEST_DEADLINE") or 0) + LOCK_MARGIN
+
+
+def _done(key: str, response: HttpResponse) -> None:
+    """Share the response's redirect with repeats of the callback, or let the next one handle it."""
+    if isinstance(response, HttpResponseRedirect):
+        shared_cache.set(f"{key}:result", response.url, timeout=conf.get("CALLBACK_RESULT_TTL"))
+    shared_cache.delete(f"{key}:lock")
+
+
+async def _adone(key: str, response: HttpResponse) -> None:
+    if isinstance(response, HttpResponseRedirect):
+        await shared_cache.aset(f"{key}:result", response.url, timeout=conf.get("CALLBACK_RESULT_TTL"))
+    await shared_cache.adelete(f"{key}:lock")
+
+
+def _poll(found: dict, key: str, start: float):
+    """The first callback's redirect if found, None if it gave up, or False to keep waiting."""
+    if f"{key}:result" in found:
+        return found[f"{key}:result"]
+    if f"{key}:lock" not in found:
+        return None
+    resilience.check()
+    if time.monotonic() - start >= conf.get("CALLBACK_WAIT"):
+        raise resilience.DeadlineExceeded("Timed out waiting for a repeated authorize callback")
+    return False
+
+
+def _wait(key: str):
+    logger.debug("Waiting for a repeated authorize callback")
+    start = time.monotonic()
+    while True:
+        location = _poll(shared_cache.get_many([f"{key}:result", f"{key}:lock"]), key, start)
+        if location is not False:
+            return location
+        time.sleep(POLL_INTERVAL)
+
+
+async def _await(key: str):
+    logger.debug("Waiting for a repeated authorize callback")
+    start = time.monotonic()
+    while True:
+        location = _poll(await shared_cache.aget_many([f"{key}:result", f"{key}:lock"]), key, start)
+        if location is not False:
+            return location
+        await asyncio.sleep(POLL_INTERVAL)
+
+
+def coalesce(request: HttpRequest, state: str, view: Callable[[], HttpResponse]) -> HttpResponse:
+    """Return view(), or the redirect of the callback with the same session and state that is (or was) handled first."""
+    key = _key(request, state)
+    while True:
+        if shared_cache.add(f"{key}:lock", 1, timeout=_lock_timeout()):
+            # the first callback may have finished, and released the lock, already
+            location = shared_cache.get(f"{key}:result")
+            if location is not None:
+                shared_cache.delete(f"{key}:lock")
+                return HttpResponseRedirect(location)
+            try:
+                response = view()
+            except BaseException:
+                shared_cache.delete(f"{key}:lock")
+                raise
+            _done(key, response)
+            return response
+
+        location = _wait(key)
+        if location is not None:
+            return HttpResponseRedirect(location)
+
+
+async def acoalesce(request: HttpRequest, state: str, view: Callable[[], Awaitable[HttpResponse]]) -> HttpResponse:
+    """Async version of `coalesce()`."""
+    key = _key(request, state)
+    while True:
+        if await shared_cache.aadd(f"{key}:lock", 1, timeout=_lock_timeout()):
+            location = await shared_cache.aget(f"{key}:result")
+            if location is not None:
+                await shared_cache.adelete(f"{key}:lock")
+                return HttpResponseRedirect(location)
+            try:
+                response = await view()
+            except BaseException:
+                await shared_cache.adelete(f"{key}:lock")
+                raise
+            await _adone(key, response)
+            return response
+
+        location = await _await(key)
+        if location is not None:
+            return HttpResponseRedirect(location)
@@ -1,41 +1,181 @@
 import logging
+import math
+import re
+from functools import lru_cache
 
 logger = logging.getLogger(__name__)
 
+# claim types
+AUTO = "auto"
+BOOLEAN = "boolean"
+ERROR_CODE = "error-code"
+VALUE = "value"
+
+# decoded outcomes
+_CLAIM = 0
+_ERROR = 1
+_SKIP = 2
+
+# matches the strings int() accepts in base 10
+_INTEGER = re.compile(r"\s*[+-]?\d+(?:_\d+)*\s*")
+
+
+def _to_int(value):
+    """Return value as an int if it is (or is a string of) an integer, else None."""
+    if isinstance(value, int):
+        return int(value)
+    if isinstance(value, float):
+        return int(value) if math.isfinite(value) else None
+    if isinstance(value, str) and _INTEGER.fullmatch(value):
+        return int(value)
+    return None
+
+
+def _decode_flag(number: int):
+    if number == 1:
+        # a value of 1 means True
+        return _CLAIM, True
+    if number >= 10:
+        # values greater than 10 indicate an error condition
+        return _ERROR, number
+    return _SKIP, None
+
+
+def _decode_auto(value):
+    number = _to_int(value)
+    if number is not None:
+        return _decode_flag(number)
+    if isinstance(value, str):
+        lowered = value.lower()
+        if lowered == "true":
+            # any form of the value "true" means True
+            return _CLAIM, True
+        if lowered != "false":
+            # if userinfo contains claim and the value is not "false", store the value
+            return _CLAIM, value
+    return _SKIP, None
+
+
+def _decode_boolean(value):
+    number = _to_int(value)
+    if number is not None:
+        return _decode_flag(number)
+    if isinstance(value, str) and value.lower() == "true":
+        return _CLAIM, True
+    return _SKIP, None
+
+
+def _decode_error_code(value):
+    number = _to_int(value)
+    if number is not None and number >= 10:
+        return _ERROR, number
+    return _SKIP, None
+
+
+def _decode_value(value):
+    if isinstance(value, str) and value:
+        return _CLAIM, value
+    return _SKIP, None
+
+
+DECODERS = {
+    AUTO: _decode_auto,
+    BOOLEAN: _decode_boolean,
+    ERROR_CODE: _decode_error_code,
+    VALUE: _decode_value,
+}
+
+# precomputed outcomes for the common raw values of each claim type
+_TABLES = {
+    claim_type: {raw: decoder(raw) for raw in ("0", "1", "true", "false", "True", "False", "TRUE", "FALSE")}
+    for claim_type, decoder in DECODERS.items()
+}
+
+
+class ClaimSchema:
+    """The expected claims and their types, compiled once into a decoder table and reused across requests.
+
+    - `boolean` claims look like `{ "claim": "1" | "0" }` or `{ "claim": "true" }`, values of 10 or more are errors
+    - `error-code` claims only report errors, values of 10 or more
+    - `value` claims look like `{ "claim": "value" }`, stored as-is
+    - `auto` claims (the default) are interpreted as any of the above based on their value
+    """
+
+    def __init__(self, claims: dict[str, str]):
+        for claim, claim_type in claims.items():
+            if claim_type not in DECODERS:
+                raise ValueError(f"Unknown type for claim {claim}: {claim_type}")
+
+        self.claims = dict(claims)
+        self.decoders = tuple((claim, DECODERS[claim_type], _TABLES[claim_type]) for claim, claim_type in claims.items())
+
+    def __bool__(self):
+        return bool(self.decoders)
+
+    def __iter__(self):
+        return iter(self.claims)
+
+    def __eq__(self, other):
+        return isinstance(other, ClaimSchema) and self.claims == other.claims
+
+    def __hash__(self):
+        return hash(tuple(self.claims.items()))
+
+    def decode(self, userinfo: dict, warn: bool = True) -> tuple[dict, dict]:
+        """Decode the expected claims from the userinfo dict in a single pass, returning (claims, errors)."""
+        claims = {}
+        errors = {}
+
+        for claim, decoder, table in self.decoders:
+            claim_value = userinfo.get(claim)
+            if warn and not claim_value:
+                logger.warning(f"userinfo did not contain claim: {claim}")
+            outcome = table.get(claim_value) if isinstance(claim_value, str) else None
+            outcome, value = outcome or decoder(claim_value)
+            if outcome == _CLAIM:
+                claims[claim] = value
+            elif outcome == _ERROR:
+                errors[claim] = value
+
+        return claims, errors
+
+    @staticmethod
+    def from_claims(expected_claims) -> "ClaimSchema":
+        """Return the compiled schema for a list of claim names, each optionally typed like `claim:type`."""
+        return _compile(tuple(expected_claims))
+
+    @staticmethod
+    def from_string(expected_claims: str) -> "ClaimSchema":
+        """Return the compiled schema for a space-separated string of claims, each optionally typed like `claim:type`."""
+        return _compile(tuple(expected_claims.split()))
+
+
+@lru_cache(maxsize=128)
+def _compile(expected_claims: tuple) -> ClaimSchema:
+    claims = {}
+    for claim in expected_claims:
+        if not claim:
+            continue
+        name, _, claim_type = claim.rpartition(":")
+        if claim_type in DECODERS:
+            claims[name] = claim_type
+        else:
+            # untyped, including names with colons of their own, e.g. https://example.com/claims/claim1
+            claims[claim] = AUTO
+    return ClaimSchema(claims)
+
 
 class Claims:
 
-    def __init__(self, userinfo: dict, expected_claims: list[str]):
+    def __init__(self, userinfo: dict, expected_claims: ClaimSchema | list[str]):
         """Process expected claims from the userinfo dict.
 
-        - Boolean claims look like `{ "claim": "1" | "0" }` or `{ "claim": "true" }`
-        - Value claims look like `{ "claim": "value" }`
+        `expected_claims` is a compiled ClaimSchema, or a list of claim names interpreted as `auto` claims.
         """
-        self.claims = {}
-        self.errors = {}
+        if not isinstance(expected_claims, ClaimSchema):
+            expected_claims = ClaimSchema.from_claims(expected_claims)
 
-        for claim in expected_claims:
-            claim_value = userinfo.get(claim)
-            if not claim_value:
-                logger.warning(f"userinfo did not contain claim: {claim}")
-            try:
-                claim_value = int(claim_value)
-            except (TypeError, ValueError):
-                pass
-            if isinstance(claim_value, int):
-                if claim_value == 1:
-                    # a value of 1 means True
-                    self.claims[claim] = True
-                elif claim_value >= 10:
-                    # values greater than 10 indicate an error condition
-                    self.errors[claim] = claim_value
-            elif isinstance(claim_value, str):
-                if claim_value.lower() == "true":
-                    # any form of the value "true" means True
-                    self.claims[claim] = True
-                elif claim_value.lower() != "false":
-                    # if userinfo contains claim and the value is not "false", store the value
-                    self.claims[claim] = claim_value
+        self.claims, self.errors = expected_claims.decode(userinfo)
 
     def __contains__(self, claim: str):
         """Check if a claim is in the processed claims."""
@@ -1,16 +1,94 @@
 """
 The oauth application: helpers for working with OAuth clients.
+
+Authlib is imported on first use, when a client is first created, rather than with this module.
 """
 
 import logging
+import threading
+from collections import OrderedDict
 
-from authlib.integrations.django_client import OAuth
+from django.utils.module_loading import import_string
 
+from cdt_identity import conf, tracing
+from cdt_identity.metadata import _server_metadata_url
 from cdt_identity.models import ClientConfig
 
 logger = logging.getLogger(__name__)
 
-oauth = OAuth()
+
+def __getattr__(name):
+    # defined in cdt_identity.oauth_app, which imports Authlib
+    if name in ("OAuth2App", "_parse_id_token"):
+        from cdt_identity import oauth_app
+
+        return getattr(oauth_app, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _jwks_uri(metadata: dict) -> str:
+    jwks_uri = metadata.get("jwks_uri")
+    if not jwks_uri:
+        raise RuntimeError('Missing "jwks_uri" in metadata')
+    return jwks_uri
+
+
+class ClientRegistry:
+    """A bounded, thread-safe registry of OAuth clients.
+
+    Clients are keyed by everything they are configured with, and the least recently used are evicted beyond
+    `CDT_IDENTITY_CLIENT_REGISTRY_MAX_SIZE` entries.
+    """
+
+    def __init__(self, max_size: int = None):
+        self._lock = threading.Lock()
+        self._clients = OrderedDict()
+        self._max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._clients)
+
+    @property
+    def max_size(self) -> int:
+        return self._max_size or conf.get("CLIENT_REGISTRY_MAX_SIZE")
+
+    def get_or_create(self, key, factory):
+        """Return the client registered under key, calling factory() to create and register it if needed."""
+        with self._lock:
+            client = self._clients.get(key)
+            tracing.cache_result("client", client is not None)
+            if client is not None:
+                self._clients.move_to_end(key)
+                self.hits += 1
+                return client
+
+            self.misses += 1
+            client = factory()
+            self._clients[key] = client
+            while len(self._clients) > self.max_size:
+                self._clients.popitem(last=False)
+                self.evictions += 1
+            return client
+
+    def stats(self) -> dict:
+        """Return the registry's size and its hit, miss and eviction counters."""
+        return {
+            "size": len(self),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clients.clear()
+
+
+oauth = ClientRegistry()
 
 
 def _client_kwargs(extra_scopes: str = ""):
@@ -26,15 +104,6 @@ def _client_kwargs(extra_scopes: str = ""):
     return {"code_challenge_method": "S256", "scope": " ".join(scopes), "prompt": "login"}
 
 
-def _server_metadata_url(authority):
-    """
-    Generate the OpenID Connect server_metadata_url for an OAuth authority server.
-
-    `authority` should be a fully qualified HTTPS domain name, e.g. https://example.com.
-    """
-    return f"{authority}/.well-known/openid-configuration"
-
-
 def _authorize_params(scheme):
     if scheme is not None:
         params = {"scheme": scheme}
@@ -44,22 +113,60 @@ def _authorize_params(scheme):
     return params
 
 
-def create_client(oauth_registry: OAuth, config: ClientConfig, scopes: str, scheme: str = ""):
+def _config_version(config: ClientConfig):
+    """The ClientConfig fields a client is built from, so that an edited config gets a new client."""
+    return (config.client_id, config.authority, config.fallback_authorities, config.scheme)
+
+
+def _register(authlib_registry, config: ClientConfig, scopes: str, scheme: str, client_cls):
+    # Adapted from https://stackoverflow.com/a/64174413.
+    logger.debug(f"Registering OAuth client: {config.client_name}")
+    return authlib_registry.register(
+        config.client_name,
+        client_cls=client_cls,
+        authority=config.authority,
+        authorities=config.authorities,
+        client_id=config.client_id,
+        server_metadata_url=_server_metadata_url(config.authority),
+        client_kwargs=_client_kwargs(scopes),
+        authorize_params=_authorize_params(scheme),
+    )
+
+
+def create_client(oauth_registry, config: ClientConfig, scopes: str, scheme: str = "", client_cls=None):
     """
     Returns an OAuth client, registering first if needed.
+
+    `oauth_registry` is a `ClientRegistry`, e.g. `cdt_identity.client.oauth`. An Authlib `OAuth` registry is still
+    accepted, and keeps the first client registered under each `client_name`, whatever its configuration.
+
+    `client_cls` is the class of client to register, by default `cdt_identity.oauth_app.OAuth2App`, or e.g.
+    `cdt_identity.async_client.AsyncOAuth2App`.
     """
-    client = oauth_registry.create_client(config.client_name)
-
-    if client is None:
-        # Register OAuth clients into the given registry, using the provided configuration.
-        # Adapted from https://stackoverflow.com/a/64174413.
-        logger.debug(f"Registering OAuth client: {config.client_name}")
-        client = oauth_registry.register(
-            config.client_name,
-            client_id=config.client_id,
-            server_metadata_url=_server_metadata_url(config.authority),
-            client_kwargs=_client_kwargs(scopes),
-            authorize_params=_authorize_params(scheme or config.scheme),
-        )
-
-    return client
+    if client_cls is None:
+        from cdt_identity.oauth_app import OAuth2App
+
+        client_cls = OAuth2App
+
+    scheme = scheme or config.scheme
+
+    if not isinstance(oauth_registry, ClientRegistry):
+        client = oauth_registry.create_client(config.client_name)
+        if client is None:
+            client = _register(oauth_registry, config, scopes, scheme, client_cls)
+        return client
+
+    key = (client_cls, config.client_name, _config_version(config), scopes, scheme)
+
+    def register():
+        from authlib.integrations.django_client import OAuth
+
+        # Build the client with a throwaway Authlib registry, which applies any AUTHLIB_OAUTH_CLIENTS settings.
+        authlib_registry = OAuth()
+        transaction_store = conf.get("TRANSACTION_STORE")
+        if transaction_store:
+            # where the client keeps each authorization request's state, nonce and code_verifier until the callback
+            authlib_registry.framework_integration_cls = import_string(transaction_store)
+        return _register(authlib_registry, config, scopes, scheme, client_cls)
+
+    return oauth_registry.get_or_create(key, register)
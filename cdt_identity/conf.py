@@ -0,0 +1,98 @@
+"""
+Package settings, read from the Django settings with a `CDT_IDENTITY_` prefix.
+
+e.g. `CDT_IDENTITY_CLIENT_CONFIG_CACHE_TTL = 60` in the host application's settings overrides the default below.
+"""
+
+from django.conf import settings
+
+PREFIX = "CDT_IDENTITY_"
+
+DEFAULTS = {
+    # seconds a ClientConfig stays in the process-local cache; 0 disables caching
+    "CLIENT_CONFIG_CACHE_TTL": 300,
+    # True to coordinate ClientConfig cache invalidation across processes via Django's cache
+    "CLIENT_CONFIG_CACHE_SHARED": False,
+    # maximum number of OAuth clients kept in cdt_identity.client.oauth
+    "CLIENT_REGISTRY_MAX_SIZE": 100,
+    # seconds discovery metadata is fresh, and per-authority overrides e.g. {"https://example.com": 600}
+    "METADATA_CACHE_TTL": 3600,
+    "METADATA_CACHE_TTL_BY_AUTHORITY": {},
+    # seconds expired discovery metadata may still be served while it is refreshed in the background
+    "METADATA_CACHE_STALE_TTL": 86400,
+    # minimum seconds between JWKS downloads forced by an id_token with an unknown kid
+    "JWKS_REFRESH_INTERVAL": 60,
+    # connection pools for calls to an Identity Gateway: the number of authorities to keep a pool for, the maximum
+    # connections kept per authority, and whether to wait for a free connection rather than open an unpooled one
+    "HTTP_POOL_AUTHORITIES": 10,
+    "HTTP_POOL_MAX_CONNECTIONS": 20,
+    "HTTP_POOL_BLOCK": False,
+    # seconds an idle pooled connection is kept open by async clients
+    "HTTP_KEEPALIVE_EXPIRY": 60,
+    # retries for failed connection attempts
+    "HTTP_MAX_RETRIES": 0,
+    # seconds to wait to connect to, and then for a response from, an Identity Gateway
+    "HTTP_CONNECT_TIMEOUT": 5,
+    "HTTP_READ_TIMEOUT": 15,
+    # True to route login, authorize and logout to the native async views in cdt_identity.async_views
+    "ASYNC_VIEWS": False,
+    # True to time each phase of the login, authorize and logout views, and the dotted path of the class receiving them
+    "METRICS_ENABLED": False,
+    "METRICS_SINK": "cdt_identity.metrics.HistogramSink",
+    # True to open tracing spans, and the dotted path of the tracer class; by default OpenTelemetry, if installed
+    "TRACING_ENABLED": True,
+    "TRACER": None,
+    # True to warm up the client registry, metadata and JWKS caches for every ClientConfig in the background on startup,
+    # the seconds to wait for slow authorities, and the number of authorities prefetched at a time
+    "WARMUP_ON_STARTUP": False,
+    "WARMUP_BUDGET": 10,
+    "WARMUP_MAX_WORKERS": 8,
+    # extra scopes to also register clients for on warm-up, as a list of scope strings per ClientConfig client_name,
+    # e.g. {"client1": ["profile email"]}; clients for the default scopes are always registered
+    "WARMUP_SCOPES": {},
+    # seconds to wait on an authority before also sending the request to the next of a ClientConfig's authorities, and
+    # the number of workers making hedged requests; while all are busy, requests fail over on the request thread
+    "HEDGE_DELAY": 0.5,
+    "HEDGE_MAX_WORKERS": 16,
+    # weight of the latest call in each authority's moving averages, and the seconds added to an authority's latency
+    # score for an average failure rate of 1
+    "HEALTH_WEIGHT": 0.2,
+    "HEALTH_FAILURE_PENALTY": 30,
+    # True to stop calling an authority for BREAKER_RESET_TIMEOUT seconds once BREAKER_FAILURE_THRESHOLD calls to it have
+    # failed within BREAKER_WINDOW seconds
+    "BREAKER_ENABLED": True,
+    "BREAKER_FAILURE_THRESHOLD": 5,
+    "BREAKER_WINDOW": 60,
+    "BREAKER_RESET_TIMEOUT": 30,
+    # seconds the login and authorize views may spend calling an Identity Gateway in total; None for no deadline
+    "REQUEST_DEADLINE": 10,
+    # logins per second allowed per ClientConfig, None for no limit, and the logins allowed at once above it; each
+    # overridden per ClientConfig. Logins over the limit get a waiting page that retries, and never reach the gateway
+    "LOGIN_RATE_LIMIT": None,
+    "LOGIN_BURST": 10,
+    # seconds a repeated authorize callback waits for the first one with the same state, and the seconds the first
+    # one's redirect is kept for repeats
+    "CALLBACK_WAIT": 10,
+    "CALLBACK_RESULT_TTL": 60,
+    # dotted path of the Authlib FrameworkIntegration class keeping each login's state, nonce and code_verifier until
+    # its authorize callback, e.g. "cdt_identity.transactions.CacheTransactionStore" with a cache shared between
+    # processes; None for Authlib's default of the session. And the seconds a login has to complete
+    "TRANSACTION_STORE": None,
+    "TRANSACTION_TTL": 600,
+    # True to keep the id_token used as the logout id_token_hint in the database, the session keeping a short handle to
+    # it, and the seconds it is kept; None for the session cookie age. Stored id_tokens are deleted by running the
+    # identity_purge_tokens management command. False keeps the id_token in the session
+    "ID_TOKEN_STORE": False,
+    "ID_TOKEN_TTL": None,
+    # seconds a user's eligibility decision is remembered, letting a login from the same session skip the Identity
+    # Gateway; 0 to verify claims on every login
+    "ELIGIBILITY_CACHE_TTL": 0,
+    # True to record the session each user is authorized in, so the Identity Gateway can end it with a back-channel
+    # logout; requires sessions stored server-side
+    "BACKCHANNEL_LOGOUT": False,
+}
+
+
+def get(name: str):
+    """Return the value of the `CDT_IDENTITY_{name}` setting, falling back to the package default."""
+    return getattr(settings, f"{PREFIX}{name}", DEFAULTS.get(name))
@@ -0,0 +1,106 @@
+"""
+Opt-in cache of eligibility decisions: the verified claims of a user who was eligible.
+
+With `CDT_IDENTITY_ELIGIBILITY_CACHE_TTL` set, the authorize views remember each eligible decision for that many seconds,
+and leave its key in the session. A login from the same session within that time, for the same ClientConfig and claims,
+is then redirected like the decision, skipping the Identity Gateway and claims verification. Ineligible decisions are
+never cached, so a user who was not eligible, e.g. having signed in with the wrong account, can try again straight away.
+
+Decisions are keyed by a salted HMAC of the id_token `sub`, and hold only claim names: a decision with a claim value,
+e.g. from a `value` claim, is never cached, so no personal information is kept in the cache.
+"""
+
+import hashlib
+
+from django.core.cache import cache as shared_cache
+from django.utils.crypto import salted_hmac
+
+from . import conf
+from .client import _config_version
+from .models import ClientConfig
+
+KEY_PREFIX = "cdt_identity:decision"
+
+SALT = "cdt_identity.decisions"
+
+
+def enabled() -> bool:
+    return bool(conf.get("ELIGIBILITY_CACHE_TTL"))
+
+
+def _context(session, config: ClientConfig) -> str:
+    """A digest of everything other than the user that a decision depends on."""
+    parts = (
+        config.id,
+        *_config_version(config),
+        session.oidc_scheme or config.scheme,
+        session.oidc_scopes,
+        session.oidc_expected_claims,
+        session.oidc_eligibility_claims,
+    )
+    return hashlib.sha256(repr(parts).encode()).hexdigest()[:32]
+
+
+def key(session, config: ClientConfig, token: dict) -> str:
+    """The key of the decision for the user of token, or "" if decisions aren't cached or token has no `sub`."""
+    sub = token.get("userinfo", {}).get("sub")
+    if not enabled() or not config or not sub:
+        return ""
+    subject = salted_hmac(SALT, f"{config.id}:{sub}", algorithm="sha256").hexdigest()
+    return f"{_context(session, config)}:{subject}"
+
+
+def _session_key(session, config: ClientConfig) -> str:
+    """The key of the decision left in session, if it is still for config and the session's claims."""
+    decision_key = session.oidc_decision
+    if not decision_key or not config or not enabled():
+        return ""
+    if not decision_key.startswith(f"{_context(session, config)}:"):
+        return ""
+    return decision_key
+
+
+def _load(entry):
+    if entry is None or not entry["eligible"]:
+        return None
+    return {"eligible": entry["eligible"], "claims": {claim: True for claim in entry["claims"]}}
+
+
+def _entry(decision: dict):
+    """decision as stored in the cache, or None if it is ineligible or holds claim values."""
+    if not decision["eligible"] or any(value is not True for value in decision["claims"].values()):
+        return None
+    return {"eligible": decision["eligible"], "claims": sorted(decision["claims"])}
+
+
+def get(decision_key: str):
+    """The decision {"eligible": bool, "claims": dict} under decision_key, or None."""
+    return _load(shared_cache.get(f"{KEY_PREFIX}:{decision_key}")) if decision_key else None
+
+
+async def aget(decision_key: str):
+    """Async version of `get()`."""
+    return _load(await shared_cache.aget(f"{KEY_PREFIX}:{decision_key}")) if decision_key else None
+
+
+def remember(decision_key: str, decision: dict) -> None:
+    entry = _entry(decision) if decision_key else None
+    if entry is not None:
+        shared_cache.set(f"{KEY_PREFIX}:{decision_key}", entry, timeout=conf.get("ELIGIBILITY_CACHE_TTL"))
+
+
+async def aremember(decision_key: str, decision: dict) -> None:
+    """Async version of `remember()`."""
+    entry = _entry(decision) if decision_key else None
+    if entry is not None:
+        await shared_cache.aset(f"{KEY_PREFIX}:{decision_key}", entry, timeout=conf.get("ELIGIBILITY_CACHE_TTL"))
+
+
+def recall(session, config: ClientConfig):
+    """The decision left in session by an earlier authorize for config, if it is still cached, else None."""
+    return get(_session_key(session, config))
+
+
+async def arecall(session, config: ClientConfig):
+    """Async version of `recall()`."""
+    return await aget(_session_key(session, config))
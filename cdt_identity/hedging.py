@@ -0,0 +1,263 @@
+"""
+Hedged requests across the authorities of a ClientConfig, steered by per-authority health.
+
+A call goes to the healthiest authority first. If it has not answered after `CDT_IDENTITY_HEDGE_DELAY` seconds, the same
+call goes to the next authority too, and the first answer is used. A failed call fails over to the next authority straight
+away. `failover()` never sends a call to two authorities at once, for calls that must not be repeated, e.g. a token
+request.
+
+Health is kept per process, as moving averages of each authority's latency and failure rate.
+"""
+
+import asyncio
+import collections
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Awaitable, Callable, TypeVar
+
+from . import conf, resilience, tracing
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# span attribute: whether more than one authority was called
+HEDGED = "cdt_identity.hedged"
+
+
+class AuthorityHealth:
+    """Moving averages of the latency and failure rate of calls to each authority."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # authority -> (average seconds, average failures)
+        self._averages = {}
+
+    def record(self, authority: str, seconds: float, ok: bool) -> None:
+        weight = conf.get("HEALTH_WEIGHT")
+        failed = 0.0 if ok else 1.0
+        with self._lock:
+            average = self._averages.get(authority)
+            if average is None:
+                self._averages[authority] = (seconds, failed)
+            else:
+                latency, failures = average
+                self._averages[authority] = (
+                    latency + weight * (seconds - latency),
+                    failures + weight * (failed - failures),
+                )
+
+    def score(self, authority: str) -> float:
+        """Lower is healthier: the average latency, plus a penalty in seconds scaled by the failure rate."""
+        latency, failures = self._averages.get(authority, (0.0, 0.0))
+        return latency + failures * conf.get("HEALTH_FAILURE_PENALTY")
+
+    def order(self, authorities: list[str]) -> list[str]:
+        """The authorities healthiest first, keeping the configured order between equally healthy ones."""
+        return sorted(authorities, key=self.score)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                authority: {"latency": latency, "failures": failures}
+                for authority, (latency, failures) in self._averages.items()
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._averages.clear()
+
+
+health = AuthorityHealth()
+
+
+def _record_losers(calls) -> None:
+    # calls still running when another authority answered were at least this slow
+    now = time.monotonic()
+    for authority, start in calls:
+        health.record(authority, now - start, ok=True)
+
+
+def _timed(authority: str, call: Callable[[str], T]) -> T:
+    start = time.monotonic()
+    try:
+        result = call(authority)
+    except Exception:
+        health.record(authority, time.monotonic() - start, ok=False)
+        raise
+    health.record(authority, time.monotonic() - start, ok=True)
+    return result
+
+
+def _can_fail_over(exception: Exception) -> bool:
+    """Whether a call that raised exception may be sent to another authority: it was never sent, or went unanswered."""
+    if isinstance(exception, resilience.DeadlineExceeded):
+        return False
+    return isinstance(exception, resilience.GatewayUnavailable) or resilience._is_outage(exception)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+# free workers of the executor, so hedged calls never queue behind slow ones
+_slots = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor, _slots
+    with _executor_lock:
+        if _executor is None:
+            max_workers = conf.get("HEDGE_MAX_WORKERS")
+            _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="cdt_identity_hedge")
+            _slots = threading.BoundedSemaphore(max_workers)
+        return _executor
+
+
+def _submit(fn, *args) -> Future | None:
+    """Run fn(*args) on a free worker, or return None if every worker is busy."""
+    executor = _get_executor()
+    if not _slots.acquire(blocking=False):
+        return None
+    # each call gets a copy of the current context, so metrics and tracing see the view being served
+    future = executor.submit(contextvars.copy_context().run, fn, *args)
+    future.add_done_callback(lambda _: _slots.release())
+    return future
+
+
+def hedge(authorities: list[str], call: Callable[[str], T]) -> T:
+    """Return call(authority) for the first authority to answer, healthiest first, hedging the call while it is slow.
+
+    Calls are made from workers, so the calling thread takes whichever answers first. While every worker is busy, calls
+    are made on the calling thread instead, failing over one after another. Calls that lose run to completion in the
+    background, counting towards the health of their authority.
+
+    Raises the first error if every authority fails.
+    """
+    delay = conf.get("HEDGE_DELAY")
+    remaining = collections.deque(health.order(authorities))
+    # future -> authority
+    pending = {}
+    errors = []
+
+    def launch() -> None:
+        """Call the next authority from a free worker, if there is one."""
+        if remaining:
+            future = _submit(_timed, remaining[0], call)
+            if future is not None:
+                pending[future] = remaining.popleft()
+
+    launch()
+    try:
+        while pending or remaining:
+            if not pending:
+                # every worker is busy, so fail over on this thread
+                authority = remaining.popleft()
+                try:
+                    result = _timed(authority, call)
+                except Exception as ex:
+                    logger.warning(f"Call to {authority} failed, failing over", exc_info=ex)
+                    errors.append(ex)
+                    launch()
+                    continue
+                tracing.set_attributes({tracing.AUTHORITY: authority, HEDGED: bool(errors)})
+                return result
+            done, _ = wait(pending, timeout=resilience.timeout(delay), return_when=FIRST_COMPLETED)
+            if not done:
+                logger.debug(f"No answer within {delay} seconds, hedging")
+                launch()
+                continue
+            for future in done:
+                authority = pending.pop(future)
+                if future.exception() is None:
+                    tracing.set_attributes({tracing.AUTHORITY: authority, HEDGED: bool(errors or pending)})
+                    return future.result()
+                logger.warning(f"Call to {authority} failed, failing over", exc_info=future.exception())
+                errors.append(future.exception())
+                launch()
+    finally:
+        for future in pending:
+            future.cancel()
+
+    raise errors[0]
+
+
+def failover(authorities: list[str], call: Callable[[str], T]) -> T:
+    """Return call(authority) for the healthiest authority, calling the next only if one was unavailable.
+
+    Calls are never sent to two authorities at once, e.g. for a token request whose authorization code may only be
+    used once.
+    """
+    errors = []
+    for authority in health.order(authorities):
+        try:
+            result = _timed(authority, call)
+        except Exception as ex:
+            if not _can_fail_over(ex):
+                raise
+            logger.warning(f"Call to {authority} failed, failing over", exc_info=ex)
+            errors.append(ex)
+            continue
+        tracing.set_attributes({tracing.AUTHORITY: authority, HEDGED: bool(errors)})
+        return result
+    raise errors[0]
+
+
+async def afailover(authorities: list[str], call: Callable[[str], Awaitable[T]]) -> T:
+    """Async version of `failover()`."""
+    errors = []
+    for authority in health.order(authorities):
+        start = time.monotonic()
+        try:
+            result = await call(authority)
+        except Exception as ex:
+            health.record(authority, time.monotonic() - start, ok=False)
+            if not _can_fail_over(ex):
+                raise
+            logger.warning(f"Call to {authority} failed, failing over", exc_info=ex)
+            errors.append(ex)
+            continue
+        health.record(authority, time.monotonic() - start, ok=True)
+        tracing.set_attributes({tracing.AUTHORITY: authority, HEDGED: bool(errors)})
+        return result
+    raise errors[0]
+
+
+async def ahedge(authorities: list[str], call: Callable[[str], Awaitable[T]]) -> T:
+    """Async version of `hedge()`. Calls that lose are cancelled."""
+    delay = conf.get("HEDGE_DELAY")
+    remaining = iter(health.order(authorities))
+    # task -> (authority, start)
+    pending = {}
+    errors = []
+
+    def launch() -> None:
+        authority = next(remaining, None)
+        if authority is not None:
+            pending[asyncio.ensure_future(call(authority))] = (authority, time.monotonic())
+
+    launch()
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, timeout=resilience.timeout(delay), return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                logger.debug(f"No answer within {delay} seconds, hedging")
+                launch()
+                continue
+            for task in done:
+                authority, start = pending.pop(task)
+                ok = task.exception() is None
+                health.record(authority, time.monotonic() - start, ok)
+                if ok:
+                    _record_losers(pending.values())
+                    tracing.set_attributes({tracing.AUTHORITY: authority, HEDGED: bool(errors or pending)})
+                    return task.result()
+                logger.warning(f"Call to {authority} failed, failing over", exc_info=task.exception())
+                errors.append(task.exception())
+                launch()
+    finally:
+        for task in pending:
+            task.cancel()
+
+    raise errors[0]
@@ -0,0 +1,105 @@
+"""
+Parsed JSON Web Key Sets used to validate id_tokens, cached per authority.
+
+A key set is downloaded once per process and only downloaded again when an id_token is signed with a `kid` the cached
+set does not contain, e.g. after the authority rotates its keys. Those forced refreshes happen at most once every
+`CDT_IDENTITY_JWKS_REFRESH_INTERVAL` seconds per authority.
+"""
+
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING
+
+from . import conf, resilience, tracing
+from .transport import transport
+
+if TYPE_CHECKING:
+    from joserfc.jwk import KeySet
+
+logger = logging.getLogger(__name__)
+
+
+def _import_key_set(data: dict) -> "KeySet":
+    # joserfc is imported on first use
+    from joserfc.jwk import KeySet
+
+    return KeySet.import_key_set(data)
+
+
+class KeySetCache:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # authority -> (KeySet, time of the last download)
+        self._entries = {}
+
+    def _fetch(self, jwks_uri: str) -> "KeySet":
+        logger.debug(f"Fetching JWKS: {jwks_uri}")
+        with resilience.guard(jwks_uri):
+            response = transport.session().get(jwks_uri, timeout=transport.timeout())
+            response.raise_for_status()
+        return _import_key_set(response.json())
+
+    async def _afetch(self, jwks_uri: str) -> "KeySet":
+        logger.debug(f"Fetching JWKS: {jwks_uri}")
+        async with resilience.aguard(jwks_uri), transport.async_client() as client:
+            response = await client.get(jwks_uri)
+            response.raise_for_status()
+        return _import_key_set(response.json())
+
+    def _has_kid(self, key_set: "KeySet", kid: str) -> bool:
+        return any(key.kid == kid for key in key_set)
+
+    def _cached(self, authority: str, kid: str = None) -> "KeySet | None":
+        """Return the cached key set for authority, or None if it must be downloaded."""
+        entry = self._entries.get(authority)
+        if entry is None:
+            return None
+
+        key_set, fetched_at = entry
+        if kid is None or self._has_kid(key_set, kid):
+            return key_set
+        if time.monotonic() - fetched_at < conf.get("JWKS_REFRESH_INTERVAL"):
+            logger.warning(f"Unknown kid {kid} for {authority}, JWKS was refreshed too recently")
+            return key_set
+
+        logger.debug(f"Unknown kid {kid} for {authority}, refreshing JWKS")
+        return None
+
+    def _store(self, authority: str, key_set: "KeySet") -> "KeySet":
+        self._entries[authority] = (key_set, time.monotonic())
+        return key_set
+
+    def get(self, authority: str, jwks_uri: str, kid: str = None) -> "KeySet":
+        """Return the parsed key set for authority, downloading it only if missing or if it does not contain kid."""
+        key_set = self._cached(authority, kid)
+        tracing.cache_result("jwks", key_set is not None)
+        if key_set is not None:
+            return key_set
+
+        with self._lock:
+            # another thread may have downloaded the key set while this one waited
+            key_set = self._cached(authority, kid)
+            if key_set is not None:
+                return key_set
+            return self._store(authority, self._fetch(jwks_uri))
+
+    async def aget(self, authority: str, jwks_uri: str, kid: str = None) -> "KeySet":
+        """Async version of `get()`, downloading over httpx."""
+        key_set = self._cached(authority, kid)
+        tracing.cache_result("jwks", key_set is not None)
+        if key_set is not None:
+            return key_set
+        return self._store(authority, await self._afetch(jwks_uri))
+
+    def clear(self, authority: str = None) -> None:
+        """Drop the cached key set for authority, or for every authority."""
+        with self._lock:
+            if authority:
+                self._entries.pop(authority, None)
+            else:
+                self._entries.clear()
+
+
+key_sets = KeySetCache()
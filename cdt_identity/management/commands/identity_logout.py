@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from cdt_identity import backchannel
+from cdt_identity.models import SessionMapping
+
+
+class Command(BaseCommand):
+    help = (
+        "End the sessions recorded for back-channel logout: every session of a ClientConfig, or of one of its users or "
+        "Identity Gateway sessions. With --expired, only forget the records of sessions that have expired."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--client", help="The client_name of the ClientConfig whose sessions to end")
+        parser.add_argument("--sub", help="Only end the sessions of this subject")
+        parser.add_argument("--sid", help="Only end the sessions of this Identity Gateway session")
+        parser.add_argument("--expired", action="store_true", help="Forget the records of expired sessions instead")
+        parser.add_argument("--batch-size", type=int, default=None, help="Sessions ended at a time")
+
+    def handle(self, *args, **options):
+        if options["expired"]:
+            deleted = backchannel.purge(batch_size=options["batch_size"])
+            self.stdout.write(f"Forgot {deleted} expired sessions")
+            return
+
+        if not options["client"]:
+            raise CommandError("--client or --expired is required")
+        mappings = SessionMapping.objects.filter(client__client_name=options["client"])
+        if options["sub"]:
+            mappings = mappings.filter(sub=options["sub"])
+        if options["sid"]:
+            mappings = mappings.filter(sid=options["sid"])
+        ended = backchannel.invalidate(mappings, batch_size=options["batch_size"])
+        self.stdout.write(f"Ended {ended} sessions")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from cdt_identity.tokens import id_tokens
+
+
+class Command(BaseCommand):
+    help = "Delete expired id_tokens kept for logout, in batches. Run e.g. daily, alongside clearsessions."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None, help="Tokens deleted at a time")
+
+    def handle(self, *args, **options):
+        deleted = id_tokens.purge(batch_size=options["batch_size"])
+        self.stdout.write(f"Deleted {deleted} expired id_tokens")
@@ -0,0 +1,20 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from cdt_identity.warmup import warm_up
+
+
+class Command(BaseCommand):
+    help = (
+        "Register a client and prefetch discovery metadata and JWKS for every ClientConfig. "
+        "Warms Django's cache, and this process's caches, e.g. before serving from a preloaded app."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--budget", type=float, default=None, help="Seconds to wait for slow authorities")
+        parser.add_argument("--max-workers", type=int, default=None, help="Authorities to prefetch at a time")
+
+    def handle(self, *args, **options):
+        results = warm_up(budget=options["budget"], max_workers=options["max_workers"])
+        self.stdout.write(json.dumps(results))
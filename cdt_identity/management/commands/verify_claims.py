@@ -0,0 +1,50 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cdt_identity.batch import InvalidRecord, Summary, read_jsonl, verify_claims
+from cdt_identity.claims import ClaimSchema
+
+
+class Command(BaseCommand):
+    help = "Verify the expected claims for a JSONL file of archived userinfo payloads."
+
+    def add_arguments(self, parser):
+        parser.add_argument("input", help="Path to a JSONL file with one userinfo object per line, or - for stdin")
+        parser.add_argument(
+            "--claims",
+            required=True,
+            help="Space-separated expected claims, each optionally typed like claim:boolean",
+        )
+        parser.add_argument("--chunk-size", type=int, default=10_000, help="Records verified per chunk")
+        parser.add_argument("--processes", type=int, default=None, help="Verify chunks in a pool of this many processes")
+        parser.add_argument("--output", default=None, help="Path to write the per-chunk result columns as JSONL")
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be at least 1")
+        if options["processes"] is not None and options["processes"] < 1:
+            raise CommandError("--processes must be at least 1")
+
+        schema = ClaimSchema.from_string(options["claims"])
+        summary = Summary(schema)
+
+        input_file = sys.stdin if options["input"] == "-" else open(options["input"])
+        output_file = open(options["output"], "w") if options["output"] else None
+
+        try:
+            chunks = verify_claims(read_jsonl(input_file), schema, options["chunk_size"], options["processes"])
+            for chunk in chunks:
+                summary.add(chunk)
+                if output_file:
+                    output_file.write(json.dumps(chunk.as_dict()) + "\n")
+        except InvalidRecord as ex:
+            raise CommandError(f"{options['input']}: {ex}") from ex
+        finally:
+            if input_file is not sys.stdin:
+                input_file.close()
+            if output_file:
+                output_file.close()
+
+        self.stdout.write(json.dumps(summary.as_dict()))
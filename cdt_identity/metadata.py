@@ -0,0 +1,165 @@
+"""
+OpenID Connect discovery metadata, shared between processes through Django's cache.
+
+Metadata for an authority is fresh for `CDT_IDENTITY_METADATA_CACHE_TTL` seconds (overridden per authority with
+`CDT_IDENTITY_METADATA_CACHE_TTL_BY_AUTHORITY`). After that it is served stale for up to
+`CDT_IDENTITY_METADATA_CACHE_STALE_TTL` more seconds while a single background refresh runs.
+"""
+
+import logging
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache as shared_cache
+
+from . import conf, resilience, tracing
+from .transport import transport
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "cdt_identity:metadata"
+
+
+def _server_metadata_url(authority):
+    """
+    Generate the OpenID Connect server_metadata_url for an OAuth authority server.
+
+    `authority` should be a fully qualified HTTPS domain name, e.g. https://example.com.
+    """
+    return f"{authority}/.well-known/openid-configuration"
+
+
+def _ttl(authority: str) -> int:
+    ttls = conf.get("METADATA_CACHE_TTL_BY_AUTHORITY") or {}
+    return ttls.get(authority, conf.get("METADATA_CACHE_TTL"))
+
+
+class MetadataStore:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = {}
+
+    def _key(self, authority: str) -> str:
+        return f"{KEY_PREFIX}:{authority}"
+
+    def _fetch(self, authority: str) -> dict:
+        logger.debug(f"Fetching server metadata: {authority}")
+        url = _server_metadata_url(authority)
+        with resilience.guard(url):
+            response = transport.session().get(url, timeout=transport.timeout())
+            response.raise_for_status()
+        return response.json()
+
+    async def _afetch(self, authority: str) -> dict:
+        logger.debug(f"Fetching server metadata: {authority}")
+        url = _server_metadata_url(authority)
+        async with resilience.aguard(url), transport.async_client() as client:
+            response = await client.get(url)
+            response.raise_for_status()
+        return response.json()
+
+    def _entry(self, metadata: dict) -> dict:
+        return {"metadata": metadata, "fetched_at": time.time()}
+
+    def _timeout(self, authority: str) -> int:
+        return _ttl(authority) + conf.get("METADATA_CACHE_STALE_TTL")
+
+    def _keep(self, authority: str, entry: dict) -> dict:
+        with self._lock:
+            self._local[authority] = entry
+        return entry
+
+    def _save(self, authority: str, metadata: dict) -> dict:
+        entry = self._entry(metadata)
+        shared_cache.set(self._key(authority), entry, timeout=self._timeout(authority))
+        return self._keep(authority, entry)
+
+    async def _asave(self, authority: str, metadata: dict) -> dict:
+        entry = self._entry(metadata)
+        await shared_cache.aset(self._key(authority), entry, timeout=self._timeout(authority))
+        return self._keep(authority, entry)
+
+    def _local_entry(self, authority: str):
+        """Return the local entry for authority and whether it is still fresh."""
+        entry = self._local.get(authority)
+        return entry, entry is not None and time.time() - entry["fetched_at"] < _ttl(authority)
+
+    def _age(self, entry: dict) -> float:
+        return time.time() - entry["fetched_at"]
+
+    def _metadata(self, entry: dict) -> dict:
+        metadata = dict(entry["metadata"])
+        metadata["_loaded_at"] = entry["fetched_at"]
+        return metadata
+
+    def _refresh(self, authority: str) -> None:
+        try:
+            self._save(authority, self._fetch(authority))
+        except Exception:
+            logger.warning(f"Could not refresh server metadata: {authority}", exc_info=True)
+        finally:
+            shared_cache.delete(f"{self._key(authority)}:refresh")
+
+    def _refresh_in_background(self, authority: str) -> None:
+        # only one process refreshes a given authority at a time; the rest keep serving the stale entry
+        if shared_cache.add(f"{self._key(authority)}:refresh", 1, timeout=conf.get("HTTP_READ_TIMEOUT")):
+            threading.Thread(target=self._refresh, args=(authority,), daemon=True).start()
+
+    def fresh(self, authority: str):
+        """Return the discovery metadata for authority if this process has a fresh copy, otherwise None."""
+        entry, fresh = self._local_entry(authority)
+        return self._metadata(entry) if fresh else None
+
+    def get(self, authority: str) -> dict:
+        """Return the discovery metadata for authority, fetching it only when no cached copy exists."""
+        entry, fresh = self._local_entry(authority)
+        if fresh:
+            tracing.cache_result("metadata", True)
+            return self._metadata(entry)
+
+        # the local copy is missing or expired, another process may have refreshed it already
+        shared_entry = shared_cache.get(self._key(authority))
+        if shared_entry is not None:
+            entry = self._keep(authority, shared_entry)
+
+        expired = entry is None or self._age(entry) >= self._timeout(authority)
+        tracing.cache_result("metadata", not expired)
+        if expired:
+            entry = self._save(authority, self._fetch(authority))
+        elif self._age(entry) >= _ttl(authority):
+            self._refresh_in_background(authority)
+
+        return self._metadata(entry)
+
+    async def aget(self, authority: str) -> dict:
+        """Async version of `get()`, fetching over httpx when no cached copy exists."""
+        entry, fresh = self._local_entry(authority)
+        if fresh:
+            tracing.cache_result("metadata", True)
+            return self._metadata(entry)
+
+        shared_entry = await shared_cache.aget(self._key(authority))
+        if shared_entry is not None:
+            entry = self._keep(authority, shared_entry)
+
+        expired = entry is None or self._age(entry) >= self._timeout(authority)
+        tracing.cache_result("metadata", not expired)
+        if expired:
+            entry = await self._asave(authority, await self._afetch(authority))
+        elif self._age(entry) >= _ttl(authority):
+            await sync_to_async(self._refresh_in_background)(authority)
+
+        return self._metadata(entry)
+
+    def clear(self, authority: str = None) -> None:
+        """Drop the cached metadata for authority, or for every authority."""
+        with self._lock:
+            authorities = [authority] if authority else list(self._local)
+            for a in authorities:
+                self._local.pop(a, None)
+                shared_cache.delete(self._key(a))
+
+
+metadata_store = MetadataStore()
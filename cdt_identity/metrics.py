@@ -0,0 +1,200 @@
+"""
+Per-phase latency metrics for the login, authorize and logout views.
+
+Enable with `CDT_IDENTITY_METRICS_ENABLED = True`. Each view records its phases, labeled by view and client_name:
+
+* `client`: reading the ClientConfig and getting its OAuth client
+* `metadata`: loading discovery metadata
+* `token`: the token exchange in `authorize_access_token`
+* `id_token`: validating the id_token against the authority's JWKS
+* `claims`: processing the verified claims
+* `session_save`: saving the session, after the view returns
+* `total`: the whole view
+
+Phases can nest, e.g. `token` includes the `metadata` it needs. Timings go to the sink named by
+`CDT_IDENTITY_METRICS_SINK`, by default an in-memory `HistogramSink` that `prometheus()` exports, e.g.
+
+    path("metrics", cdt_identity.metrics.prometheus)
+"""
+
+import abc
+import bisect
+import contextvars
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+from django.http import HttpRequest, HttpResponse
+from django.utils.module_loading import import_string
+
+from . import conf
+
+# upper bounds in seconds of the histogram buckets, Prometheus' defaults
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_NULL = nullcontext()
+_flow = contextvars.ContextVar("cdt_identity_metrics_flow", default=None)
+
+
+class Sink(abc.ABC):
+    """Receives the timing of each phase. Subclass and name in `CDT_IDENTITY_METRICS_SINK` to send them elsewhere."""
+
+    @abc.abstractmethod
+    def record(self, view: str, phase: str, client_name: str, seconds: float) -> None:
+        pass
+
+    def snapshot(self) -> dict:
+        """Return `{(view, phase, client_name): {"buckets": [...], "sum": seconds, "count": n}}` for export."""
+        return {}
+
+
+class HistogramSink(Sink):
+    """Keeps a histogram of timings per view, phase and client_name, in memory."""
+
+    def __init__(self, buckets: tuple = BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._histograms = {}
+
+    def record(self, view: str, phase: str, client_name: str, seconds: float) -> None:
+        key = (view, phase, client_name)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                # one count per bucket, plus +Inf
+                histogram = self._histograms[key] = {"buckets": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+            histogram["buckets"][bisect.bisect_left(self.buckets, seconds)] += 1
+            histogram["sum"] += seconds
+            histogram["count"] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {key: {**h, "buckets": list(h["buckets"])} for key, h in self._histograms.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+
+
+_sinks = {}
+
+
+def sink() -> Sink:
+    """The configured sink, created on first use."""
+    path = conf.get("METRICS_SINK")
+    if path not in _sinks:
+        _sinks[path] = import_string(path)()
+    return _sinks[path]
+
+
+class Flow:
+    """The view being timed, and the client_name its phases are labeled with once known."""
+
+    def __init__(self, view: str, sink: Sink):
+        self.view = view
+        self.sink = sink
+        self.client_name = ""
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.sink.record(self.view, name, self.client_name, time.perf_counter() - start)
+
+    def time_session_save(self, session) -> None:
+        # SessionMiddleware saves the session after the view returns, time it through this request's session only
+        save = session.save
+
+        def timed_save(*args, **kwargs):
+            with self.phase("session_save"):
+                return save(*args, **kwargs)
+
+        session.save = timed_save
+
+
+def phase(name: str):
+    """Time a phase of the view currently being timed, if any."""
+    flow = _flow.get()
+    return flow.phase(name) if flow else _NULL
+
+
+def set_client_name(client_name: str) -> None:
+    """Label the phases of the view currently being timed, if any, with client_name."""
+    flow = _flow.get()
+    if flow:
+        flow.client_name = client_name
+
+
+def timed(view: str):
+    """Decorate a sync or async view function to time its phases, when metrics are enabled."""
+
+    def decorator(fn):
+        def start(request: HttpRequest):
+            flow = Flow(view, sink())
+            if hasattr(request, "session"):
+                flow.time_session_save(request.session)
+            return flow, _flow.set(flow)
+
+        if inspect.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(request: HttpRequest, *args, **kwargs):
+                if not conf.get("METRICS_ENABLED"):
+                    return await fn(request, *args, **kwargs)
+                flow, token = start(request)
+                try:
+                    with flow.phase("total"):
+                        return await fn(request, *args, **kwargs)
+                finally:
+                    _flow.reset(token)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(request: HttpRequest, *args, **kwargs):
+            if not conf.get("METRICS_ENABLED"):
+                return fn(request, *args, **kwargs)
+            flow, token = start(request)
+            try:
+                with flow.phase("total"):
+                    return fn(request, *args, **kwargs)
+            finally:
+                _flow.reset(token)
+
+        return wrapper
+
+    return decorator
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render(snapshot: dict, buckets: tuple = BUCKETS) -> str:
+    """Render a sink snapshot in the Prometheus text exposition format."""
+    name = "cdt_identity_phase_seconds"
+    lines = [
+        f"# HELP {name} Time spent in each phase of the OIDC login, authorize and logout views.",
+        f"# TYPE {name} histogram",
+    ]
+    for (view, phase, client_name), histogram in sorted(snapshot.items()):
+        labels = f'view="{_label(view)}",phase="{_label(phase)}",client_name="{_label(client_name)}"'
+        cumulative = 0
+        for bound, count in zip(buckets + (float("inf"),), histogram["buckets"]):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'{name}_bucket{{{labels},le="{le}"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {histogram['sum']!r}")
+        lines.append(f"{name}_count{{{labels}}} {histogram['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def prometheus(request: HttpRequest):
+    """View exporting the configured sink's metrics in the Prometheus text format."""
+    current = sink()
+    text = render(current.snapshot(), getattr(current, "buckets", BUCKETS))
+    return HttpResponse(text, content_type="text/plain; version=0.0.4; charset=utf-8")
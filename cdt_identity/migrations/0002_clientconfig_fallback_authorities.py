@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cdt_identity", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="clientconfig",
+            name="fallback_authorities",
+            field=models.TextField(
+                blank=True,
+                default="",
+                help_text=(
+                    "Authority servers for the same Identity Gateway, one per line, tried when the authority is slow or down"
+                ),
+            ),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:39
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cdt_identity", "0002_clientconfig_fallback_authorities"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="clientconfig",
+            name="login_burst",
+            field=models.PositiveIntegerField(
+                blank=True,
+                help_text="Logins allowed at once above the rate limit, blank to use the CDT_IDENTITY_LOGIN_BURST setting",
+                null=True,
+                validators=[django.core.validators.MinValueValidator(1)],
+            ),
+        ),
+        migrations.AddField(
+            model_name="clientconfig",
+            name="login_rate_limit",
+            field=models.FloatField(
+                blank=True,
+                help_text="Logins per second allowed for this client, blank to use the CDT_IDENTITY_LOGIN_RATE_LIMIT setting",
+                null=True,
+                validators=[django.core.validators.MinValueValidator(0.001)],
+            ),
+        ),
+    ]
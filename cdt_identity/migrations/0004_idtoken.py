@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cdt_identity", "0003_clientconfig_login_rate_limit"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="IdToken",
+            fields=[
+                ("handle", models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ("token", models.TextField()),
+                ("expires", models.DateTimeField(db_index=True)),
+            ],
+            options={
+                "verbose_name": "OIDC id_token",
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cdt_identity", "0004_idtoken"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SessionMapping",
+            fields=[
+                ("id", models.AutoField(primary_key=True, serialize=False)),
+                ("issuer", models.CharField(max_length=255)),
+                ("sub", models.CharField(max_length=255)),
+                ("sid", models.CharField(blank=True, default="", max_length=255)),
+                ("session_key", models.CharField(max_length=255)),
+                ("expires", models.DateTimeField(db_index=True)),
+                ("client", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to="cdt_identity.clientconfig")),
+            ],
+            options={
+                "verbose_name": "OIDC session",
+                "indexes": [
+                    models.Index(fields=["issuer", "sid"], name="cdt_identit_issuer_c376ae_idx"),
+                    models.Index(fields=["issuer", "sub"], name="cdt_identit_issuer_d1c9f9_idx"),
+                ],
+                "constraints": [models.UniqueConstraint(fields=("session_key", "client"), name="unique_session_mapping")],
+            },
+        ),
+    ]
@@ -1,3 +1,4 @@
+from django.core.validators import MinValueValidator
 from django.db import models
 
 
@@ -20,10 +21,73 @@ class ClientConfig(models.Model):
         help_text="The fully qualified HTTPS domain name for an Identity Gateway authority server",
         max_length=100,
     )
+    fallback_authorities = models.TextField(
+        blank=True,
+        default="",
+        help_text="Authority servers for the same Identity Gateway, one per line, tried when the authority is slow or down",
+    )
     scheme = models.CharField(
         help_text="The authentication scheme for the Identity Gateway authority server",
         max_length=100,
     )
+    login_rate_limit = models.FloatField(
+        blank=True,
+        null=True,
+        validators=[MinValueValidator(0.001)],
+        help_text="Logins per second allowed for this client, blank to use the CDT_IDENTITY_LOGIN_RATE_LIMIT setting",
+    )
+    login_burst = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        validators=[MinValueValidator(1)],
+        help_text="Logins allowed at once above the rate limit, blank to use the CDT_IDENTITY_LOGIN_BURST setting",
+    )
+
+    @property
+    def authorities(self) -> list[str]:
+        """The authority, then any fallback authorities, in the configured order."""
+        fallbacks = [line.strip() for line in self.fallback_authorities.splitlines()]
+        return [self.authority] + [fallback for fallback in fallbacks if fallback and fallback != self.authority]
 
     def __str__(self):
         return self.client_name
+
+
+class IdToken(models.Model):
+    """An id_token kept for logout, outside of the session that refers to it by handle."""
+
+    class Meta:
+        verbose_name = "OIDC id_token"
+
+    handle = models.CharField(max_length=64, primary_key=True)
+    token = models.TextField()
+    expires = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.handle
+
+
+class SessionMapping(models.Model):
+    """The Django session a user's Identity Gateway session (`sid`) and subject (`sub`) were authorized in, used to end
+    that session on a back-channel logout."""
+
+    class Meta:
+        verbose_name = "OIDC session"
+        indexes = [
+            models.Index(fields=["issuer", "sid"]),
+            models.Index(fields=["issuer", "sub"]),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=["session_key", "client"], name="unique_session_mapping"),
+        ]
+
+    id = models.AutoField(primary_key=True)
+    client = models.ForeignKey(ClientConfig, on_delete=models.CASCADE)
+    issuer = models.CharField(max_length=255)
+    sub = models.CharField(max_length=255)
+    sid = models.CharField(max_length=255, blank=True, default="")
+    session_key = models.CharField(max_length=255)
+    expires = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.issuer} {self.sub}"
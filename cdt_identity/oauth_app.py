@@ -0,0 +1,125 @@
+"""
+The OAuth client class registered by `cdt_identity.client.create_client`.
+
+Kept apart from `cdt_identity.client` so that Authlib is only imported once a client is first created.
+"""
+
+from authlib.integrations.django_client import DjangoOAuth2App
+from authlib.oidc.core import CodeIDToken, ImplicitIDToken, UserInfo
+from joserfc import jwt
+from joserfc.jws import JWSRegistry
+
+from cdt_identity import hedging, metrics, resilience, tracing
+from cdt_identity.client import _jwks_uri
+from cdt_identity.jwks import key_sets
+from cdt_identity.metadata import metadata_store
+from cdt_identity.transport import transport
+
+
+class OAuth2App(DjangoOAuth2App):
+    """An OAuth client that reads discovery metadata from the shared `cdt_identity.metadata.metadata_store`,
+    validates id_tokens against the cached `cdt_identity.jwks.key_sets`, and sends requests through the pooled
+    `cdt_identity.transport.transport`.
+
+    Given more than one of `authorities`, metadata requests are hedged across them with `cdt_identity.hedging.hedge`,
+    and token requests fail over with `cdt_identity.hedging.failover`."""
+
+    def __init__(self, *args, authority: str = None, authorities: list[str] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.authority = authority
+        self.authorities = authorities or ([authority] if authority else [])
+
+    def _get_session(self):
+        session = transport.mount(super()._get_session())
+        session.default_timeout = transport.timeout()
+        return session
+
+    def _get_oauth_client(self, **metadata):
+        session = transport.mount(super()._get_oauth_client(**metadata))
+        session.default_timeout = transport.timeout()
+        return session
+
+    def load_server_metadata(self):
+        with metrics.phase("metadata"), tracing.span("metadata", {tracing.AUTHORITY: self.authority}):
+            if len(self.authorities) > 1:
+                self.server_metadata.update(
+                    _fresh_metadata(self.authorities) or hedging.hedge(self.authorities, metadata_store.get)
+                )
+                return self.server_metadata
+            if self.authority:
+                self.server_metadata.update(metadata_store.get(self.authority))
+                return self.server_metadata
+            return super().load_server_metadata()
+
+    def fetch_access_token(self, redirect_uri=None, **kwargs):
+        with metrics.phase("token"), tracing.span("token", {tracing.AUTHORITY: self.authority}):
+            if self.access_token_url or not self.authorities:
+                return super().fetch_access_token(redirect_uri, **kwargs)
+            if len(self.authorities) == 1:
+                return self._fetch_access_token_from(self.authority, redirect_uri, **kwargs)
+            # the authorization code may only be used once, so it is never sent to two authorities at once
+            return hedging.failover(
+                self.authorities, lambda authority: self._fetch_access_token_from(authority, redirect_uri, **kwargs)
+            )
+
+    def _fetch_access_token_from(self, authority, redirect_uri=None, **kwargs):
+        """
+        Fetch an access token from the token endpoint of one of the authorities.
+
+        Adapted from `authlib.integrations.base_client.sync_app.OAuth2Mixin.fetch_access_token`.
+        """
+        metadata = metadata_store.get(authority)
+        token_endpoint = metadata.get("token_endpoint")
+        with resilience.guard(token_endpoint), self._get_oauth_client(**metadata) as client:
+            if redirect_uri is not None:
+                client.redirect_uri = redirect_uri
+            params = dict(self.access_token_params or {}, **kwargs)
+            return client.fetch_token(token_endpoint, **params)
+
+    def parse_id_token(self, token, nonce, claims_options=None, claims_cls=None, leeway=120):
+        if not self.authority or "id_token" not in token:
+            return super().parse_id_token(token, nonce, claims_options, claims_cls, leeway)
+
+        metadata = self.load_server_metadata()
+        jwks_uri = _jwks_uri(metadata)
+
+        def resolve_key(obj):
+            return key_sets.get(self.authority, jwks_uri, kid=obj.headers().get("kid"))
+
+        with metrics.phase("id_token"), tracing.span("id_token", {tracing.AUTHORITY: self.authority}):
+            return _parse_id_token(self, token, nonce, metadata, resolve_key, claims_options, claims_cls, leeway)
+
+
+def _fresh_metadata(authorities: list[str]):
+    """The fresh metadata cached for the healthiest authority, so that cache hits skip hedging."""
+    return metadata_store.fresh(hedging.health.order(authorities)[0])
+
+
+def _parse_id_token(client, token, nonce, metadata, key, claims_options=None, claims_cls=None, leeway=120):
+    """
+    Validate the token's `id_token` with the given key (or key resolver), returning its UserInfo.
+
+    Adapted from `authlib.integrations.base_client.sync_openid.OpenIDMixin.parse_id_token`, which imports the JWKS on
+    every call rather than using the parsed key set cache.
+    """
+    claims_params = dict(nonce=nonce, client_id=client.client_id)
+    if claims_cls is None:
+        if "access_token" in token:
+            claims_params["access_token"] = token["access_token"]
+            claims_cls = CodeIDToken
+        else:
+            claims_cls = ImplicitIDToken
+
+    if claims_options is None and "issuer" in metadata:
+        claims_options = {"iss": {"values": [metadata["issuer"]]}}
+
+    alg_values = metadata.get("id_token_signing_alg_values_supported")
+    id_token = jwt.decode(
+        token["id_token"],
+        key=key,
+        registry=JWSRegistry(algorithms=alg_values, strict_check_header=False),
+    )
+
+    claims = claims_cls(id_token.claims, id_token.header, claims_options, claims_params)
+    claims.validate(leeway=leeway)
+    return UserInfo(claims)
@@ -0,0 +1,85 @@
+"""
+Admission control for the login view: a count of logins per ClientConfig and time window, kept in Django's cache.
+
+A client may start up to `login_burst` logins (or `CDT_IDENTITY_LOGIN_BURST`) in each window of `login_burst /
+login_rate_limit` seconds (or `CDT_IDENTITY_LOGIN_RATE_LIMIT`): that many at once, and `login_rate_limit` a second on
+average. A login over the limit is told how long to wait for the next window instead.
+
+Counts are only changed with the cache's atomic add() and incr(), so processes sharing the cache never admit the same
+login twice. Either side of the boundary between two windows, up to twice `login_burst` logins may start at once.
+"""
+
+import math
+import time
+
+from django.core.cache import cache as shared_cache
+
+from . import conf
+from .models import ClientConfig
+
+KEY_PREFIX = "cdt_identity:ratelimit"
+
+
+def _window(now: float, rate: float, burst: int) -> tuple[int, float]:
+    """The number of the window of burst / rate seconds that now falls in, and the seconds left until it ends."""
+    length = burst / rate
+    number = math.floor(now / length)
+    return number, (number + 1) * length - now
+
+
+class LoginCounters:
+
+    def _key(self, name: str, number: int) -> str:
+        return f"{KEY_PREFIX}:{name}:{number}"
+
+    def _timeout(self, rate: float, burst: int) -> int:
+        # a count outlives its window
+        return math.ceil(burst / rate) + 1
+
+    def take(self, name: str, rate: float, burst: int) -> float:
+        """Count a login for the client called name, returning 0, or the seconds to wait if it is over the limit."""
+        number, left = _window(time.time(), rate, burst)
+        key = self._key(name, number)
+        shared_cache.add(key, 0, timeout=self._timeout(rate, burst))
+        try:
+            count = shared_cache.incr(key)
+        except ValueError:
+            # evicted since it was added
+            return 0.0
+        return 0.0 if count <= burst else left
+
+    async def atake(self, name: str, rate: float, burst: int) -> float:
+        """Async version of `take()`."""
+        number, left = _window(time.time(), rate, burst)
+        key = self._key(name, number)
+        await shared_cache.aadd(key, 0, timeout=self._timeout(rate, burst))
+        try:
+            count = await shared_cache.aincr(key)
+        except ValueError:
+            return 0.0
+        return 0.0 if count <= burst else left
+
+
+counters = LoginCounters()
+
+
+def _limits(config: ClientConfig):
+    """The (rate, burst) for logins with config, or None without a limit."""
+    rate = config.login_rate_limit if config.login_rate_limit is not None else conf.get("LOGIN_RATE_LIMIT")
+    if not rate or rate < 0:
+        # e.g. a rate saved without validation
+        return None
+    burst = config.login_burst or conf.get("LOGIN_BURST") or 1
+    return rate, burst
+
+
+def admit(config: ClientConfig) -> float:
+    """Admit a login with config, returning 0, or the seconds to wait when over its rate limit."""
+    limits = _limits(config)
+    return counters.take(config.client_name, *limits) if limits else 0.0
+
+
+async def aadmit(config: ClientConfig) -> float:
+    """Async version of `admit()`."""
+    limits = _limits(config)
+    return await counters.atake(config.client_name, *limits) if limits else 0.0
@@ -1,25 +1,69 @@
-from authlib.integrations.base_client import OAuth2Mixin
+from typing import TYPE_CHECKING
+from urllib.parse import quote_plus
 
-from django.http import HttpRequest
-from django.shortcuts import redirect
-from django.utils.http import urlencode
+from django.http import HttpRequest, HttpResponseRedirect
+from django.urls import reverse
 
+if TYPE_CHECKING:
+    from authlib.integrations.base_client import OAuth2Mixin
 
-def deauthorize_redirect(request: HttpRequest, oauth_client: OAuth2Mixin, token: str, redirect_uri: str):
+# most entries kept in each of the caches below; they are emptied when full, e.g. by requests for many hosts
+MAX_CACHED = 256
+
+# (scheme, host headers, script name, urlconf, route) -> redirect URI
+_redirect_uris = {}
+
+# (end_session_endpoint, post_logout_redirect_uri) -> URL up to the id_token_hint, URL after it
+_end_session_urls = {}
+
+
+def deauthorize_redirect(request: HttpRequest, oauth_client: "OAuth2Mixin", token: str, redirect_uri: str):
     """Helper implements OIDC signout via the `end_session_endpoint`."""
 
     # Authlib has not yet implemented `end_session_endpoint` as the OIDC Session Management 1.0 spec is still in draft
     # See https://github.com/lepture/authlib/issues/331#issuecomment-827295954 for more
     #
     # The implementation here was adapted from the same ticket: https://github.com/lepture/authlib/issues/331#issue-838728145
+    #
+    # Clients created by `cdt_identity.client.create_client` serve this from the shared `cdt_identity.metadata` store
     metadata = oauth_client.load_server_metadata()
-    end_session_endpoint = metadata.get("end_session_endpoint")
+    return _end_session_redirect(metadata, token, redirect_uri)
+
+
+async def adeauthorize_redirect(request: HttpRequest, oauth_client, token: str, redirect_uri: str):
+    """Async version of `deauthorize_redirect()`, for clients from `cdt_identity.async_client`."""
+    metadata = await oauth_client.load_server_metadata()
+    return _end_session_redirect(metadata, token, redirect_uri)
+
+
+def _remember(cache: dict, key, value):
+    if len(cache) >= MAX_CACHED:
+        cache.clear()
+    cache[key] = value
+    return value
 
-    params = dict(id_token_hint=token, post_logout_redirect_uri=redirect_uri)
-    encoded_params = urlencode(params)
-    end_session_url = f"{end_session_endpoint}?{encoded_params}"
 
-    return redirect(end_session_url)
+def end_session_url(end_session_endpoint: str, token: str, redirect_uri: str) -> str:
+    """The `end_session_endpoint` URL signing out `token`, then redirecting to `redirect_uri`.
+
+    Everything but the token is encoded once per endpoint and redirect URI, so a new endpoint in refreshed metadata is
+    picked up on the next call.
+    """
+    key = (end_session_endpoint, redirect_uri)
+    parts = _end_session_urls.get(key)
+    if parts is None:
+        parts = _remember(
+            _end_session_urls,
+            key,
+            (f"{end_session_endpoint}?id_token_hint=", f"&post_logout_redirect_uri={quote_plus(redirect_uri)}"),
+        )
+    prefix, suffix = parts
+    return f"{prefix}{quote_plus(token)}{suffix}"
+
+
+def _end_session_redirect(metadata: dict, token: str, redirect_uri: str):
+    # an absolute URL, there is nothing for `django.shortcuts.redirect` to resolve
+    return HttpResponseRedirect(end_session_url(metadata.get("end_session_endpoint"), token, redirect_uri))
 
 
 def generate_redirect_uri(request: HttpRequest, redirect_path: str):
@@ -31,3 +75,26 @@ def generate_redirect_uri(request: HttpRequest, redirect_path: str):
         redirect_uri = redirect_uri.replace("http://", "https://")
 
     return redirect_uri
+
+
+def _redirect_uri_key(request: HttpRequest, route: str) -> tuple:
+    # the inputs to the host, scheme and path of the redirect URI, read without the (slower) validation that
+    # `generate_redirect_uri()` does on a cache miss, so only a validated host is ever cached
+    meta = request.META
+    host = (meta.get("HTTP_X_FORWARDED_HOST"), meta.get("HTTP_HOST"), meta.get("SERVER_NAME"), meta.get("SERVER_PORT"))
+    return (request.scheme, host, meta.get("SCRIPT_NAME"), getattr(request, "urlconf", None), route)
+
+
+def redirect_uri(request: HttpRequest, route: str) -> str:
+    """The result of `generate_redirect_uri()` for the path of `route`, computed once per host and scheme."""
+    key = _redirect_uri_key(request, route)
+    uri = _redirect_uris.get(key)
+    if uri is None:
+        uri = _remember(_redirect_uris, key, generate_redirect_uri(request, reverse(route)))
+    return uri
+
+
+def clear() -> None:
+    """Forget the cached redirect URIs and end_session URLs."""
+    _redirect_uris.clear()
+    _end_session_urls.clear()
@@ -0,0 +1,255 @@
+"""
+Fail fast when an Identity Gateway browns out: a circuit breaker per authority, and a deadline per request.
+
+The circuit for an authority opens after `CDT_IDENTITY_BREAKER_FAILURE_THRESHOLD` failed calls within
+`CDT_IDENTITY_BREAKER_WINDOW` seconds. While open, calls to the authority raise `CircuitOpen` without being sent. After
+`CDT_IDENTITY_BREAKER_RESET_TIMEOUT` seconds a single trial call is let through: if it succeeds the circuit closes,
+otherwise it opens again. Circuit state is shared between processes through Django's cache.
+
+Views run within a `deadline()` of `CDT_IDENTITY_REQUEST_DEADLINE` seconds, which caps the timeout of every call made
+on their behalf, and raises `DeadlineExceeded` once spent.
+"""
+
+import contextvars
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from urllib.parse import urlsplit
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache as shared_cache
+
+from . import conf
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "cdt_identity:breaker"
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+# OAuth error codes returned by an authority that is unavailable, rather than rejecting the request
+_UNAVAILABLE_ERRORS = {"server_error", "temporarily_unavailable"}
+
+
+class GatewayUnavailable(Exception):
+    """An Identity Gateway could not be called in time."""
+
+
+class CircuitOpen(GatewayUnavailable):
+    def __init__(self, authority: str):
+        super().__init__(f"Circuit open for {authority}")
+        self.authority = authority
+
+
+class DeadlineExceeded(GatewayUnavailable):
+    pass
+
+
+def _authority(url: str) -> str:
+    """The scheme and host of url, e.g. the authority a metadata, token or JWKS endpoint belongs to."""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def _is_outage(exception: Exception) -> bool:
+    """Whether exception means the authority is unavailable, rather than that it rejected the call."""
+    if isinstance(exception, (DeadlineExceeded, CircuitOpen)):
+        return False
+    if getattr(exception, "error", None) in _UNAVAILABLE_ERRORS:
+        return True
+    response = getattr(exception, "response", None)
+    if response is not None:
+        return getattr(response, "status_code", 0) >= 500
+    # connection errors and timeouts, from requests or httpx
+    return type(exception).__module__.split(".")[0] in ("requests", "httpx", "urllib3", "httpcore")
+
+
+class CircuitBreaker:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # authority -> time.time() until which the circuit is known to be open
+        self._open_until = {}
+
+    def _key(self, authority: str, name: str) -> str:
+        return f"{KEY_PREFIX}:{authority}:{name}"
+
+    def state(self, authority: str) -> str:
+        keys = [self._key(authority, "open"), self._key(authority, "tripped")]
+        state = shared_cache.get_many(keys)
+        if keys[0] in state:
+            return OPEN
+        return HALF_OPEN if keys[1] in state else CLOSED
+
+    def allow(self, authority: str) -> bool | str:
+        """Whether a call to authority may be sent: False while the circuit is open, HALF_OPEN for a trial call."""
+        if self._open_until.get(authority, 0) > time.time():
+            return False
+
+        open_key, tripped_key = self._key(authority, "open"), self._key(authority, "tripped")
+        state = shared_cache.get_many([open_key, tripped_key])
+        if open_key in state:
+            with self._lock:
+                self._open_until[authority] = state[open_key]
+            return False
+        if tripped_key in state:
+            # only one trial call at a time, the rest fail fast until it succeeds
+            trial_timeout = conf.get("HTTP_CONNECT_TIMEOUT") + conf.get("HTTP_READ_TIMEOUT")
+            return HALF_OPEN if shared_cache.add(self._key(authority, "trial"), 1, timeout=trial_timeout) else False
+        return True
+
+    def success(self, authority: str, allowed: bool | str = True) -> None:
+        if allowed == HALF_OPEN:
+            logger.info(f"Circuit closed for {authority}")
+            shared_cache.delete_many([self._key(authority, name) for name in ("failures", "tripped", "trial")])
+
+    def failure(self, authority: str, allowed: bool | str = True) -> None:
+        if allowed == HALF_OPEN:
+            self._open(authority)
+            return
+
+        key = self._key(authority, "failures")
+        shared_cache.add(key, 0, timeout=conf.get("BREAKER_WINDOW"))
+        try:
+            failures = shared_cache.incr(key)
+        except ValueError:
+            # the window expired in between
+            failures = 1
+            shared_cache.add(key, failures, timeout=conf.get("BREAKER_WINDOW"))
+        if failures >= conf.get("BREAKER_FAILURE_THRESHOLD"):
+            self._open(authority)
+
+    def _open(self, authority: str) -> None:
+        reset_timeout = conf.get("BREAKER_RESET_TIMEOUT")
+        open_until = time.time() + reset_timeout
+        logger.warning(f"Circuit opened for {authority} for {reset_timeout} seconds")
+        shared_cache.set(self._key(authority, "open"), open_until, timeout=reset_timeout)
+        # kept until a trial call succeeds, so that the circuit is half-open once the open key expires
+        shared_cache.set(self._key(authority, "tripped"), 1, timeout=None)
+        shared_cache.delete_many([self._key(authority, "failures"), self._key(authority, "trial")])
+        with self._lock:
+            self._open_until[authority] = open_until
+
+    def clear(self, authority: str = None) -> None:
+        """Close the circuit for authority, or forget this process's view of every circuit."""
+        with self._lock:
+            if authority:
+                self._open_until.pop(authority, None)
+                shared_cache.delete_many([self._key(authority, name) for name in ("open", "tripped", "failures", "trial")])
+            else:
+                self._open_until.clear()
+
+
+breaker = CircuitBreaker()
+
+
+def _before(url: str):
+    if not conf.get("BREAKER_ENABLED"):
+        return None, True
+    authority = _authority(url)
+    allowed = breaker.allow(authority)
+    if not allowed:
+        raise CircuitOpen(authority)
+    return authority, allowed
+
+
+def _after(authority: str, allowed, exception: Exception = None) -> None:
+    if authority is None:
+        return
+    if exception is None:
+        breaker.success(authority, allowed)
+    elif _is_outage(exception):
+        breaker.failure(authority, allowed)
+    else:
+        # the authority answered, even if only to reject the call
+        breaker.success(authority, allowed)
+
+
+def _raise_unavailable(exception: Exception) -> None:
+    """Raise GatewayUnavailable from exception if it means the authority is unavailable, or DeadlineExceeded if the
+    request deadline has passed meanwhile."""
+    if not _is_outage(exception):
+        return
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded(f"Request deadline exceeded: {exception}") from exception
+    raise GatewayUnavailable(str(exception) or type(exception).__name__) from exception
+
+
+@contextmanager
+def guard(url: str):
+    """Send a call to url through the circuit breaker for its authority, raising CircuitOpen while it is open.
+
+    Timeouts, connection errors and server errors from the call are raised as GatewayUnavailable.
+    """
+    check()
+    authority, allowed = _before(url)
+    try:
+        yield
+    except Exception as ex:
+        _after(authority, allowed, ex)
+        _raise_unavailable(ex)
+        raise
+    _after(authority, allowed)
+
+
+@asynccontextmanager
+async def aguard(url: str):
+    """Async version of `guard()`."""
+    check()
+    authority, allowed = await sync_to_async(_before)(url)
+    try:
+        yield
+    except Exception as ex:
+        await sync_to_async(_after)(authority, allowed, ex)
+        _raise_unavailable(ex)
+        raise
+    await sync_to_async(_after)(authority, allowed)
+
+
+_deadline = contextvars.ContextVar("cdt_identity_deadline", default=None)
+
+
+@contextmanager
+def deadline(seconds: float = None):
+    """Give the calls made within this context `seconds` in total, by default `CDT_IDENTITY_REQUEST_DEADLINE`.
+
+    A nested deadline never extends the one it is within.
+    """
+    seconds = conf.get("REQUEST_DEADLINE") if seconds is None else seconds
+    if not seconds:
+        yield
+        return
+
+    at = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(at if current is None else min(at, current))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> float | None:
+    """Seconds left before the current deadline, or None without one."""
+    at = _deadline.get()
+    return None if at is None else at - time.monotonic()
+
+
+def check() -> None:
+    """Raise DeadlineExceeded if the current deadline has passed."""
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+
+
+def timeout(seconds: float | None) -> float | None:
+    """seconds, capped at the time left before the current deadline."""
+    check()
+    left = remaining()
+    if left is None:
+        return seconds
+    return left if seconds is None else min(seconds, left)
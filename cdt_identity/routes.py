@@ -3,6 +3,7 @@ class Routes:
         return f"cdt:{route_fragment}"
 
     authorize = "authorize"
+    backchannel_logout = "backchannel_logout"
     cancel = "cancel"
     login = "login"
     logout = "logout"
@@ -11,6 +12,7 @@ class Routes:
     verify_success = "verify_success"
 
     route_authorize = route(authorize)
+    route_backchannel_logout = route(backchannel_logout)
     route_cancel = route(cancel)
     route_login = route(login)
     route_logout = route(logout)
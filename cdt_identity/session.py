@@ -1,6 +1,27 @@
 from django.http import HttpRequest
 
+from . import conf
+from .cache import client_configs
 from .models import ClientConfig
+from .tokens import id_tokens
+
+# all OIDC information is stored in a single dict under this key in request.session
+KEY = "cdt_identity"
+
+# the values of unset fields in the payload
+DEFAULTS = {
+    "authorize_fail": "",
+    "authorize_success": "",
+    "config": None,
+    "decision": "",
+    "eligibility_claims": "",
+    "expected_claims": "",
+    "scheme": "",
+    "scopes": "",
+    "token": "",
+    "token_id": "",
+    "verified_claims": {},
+}
 
 
 class Session:
@@ -30,6 +51,7 @@ class Session:
 
         self.request = request
         self.session = request.session
+        self._migrated = False
 
         if reset:
             self.oidc_eligibility_claims = ""
@@ -46,87 +68,184 @@ class Session:
         if scopes:
             self.oidc_scopes = scopes
 
+    def _data(self) -> dict:
+        """The OIDC payload in request.session, or a new unsaved one."""
+        data = self.session.get(KEY)
+        if data is None:
+            data = self._migrate()
+        return data
+
+    def _migrate(self) -> dict:
+        """Move OIDC information stored under separate top-level keys by earlier versions into a new payload."""
+        data = {}
+        if self._migrated:
+            return data
+        self._migrated = True
+        for field in DEFAULTS:
+            legacy_key = f"oidc_{field}"
+            if legacy_key in self.session:
+                data[field] = self.session.pop(legacy_key)
+        if data:
+            self.session[KEY] = data
+        return data
+
+    def _get(self, field: str):
+        data = self._data()
+        if field in data:
+            return data[field]
+        default = DEFAULTS[field]
+        return dict(default) if isinstance(default, dict) else default
+
+    def _set(self, field: str, value) -> None:
+        data = self._data()
+        if data.get(field, DEFAULTS[field]) == value:
+            # unchanged, avoid marking the session modified
+            return
+        data[field] = value
+        # (re)assign to store a new payload and mark the session modified
+        self.session[KEY] = data
+
     @property
     def oidc_authorize_fail(self) -> str:
-        return self.session.get("oidc_authorize_fail", "")
+        return self._get("authorize_fail")
 
     @oidc_authorize_fail.setter
     def oidc_authorize_fail(self, value: str) -> None:
-        self.session["oidc_authorize_fail"] = value
+        self._set("authorize_fail", value)
 
     @property
     def oidc_authorize_success(self) -> str:
-        return self.session.get("oidc_authorize_success", "")
+        return self._get("authorize_success")
 
     @oidc_authorize_success.setter
     def oidc_authorize_success(self, value: str) -> None:
-        self.session["oidc_authorize_success"] = value
+        self._set("authorize_success", value)
 
     @property
     def oidc_eligibility_claims(self) -> str:
-        return self.session.get("oidc_eligibility_claims", "")
+        return self._get("eligibility_claims")
 
     @oidc_eligibility_claims.setter
     def oidc_eligibility_claims(self, value: str) -> None:
-        self.session["oidc_eligibility_claims"] = value
+        self._set("eligibility_claims", value)
 
     @property
     def oidc_expected_claims(self) -> str:
-        return self.session.get("oidc_expected_claims", "")
+        return self._get("expected_claims")
 
     @oidc_expected_claims.setter
     def oidc_expected_claims(self, value: str) -> None:
-        self.session["oidc_expected_claims"] = value
+        self._set("expected_claims", value)
 
     @property
     def oidc_verified_claims(self) -> dict:
-        return self.session.get("oidc_verified_claims", {})
+        return self._get("verified_claims")
 
     @oidc_verified_claims.setter
     def oidc_verified_claims(self, value: dict) -> None:
-        self.session["oidc_verified_claims"] = value
+        self._set("verified_claims", value)
 
     @property
     def oidc_config(self) -> ClientConfig:
-        val = self.session.get("oidc_config")
-        return ClientConfig.objects.filter(id=val).first()
+        return client_configs.get(id=self._get("config"))
+
+    async def aload(self) -> None:
+        """Load this request's session data, so that the properties do not block when called from async views."""
+        await self.session.aget(KEY)
+
+    async def aoidc_config(self) -> ClientConfig:
+        """Async version of the `oidc_config` property, safe to call from async views.
+
+        Also loads this request's session data, so the other properties do not block afterwards.
+        """
+        await self.aload()
+        return await client_configs.aget(id=self._get("config"))
 
     @oidc_config.setter
     def oidc_config(self, value: ClientConfig) -> None:
-        self.session["oidc_config"] = value.id
+        self._set("config", value.id)
+
+    @property
+    def oidc_decision(self) -> str:
+        """The key of the eligibility decision made for this session, see `cdt_identity.decisions`."""
+        return self._get("decision")
+
+    @oidc_decision.setter
+    def oidc_decision(self, value: str) -> None:
+        self._set("decision", value)
 
     @property
     def oidc_scheme(self) -> str:
-        return self.session.get("oidc_scheme", "")
+        return self._get("scheme")
 
     @oidc_scheme.setter
     def oidc_scheme(self, value: str) -> None:
-        self.session["oidc_scheme"] = value
+        self._set("scheme", value)
 
     @property
     def oidc_scopes(self) -> str:
-        return self.session.get("oidc_scopes", "")
+        return self._get("scopes")
 
     @oidc_scopes.setter
     def oidc_scopes(self, value: str) -> None:
-        self.session["oidc_scopes"] = value
+        self._set("scopes", value)
 
     @property
     def oidc_token(self) -> str:
-        return self.session.get("oidc_token", "")
+        """The id_token, loaded from `cdt_identity.tokens` if it is stored there."""
+        handle = self._get("token_id")
+        return id_tokens.get(handle) if handle else self._get("token")
+
+    async def aoidc_token(self) -> str:
+        """Async version of the `oidc_token` property."""
+        handle = self._get("token_id")
+        return await id_tokens.aget(handle) if handle else self._get("token")
 
     @oidc_token.setter
     def oidc_token(self, value: str) -> None:
-        self.session["oidc_token"] = value
+        handle = self._get("token_id")
+        if handle:
+            id_tokens.delete(handle)
+        if value and conf.get("ID_TOKEN_STORE"):
+            self._set_token(id_tokens.put(value), "")
+        else:
+            self._set_token("", value)
+
+    async def aset_oidc_token(self, value: str) -> None:
+        """Async version of the `oidc_token` setter."""
+        handle = self._get("token_id")
+        if handle:
+            await id_tokens.adelete(handle)
+        if value and conf.get("ID_TOKEN_STORE"):
+            self._set_token(await id_tokens.aput(value), "")
+        else:
+            self._set_token("", value)
+
+    def _set_token(self, handle: str, token: str) -> None:
+        # the session keeps either a handle to the stored id_token, or the id_token itself
+        self._set("token_id", handle)
+        self._set("token", token)
 
     def clear_oidc_token(self):
         """Reset the session claims and token."""
         self.oidc_token = ""
         self.oidc_verified_claims = {}
 
+    async def aclear_oidc_token(self):
+        """Async version of `clear_oidc_token()`."""
+        await self.aset_oidc_token("")
+        self.oidc_verified_claims = {}
+
     def has_oidc_token(self):
-        """Return True if this session has an OIDC token. False otherwise."""
-        return bool(self.oidc_token)
+        """Return True if this session has an OIDC token. False otherwise, without loading the token.
+
+        A token in `cdt_identity.tokens` may expire before a session that is kept alive by each request, so it is only
+        counted while it has not.
+        """
+        handle = self._get("token_id")
+        if handle:
+            return id_tokens.exists(handle)
+        return bool(self._get("token"))
 
     def has_oidc_verified_claims(self):
         """Return True if this session has verified claims. False otherwise."""
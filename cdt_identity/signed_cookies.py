@@ -0,0 +1,267 @@
+"""
+A session engine keeping the whole session in a signed, compressed cookie, packed compactly for the OIDC flow.
+
+For deployments that only run the login, authorize and logout flow. Configure with::
+
+    SESSION_ENGINE = "cdt_identity.signed_cookies"
+    # keep the id_token and each login's state in the cookie too, so the flow needs no server-side storage
+    CDT_IDENTITY_ID_TOKEN_STORE = False
+    CDT_IDENTITY_TRANSACTION_STORE = None
+
+Like `django.contrib.sessions.backends.signed_cookies`, the session is signed with SECRET_KEY and compressed, and the
+same caveats apply: a cookie can't be revoked before it expires, and SECRET_KEY must stay secret.
+
+Rather than JSON, the session is packed by `OIDCSessionSerializer`: known keys, e.g. the names of the fields of
+`cdt_identity.session.Session`, are a byte each, and JWTs, e.g. the id_token, are stored as their decoded bytes.
+"""
+
+import base64
+import logging
+import re
+import struct
+
+from django.contrib.sessions.backends import signed_cookies
+from django.core import signing
+
+logger = logging.getLogger(__name__)
+
+SALT = "cdt_identity.signed_cookies"
+
+# the largest cookie browsers are required to accept, including its name and attributes, less some room for them
+MAX_COOKIE_SIZE = 4000
+
+VERSION = 1
+
+# strings packed as their index; only ever append to this list, it is part of the format of VERSION
+WORDS = [
+    # cdt_identity.session
+    "cdt_identity",
+    "authorize_fail",
+    "authorize_success",
+    "config",
+    "eligibility_claims",
+    "expected_claims",
+    "scheme",
+    "scopes",
+    "token",
+    "token_id",
+    "verified_claims",
+    # Authlib's state data
+    "data",
+    "exp",
+    "nonce",
+    "code_verifier",
+    "redirect_uri",
+    # django.contrib.auth
+    "_auth_user_id",
+    "_auth_user_backend",
+    "_auth_user_hash",
+    "django.contrib.auth.backends.ModelBackend",
+    # common values
+    "",
+    "1",
+    # added to cdt_identity.session
+    "decision",
+]
+_WORD_INDEX = {word: index for index, word in enumerate(WORDS)}
+
+# Authlib's state data that is never read back, e.g. the authorization URL the user was already redirected to
+_UNUSED_STATE_DATA = {"url"}
+_STATE_PREFIX = "_state_"
+
+NONE, TRUE, FALSE, INT, FLOAT, STR, WORD, JWT, LIST, DICT = range(10)
+
+_JWT = re.compile(r"^[A-Za-z0-9_-]+\.[A-Za-z0-9_-]+\.[A-Za-z0-9_-]*$")
+
+
+def _b64decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _jwt_segments(value: str):
+    """The decoded segments of value if it is a JWT that is reproduced exactly by encoding them again, else None."""
+    if not _JWT.match(value):
+        return None
+    try:
+        segments = [_b64decode(segment) for segment in value.split(".")]
+    except ValueError:
+        return None
+    if ".".join(_b64encode(segment) for segment in segments) != value:
+        return None
+    return segments
+
+
+def _varint(out: bytearray, number: int) -> None:
+    while number >= 0x80:
+        out.append(number & 0x7F | 0x80)
+        number >>= 7
+    out.append(number)
+
+
+def _bytes(out: bytearray, data: bytes) -> None:
+    _varint(out, len(data))
+    out += data
+
+
+def _pack(out: bytearray, value) -> None:
+    if value is None:
+        out.append(NONE)
+    elif value is True:
+        out.append(TRUE)
+    elif value is False:
+        out.append(FALSE)
+    elif isinstance(value, int):
+        out.append(INT)
+        # zigzag, so small negative numbers are small too
+        _varint(out, value * 2 if value >= 0 else -value * 2 - 1)
+    elif isinstance(value, float):
+        out.append(FLOAT)
+        out += struct.pack(">d", value)
+    elif isinstance(value, str):
+        _pack_str(out, value)
+    elif isinstance(value, (list, tuple)):
+        out.append(LIST)
+        _varint(out, len(value))
+        for item in value:
+            _pack(out, item)
+    elif isinstance(value, dict):
+        out.append(DICT)
+        _varint(out, len(value))
+        for key, item in value.items():
+            if not isinstance(key, str):
+                raise TypeError(f"Session keys must be str, not {type(key).__name__}")
+            _pack_str(out, key)
+            _pack(out, item)
+    else:
+        raise TypeError(f"Object of type {type(value).__name__} can't be stored in the session")
+
+
+def _pack_str(out: bytearray, value: str) -> None:
+    index = _WORD_INDEX.get(value)
+    if index is not None:
+        out.append(WORD)
+        out.append(index)
+        return
+    segments = _jwt_segments(value)
+    if segments:
+        out.append(JWT)
+        for segment in segments:
+            _bytes(out, segment)
+        return
+    out.append(STR)
+    _bytes(out, value.encode())
+
+
+class _Reader:
+
+    def __init__(self, data: bytes):
+        self.data = memoryview(data)
+        self.position = 0
+
+    def byte(self) -> int:
+        value = self.data[self.position]
+        self.position += 1
+        return value
+
+    def varint(self) -> int:
+        number = shift = 0
+        while True:
+            byte = self.byte()
+            number |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return number
+            shift += 7
+
+    def bytes(self, length: int = None) -> bytes:
+        length = self.varint() if length is None else length
+        start, end = self.position, self.position + length
+        if end > len(self.data):
+            raise ValueError("Truncated session data")
+        self.position = end
+        return bytes(self.data[start:end])
+
+    def value(self):
+        tag = self.byte()
+        if tag == NONE:
+            return None
+        if tag == TRUE:
+            return True
+        if tag == FALSE:
+            return False
+        if tag == INT:
+            number = self.varint()
+            return number // 2 if number % 2 == 0 else -(number + 1) // 2
+        if tag == FLOAT:
+            return struct.unpack(">d", self.bytes(8))[0]
+        if tag == STR:
+            return self.bytes().decode()
+        if tag == WORD:
+            return WORDS[self.byte()]
+        if tag == JWT:
+            return ".".join(_b64encode(self.bytes()) for _ in range(3))
+        if tag == LIST:
+            return [self.value() for _ in range(self.varint())]
+        if tag == DICT:
+            return {self.value(): self.value() for _ in range(self.varint())}
+        raise ValueError(f"Unknown tag in session data: {tag}")
+
+
+def _without_unused_state(session: dict) -> dict:
+    """session without Authlib's state data that is never read back."""
+    if not any(key.startswith(_STATE_PREFIX) for key in session):
+        return session
+    session = dict(session)
+    for key, value in session.items():
+        if key.startswith(_STATE_PREFIX) and isinstance(value, dict) and isinstance(value.get("data"), dict):
+            data = {name: item for name, item in value["data"].items() if name not in _UNUSED_STATE_DATA}
+            session[key] = dict(value, data=data)
+    return session
+
+
+class OIDCSessionSerializer:
+    """Packs a session dict of JSON types into bytes, for `django.core.signing`."""
+
+    def dumps(self, obj) -> bytes:
+        out = bytearray([VERSION])
+        _pack(out, _without_unused_state(obj))
+        return bytes(out)
+
+    def loads(self, data: bytes):
+        reader = _Reader(data)
+        if reader.byte() != VERSION:
+            raise ValueError("Unknown session data version")
+        value = reader.value()
+        if reader.position != len(reader.data):
+            raise ValueError("Trailing session data")
+        return value
+
+
+class SessionStore(signed_cookies.SessionStore):
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        # in place of SESSION_SERIALIZER
+        self.serializer = OIDCSessionSerializer
+
+    def load(self):
+        try:
+            return signing.loads(
+                self.session_key,
+                serializer=self.serializer,
+                max_age=self.get_session_cookie_age(),
+                salt=SALT,
+            )
+        except Exception:
+            # a bad signature, or data in another format; start a new session
+            self.create()
+        return {}
+
+    def _get_session_key(self):
+        session_key = signing.dumps(self._session, compress=True, salt=SALT, serializer=self.serializer)
+        if len(session_key) > MAX_COOKIE_SIZE:
+            logger.warning(f"Session cookie of {len(session_key)} bytes may be too large for browsers to keep")
+        return session_key
@@ -0,0 +1,356 @@
+"""
+A stub Identity Gateway for load and integration testing, without a real authority or a network.
+
+`StubGateway` is a WSGI app serving discovery metadata, JWKS, authorize, token, userinfo and end_session endpoints. It
+signs id_tokens with a key generated at startup, and returns the configured claims. Use it:
+
+* in-process, by mounting `gateway.adapter()` on the shared transport, e.g.
+  `transport.close(); transport._adapter = gateway.adapter()`
+* in a thread, with `gateway.serve()` and a ClientConfig whose authority is `gateway.authority`
+* under any WSGI server
+
+`gateway.replica(authority)` makes another node of the same gateway, e.g. for a ClientConfig's fallback authorities.
+"""
+
+import base64
+import hashlib
+import io
+import json
+import random
+import secrets
+import threading
+import time
+from http import HTTPStatus
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs, unquote, urlencode, urlsplit
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+import requests
+from joserfc import jwt
+from joserfc.jwk import KeySet, RSAKey
+from requests.adapters import BaseAdapter
+
+
+class StubGateway:
+    """An Identity Gateway stub for `authority`.
+
+    Args:
+        authority (str): The base URL the endpoints are served from.
+
+        claims (dict): The claims returned in id_tokens and from userinfo, e.g. `{"eligible": "true"}` or an error code
+        like `{"eligible": "10"}`.
+
+        latency (float): Seconds to wait before every response.
+
+        jitter (float): Up to this many more seconds, chosen at random, to wait before every response.
+
+        failure_rate (float): The fraction of requests, from 0 to 1, answered with a 503 error.
+
+        token_error (str): An OAuth error code, e.g. `invalid_grant`, to answer every token request with.
+
+        token_ttl (int): Seconds until issued id_tokens expire.
+
+        seed (int): Seeds the random jitter and failures, for repeatable runs.
+    """
+
+    def __init__(
+        self,
+        authority: str = "https://identity-gateway.test",
+        claims: dict = None,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        failure_rate: float = 0.0,
+        token_error: str = None,
+        token_ttl: int = 300,
+        seed: int = None,
+    ):
+        self.authority = authority.rstrip("/")
+        self.issuer = None
+        self.claims = claims or {}
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.token_error = token_error
+        self.token_ttl = token_ttl
+        self.key = RSAKey.generate_key(2048, parameters={"kid": secrets.token_hex(8), "use": "sig"}, private=True)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        # code -> authorization request, access_token -> claims
+        self._codes = {}
+        self._access_tokens = {}
+        self._routes = {
+            "/.well-known/openid-configuration": self.discovery,
+            "/jwks": self.jwks,
+            "/authorize": self.authorize,
+            "/token": self.token,
+            "/userinfo": self.userinfo,
+            "/logout": self.end_session,
+        }
+
+    def replica(self, authority: str, **kwargs) -> "StubGateway":
+        """Another node of this gateway at `authority`, sharing its issuer, key, claims, codes and access tokens.
+
+        Keyword arguments, e.g. `latency`, set the replica's own behavior.
+        """
+        replica = StubGateway(authority, claims=self.claims, token_ttl=self.token_ttl, **kwargs)
+        replica.issuer = self.issuer or self.authority
+        replica.key = self.key
+        replica._lock = self._lock
+        replica._codes = self._codes
+        replica._access_tokens = self._access_tokens
+        return replica
+
+    @property
+    def metadata(self) -> dict:
+        return {
+            "issuer": self.issuer or self.authority,
+            "authorization_endpoint": f"{self.authority}/authorize",
+            "token_endpoint": f"{self.authority}/token",
+            "userinfo_endpoint": f"{self.authority}/userinfo",
+            "jwks_uri": f"{self.authority}/jwks",
+            "end_session_endpoint": f"{self.authority}/logout",
+            "response_types_supported": ["code"],
+            "subject_types_supported": ["public"],
+            "id_token_signing_alg_values_supported": ["RS256"],
+            "code_challenge_methods_supported": ["S256"],
+            "backchannel_logout_supported": True,
+            "backchannel_logout_session_supported": True,
+        }
+
+    def __call__(self, environ, start_response):
+        self._delay()
+
+        route = self._routes.get(environ.get("PATH_INFO", ""))
+        if self._fail():
+            status, headers, body = self._json(503, {"error": "temporarily_unavailable"})
+        elif route is None:
+            status, headers, body = self._json(404, {"error": "not_found"})
+        else:
+            status, headers, body = route(environ)
+
+        start_response(f"{status} {HTTPStatus(status).phrase}", headers)
+        return [body]
+
+    def _delay(self) -> None:
+        delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+
+    def _fail(self) -> bool:
+        return self.failure_rate > 0 and self._random.random() < self.failure_rate
+
+    def _json(self, status: int, data: dict):
+        return status, [("Content-Type", "application/json"), ("Cache-Control", "no-store")], json.dumps(data).encode()
+
+    def _redirect(self, location: str):
+        return 302, [("Location", location)], b""
+
+    def _query(self, environ) -> dict:
+        return {k: v[0] for k, v in parse_qs(environ.get("QUERY_STRING", "")).items()}
+
+    def _form(self, environ) -> dict:
+        length = int(environ.get("CONTENT_LENGTH") or 0)
+        body = environ["wsgi.input"].read(length).decode() if length else ""
+        return {k: v[0] for k, v in parse_qs(body).items()}
+
+    def id_token(self, client_id: str, nonce: str = None, claims: dict = None) -> str:
+        """Sign an id_token for client_id with the given (or configured) claims."""
+        now = int(time.time())
+        payload = {
+            "iss": self.issuer or self.authority,
+            "sub": "stub-user",
+            "aud": client_id,
+            "iat": now,
+            "exp": now + self.token_ttl,
+        }
+        if nonce:
+            payload["nonce"] = nonce
+        payload.update(self.claims if claims is None else claims)
+        return jwt.encode({"alg": "RS256", "kid": self.key.kid}, payload, self.key)
+
+    def logout_token(self, client_id: str, sub: str = "stub-user", sid: str = None, **claims) -> str:
+        """Sign a back-channel logout token for client_id, ending the sessions of sub, or of the gateway session sid."""
+        payload = {
+            "iss": self.issuer or self.authority,
+            "aud": client_id,
+            "iat": int(time.time()),
+            "jti": secrets.token_hex(8),
+            "events": {"http://schemas.openid.net/event/backchannel-logout": {}},
+        }
+        if sub:
+            payload["sub"] = sub
+        if sid:
+            payload["sid"] = sid
+        payload.update(claims)
+        return jwt.encode({"alg": "RS256", "kid": self.key.kid, "typ": "logout+jwt"}, payload, self.key)
+
+    def discovery(self, environ):
+        return self._json(200, self.metadata)
+
+    def jwks(self, environ):
+        return self._json(200, KeySet([self.key]).as_dict(private=False))
+
+    def authorize(self, environ):
+        """Authenticate immediately, redirecting back to the client with a code for the configured claims."""
+        params = self._query(environ)
+        redirect_uri, state = params.get("redirect_uri"), params.get("state")
+        if not redirect_uri or not params.get("client_id"):
+            return self._json(400, {"error": "invalid_request"})
+
+        code = secrets.token_urlsafe(16)
+        with self._lock:
+            self._codes[code] = params
+        query = {"code": code}
+        if state:
+            query["state"] = state
+        separator = "&" if "?" in redirect_uri else "?"
+        return self._redirect(f"{redirect_uri}{separator}{urlencode(query)}")
+
+    def _client_id(self, environ, form: dict) -> str:
+        authorization = environ.get("HTTP_AUTHORIZATION", "")
+        if authorization.startswith("Basic "):
+            return unquote(base64.b64decode(authorization[6:]).decode().split(":", 1)[0])
+        return form.get("client_id")
+
+    def _verify_pkce(self, request: dict, verifier: str) -> bool:
+        challenge = request.get("code_challenge")
+        if not challenge:
+            return True
+        if not verifier:
+            return False
+        digest = hashlib.sha256(verifier.encode()).digest()
+        return base64.urlsafe_b64encode(digest).rstrip(b"=").decode() == challenge
+
+    def token(self, environ):
+        """Exchange a code from `authorize` for an access_token and a signed id_token."""
+        if self.token_error:
+            return self._json(400, {"error": self.token_error})
+
+        form = self._form(environ)
+        with self._lock:
+            request = self._codes.pop(form.get("code"), None)
+
+        if request is None or form.get("grant_type") != "authorization_code":
+            return self._json(400, {"error": "invalid_grant"})
+        if self._client_id(environ, form) != request["client_id"] or form.get("redirect_uri") != request["redirect_uri"]:
+            return self._json(400, {"error": "invalid_grant"})
+        if not self._verify_pkce(request, form.get("code_verifier")):
+            return self._json(400, {"error": "invalid_grant", "error_description": "PKCE verification failed"})
+
+        access_token = secrets.token_urlsafe(16)
+        claims = dict(self.claims)
+        with self._lock:
+            self._access_tokens[access_token] = claims
+
+        return self._json(
+            200,
+            {
+                "access_token": access_token,
+                "token_type": "Bearer",
+                "expires_in": self.token_ttl,
+                "scope": request.get("scope", "openid"),
+                # a new gateway session for every login
+                "id_token": self.id_token(request["client_id"], request.get("nonce"), dict(claims, sid=secrets.token_hex(8))),
+            },
+        )
+
+    def userinfo(self, environ):
+        authorization = environ.get("HTTP_AUTHORIZATION", "")
+        with self._lock:
+            claims = self._access_tokens.get(authorization.removeprefix("Bearer "))
+        if claims is None:
+            return self._json(401, {"error": "invalid_token"})
+        return self._json(200, {"sub": "stub-user", **claims})
+
+    def end_session(self, environ):
+        params = self._query(environ)
+        if params.get("post_logout_redirect_uri"):
+            return self._redirect(params["post_logout_redirect_uri"])
+        return self._json(200, {})
+
+    def adapter(self, *replicas: "StubGateway") -> "StubAdapter":
+        """A requests adapter that sends requests straight to this gateway's WSGI app, or to that of the replica whose
+        authority they are for."""
+        return StubAdapter(self, *replicas)
+
+    def serve(self, host: str = "127.0.0.1", port: int = 0) -> "StubServer":
+        """Serve this gateway over HTTP from a daemon thread, on a free port by default.
+
+        `authority` is updated to the server's URL.
+        """
+        server = make_server(host, port, self, server_class=StubServer, handler_class=_QuietHandler)
+        self.authority = f"http://{host}:{server.server_port}"
+        server.thread = threading.Thread(target=server.serve_forever, daemon=True)
+        server.thread.start()
+        return server
+
+
+class StubServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+    thread = None
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+class _QuietHandler(WSGIRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubAdapter(BaseAdapter):
+    """Dispatches requests to a StubGateway's WSGI app in-process, without a network.
+
+    Given several gateways, each request goes to the one whose authority it is for, or else the first.
+    """
+
+    def __init__(self, gateway: StubGateway, *replicas: StubGateway):
+        super().__init__()
+        self.gateway = gateway
+        self.replicas = replicas
+
+    def _gateway(self, url: str) -> StubGateway:
+        for replica in self.replicas:
+            if url.startswith(f"{replica.authority}/"):
+                return replica
+        return self.gateway
+
+    def send(self, request, **kwargs):
+        url = urlsplit(request.url)
+        body = request.body or b""
+        if isinstance(body, str):
+            body = body.encode()
+
+        environ = {
+            "REQUEST_METHOD": request.method,
+            "PATH_INFO": url.path,
+            "QUERY_STRING": url.query,
+            "CONTENT_LENGTH": str(len(body)),
+            "CONTENT_TYPE": request.headers.get("Content-Type", ""),
+            "SERVER_NAME": url.hostname,
+            "SERVER_PORT": str(url.port or (443 if url.scheme == "https" else 80)),
+            "wsgi.input": io.BytesIO(body),
+            "wsgi.url_scheme": url.scheme,
+        }
+        for name, value in request.headers.items():
+            environ[f"HTTP_{name.upper().replace('-', '_')}"] = value
+
+        response = requests.Response()
+
+        def start_response(status, headers):
+            response.status_code = int(status.split()[0])
+            response.headers.update(headers)
+
+        response._content = b"".join(self._gateway(request.url)(environ, start_response))
+        response.request = request
+        response.url = request.url
+        response.encoding = "utf-8"
+        return response
+
+    def close(self):
+        pass
+
+    def shutdown(self):
+        pass
@@ -0,0 +1,82 @@
+"""
+id_tokens kept for logout in the database, rather than in the session.
+
+The session keeps only a short handle to its id_token, which is only loaded when it is needed as the logout
+`id_token_hint`. Stored id_tokens expire after `CDT_IDENTITY_ID_TOKEN_TTL` seconds, by default the session cookie age;
+expired ones are deleted by the `identity_purge_tokens` management command.
+
+Enable with `CDT_IDENTITY_ID_TOKEN_STORE = True`.
+"""
+
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import conf
+from .models import IdToken
+
+# rows deleted at a time by purge()
+PURGE_BATCH_SIZE = 1000
+
+
+def _expires():
+    ttl = conf.get("ID_TOKEN_TTL") or settings.SESSION_COOKIE_AGE
+    return timezone.now() + timedelta(seconds=ttl)
+
+
+def _new(token: str) -> IdToken:
+    return IdToken(handle=secrets.token_urlsafe(16), token=token, expires=_expires())
+
+
+class IdTokenStore:
+
+    def put(self, token: str) -> str:
+        """Store token, returning its handle."""
+        id_token = _new(token)
+        id_token.save(force_insert=True)
+        return id_token.handle
+
+    async def aput(self, token: str) -> str:
+        """Async version of `put()`."""
+        id_token = _new(token)
+        await id_token.asave(force_insert=True)
+        return id_token.handle
+
+    def _live(self, handle: str):
+        return IdToken.objects.filter(handle=handle, expires__gt=timezone.now())
+
+    def get(self, handle: str) -> str:
+        """The token stored under handle, or "" if it is unknown or expired."""
+        id_token = self._live(handle).only("token").first()
+        return id_token.token if id_token else ""
+
+    def exists(self, handle: str) -> bool:
+        """True if a token is stored under handle and has not expired, without loading it."""
+        return self._live(handle).exists()
+
+    async def aget(self, handle: str) -> str:
+        """Async version of `get()`."""
+        id_token = await self._live(handle).only("token").afirst()
+        return id_token.token if id_token else ""
+
+    def delete(self, handle: str) -> None:
+        IdToken.objects.filter(handle=handle).delete()
+
+    async def adelete(self, handle: str) -> None:
+        await IdToken.objects.filter(handle=handle).adelete()
+
+    def purge(self, batch_size: int = None, now=None) -> int:
+        """Delete expired tokens, batch_size at a time so no one delete locks many rows. Returns the number deleted."""
+        batch_size = batch_size or PURGE_BATCH_SIZE
+        expired = IdToken.objects.filter(expires__lte=now or timezone.now())
+        deleted = 0
+        while True:
+            handles = list(expired.values_list("handle", flat=True)[:batch_size])
+            if not handles:
+                return deleted
+            deleted += IdToken.objects.filter(handle__in=handles).delete()[0]
+
+
+id_tokens = IdTokenStore()
@@ -0,0 +1,111 @@
+"""
+Tracing spans around the views' calls to an Identity Gateway.
+
+Spans go to OpenTelemetry when the `opentelemetry-api` package is installed, e.g.
+`pip install django-cdt-identity[tracing]`, and are no-ops otherwise or with `CDT_IDENTITY_TRACING_ENABLED = False`.
+Name a class like `OpenTelemetryTracer` in `CDT_IDENTITY_TRACER` to send them elsewhere.
+
+Spans carry `cdt_identity.*` attributes such as authority, scheme and cache hit or miss, and `http.response.status_code`
+for each response from an Identity Gateway.
+"""
+
+import logging
+from contextlib import nullcontext
+
+from django.utils.module_loading import import_string
+
+from . import conf
+
+logger = logging.getLogger(__name__)
+
+_NULL = nullcontext()
+
+AUTHORITY = "cdt_identity.authority"
+CLIENT_NAME = "cdt_identity.client_name"
+SCHEME = "cdt_identity.scheme"
+HTTP_STATUS = "http.response.status_code"
+HIT = "hit"
+MISS = "miss"
+
+
+class NoopTracer:
+
+    def span(self, name: str, attributes: dict):
+        return _NULL
+
+    def set_attributes(self, attributes: dict) -> None:
+        pass
+
+
+class OpenTelemetryTracer:
+    """Opens spans with the tracer provider configured in OpenTelemetry."""
+
+    def __init__(self):
+        from opentelemetry import trace
+
+        self._trace = trace
+        self._tracer = trace.get_tracer("cdt_identity")
+
+    def span(self, name: str, attributes: dict):
+        return self._tracer.start_as_current_span(f"cdt_identity.{name}", attributes=attributes)
+
+    def set_attributes(self, attributes: dict) -> None:
+        span = self._trace.get_current_span()
+        if span.is_recording():
+            span.set_attributes(attributes)
+
+
+_tracers = {}
+
+
+def _create(path: str):
+    if path:
+        return import_string(path)()
+    try:
+        return OpenTelemetryTracer()
+    except ImportError:
+        logger.debug("opentelemetry is not installed, tracing is disabled")
+        return NoopTracer()
+
+
+def tracer():
+    """The configured tracer, created on first use."""
+    if not conf.get("TRACING_ENABLED"):
+        return _noop
+    path = conf.get("TRACER")
+    if path not in _tracers:
+        _tracers[path] = _create(path)
+    return _tracers[path]
+
+
+def _attributes(attributes: dict) -> dict:
+    return {key: value for key, value in (attributes or {}).items() if value is not None}
+
+
+def span(name: str, attributes: dict = None):
+    """Open a span named `cdt_identity.{name}` as the current span, with the given (non-None) attributes."""
+    return tracer().span(name, _attributes(attributes))
+
+
+def set_attributes(attributes: dict) -> None:
+    """Set the given (non-None) attributes on the current span, if it is being recorded."""
+    tracer().set_attributes(_attributes(attributes))
+
+
+def cache_result(name: str, hit: bool) -> None:
+    """Record on the current span whether the named cache, e.g. `metadata`, had what was needed."""
+    set_attributes({f"cdt_identity.{name}.cache": HIT if hit else MISS})
+
+
+def record_response(response, *args, **kwargs):
+    """A requests response hook, recording the status of a response on the current span."""
+    set_attributes({HTTP_STATUS: response.status_code})
+    return response
+
+
+async def arecord_response(response):
+    """An httpx response event hook, recording the status of a response on the current span."""
+    set_attributes({HTTP_STATUS: response.status_code})
+
+
+_noop = NoopTracer()
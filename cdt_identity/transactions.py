@@ -0,0 +1,82 @@
+"""
+OIDC transaction state (`state`, `nonce`, PKCE `code_verifier`) kept in Django's cache rather than `request.session`.
+
+Authlib keeps the data of each authorization request, from `authorize_redirect` until the callback, in the session,
+costing a session write on login and another on the callback. `CacheTransactionStore` keeps it in Django's cache instead,
+for `CDT_IDENTITY_TRANSACTION_TTL` seconds, bound to the session it was created for, and consumed by the first read.
+
+Used by the clients from `cdt_identity.client.create_client` with
+`CDT_IDENTITY_TRANSACTION_STORE = "cdt_identity.transactions.CacheTransactionStore"`. The cache must be shared by every
+process serving the app, e.g. Redis or Memcached rather than Django's default local-memory cache, since the callback
+may reach a different process than the login.
+"""
+
+import hashlib
+
+from authlib.integrations.django_client.integration import DjangoIntegration
+from django.core.cache import cache as shared_cache
+
+from . import conf
+
+KEY_PREFIX = "cdt_identity:transaction"
+
+
+def _session_id(session) -> str:
+    return hashlib.sha256(str(session.session_key).encode()).hexdigest()
+
+
+class CacheTransactionStore(DjangoIntegration):
+    """Authlib framework integration storing state data in Django's cache, keyed by client name and state.
+
+    The `a`-prefixed methods are async versions, used by `cdt_identity.async_client.AsyncOAuth2App`.
+    """
+
+    def _key(self, state: str) -> str:
+        return f"{KEY_PREFIX}:{self.name}:{state}"
+
+    def _entry(self, session, data) -> dict:
+        return {"data": data, "session": _session_id(session)}
+
+    def _matches(self, session, entry) -> bool:
+        # a state is only valid in the session that started the authorization request
+        return entry is not None and entry["session"] == _session_id(session)
+
+    def set_state_data(self, session, state, data):
+        if session.session_key is None:
+            # a new session needs its key to bind the state to
+            session.save()
+        shared_cache.set(self._key(state), self._entry(session, data), timeout=conf.get("TRANSACTION_TTL"))
+
+    async def aset_state_data(self, session, state, data):
+        if session.session_key is None:
+            await session.asave()
+        await shared_cache.aset(self._key(state), self._entry(session, data), timeout=conf.get("TRANSACTION_TTL"))
+
+    def get_state_data(self, session, state):
+        """Return the data for state once: the read that deletes it wins, any concurrent or later read gets None.
+
+        A read from another session gets None, leaving the data for the session it belongs to.
+        """
+        if not state or session.session_key is None:
+            return None
+        key = self._key(state)
+        entry = shared_cache.get(key)
+        if not self._matches(session, entry) or not shared_cache.delete(key):
+            return None
+        return entry["data"]
+
+    async def aget_state_data(self, session, state):
+        if not state or session.session_key is None:
+            return None
+        key = self._key(state)
+        entry = await shared_cache.aget(key)
+        if not self._matches(session, entry) or not await shared_cache.adelete(key):
+            return None
+        return entry["data"]
+
+    def clear_state_data(self, session, state):
+        # consumed by get_state_data already
+        shared_cache.delete(self._key(state))
+
+    async def aclear_state_data(self, session, state):
+        await shared_cache.adelete(self._key(state))
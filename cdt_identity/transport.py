@@ -0,0 +1,158 @@
+"""
+Pooled, keep-alive HTTP transport shared by every call to an Identity Gateway.
+
+All clients registered by `cdt_identity.client.create_client`, and the metadata and JWKS caches, send their requests
+through the same connection pools, so calls to an authority reuse warm TLS connections. Pools are kept per host, i.e.
+per authority, and sized by the `CDT_IDENTITY_HTTP_*` settings.
+"""
+
+import asyncio
+import threading
+import weakref
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import conf, resilience, tracing
+
+
+class PooledAdapter(HTTPAdapter):
+    """An HTTPAdapter whose connection pools outlive the sessions it is mounted on."""
+
+    def close(self):
+        # Authlib closes its session after every call, keep the pooled connections open for the next one
+        pass
+
+    def shutdown(self):
+        super().close()
+
+
+class PooledAsyncTransport:
+    """Wraps an httpx.AsyncHTTPTransport per event loop so that its connection pool outlives the clients it is given to.
+
+    Pooled connections belong to the loop that opened them, e.g. each `async_to_sync` call under WSGI runs a new loop.
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self._lock = threading.Lock()
+        self._transports = weakref.WeakKeyDictionary()
+
+    @property
+    def transport(self):
+        """The httpx transport of the running event loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            transport = self._transports.get(loop)
+            if transport is None:
+                transport = self._transports[loop] = self.factory()
+            return transport
+
+    async def handle_async_request(self, request):
+        return await self.transport.handle_async_request(request)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        # httpx closes the transport with its client, keep the pooled connections open for the next one
+        pass
+
+    async def aclose(self):
+        pass
+
+    async def shutdown(self):
+        """Close the connection pool of the running event loop; it is recreated on next use."""
+        with self._lock:
+            transport = self._transports.pop(asyncio.get_running_loop(), None)
+        if transport is not None:
+            await transport.aclose()
+
+
+class Transport:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._adapter = None
+        self._session = None
+        self._async_transport = None
+
+    def timeout(self) -> tuple:
+        """The (connect, read) timeout in seconds for calls to an Identity Gateway, capped by the request deadline."""
+        return (resilience.timeout(conf.get("HTTP_CONNECT_TIMEOUT")), resilience.timeout(conf.get("HTTP_READ_TIMEOUT")))
+
+    def adapter(self) -> PooledAdapter:
+        """The shared adapter holding a connection pool per authority."""
+        with self._lock:
+            if self._adapter is None:
+                self._adapter = PooledAdapter(
+                    pool_connections=conf.get("HTTP_POOL_AUTHORITIES"),
+                    pool_maxsize=conf.get("HTTP_POOL_MAX_CONNECTIONS"),
+                    pool_block=conf.get("HTTP_POOL_BLOCK"),
+                    max_retries=conf.get("HTTP_MAX_RETRIES"),
+                )
+            return self._adapter
+
+    def mount(self, session: requests.Session) -> requests.Session:
+        """Route the session's requests through the shared connection pools, recording responses on the current span."""
+        adapter = self.adapter()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.hooks["response"].append(tracing.record_response)
+        return session
+
+    def session(self) -> requests.Session:
+        """A shared session for unauthenticated calls, e.g. discovery metadata and JWKS."""
+        with self._lock:
+            session = self._session
+        if session is None:
+            session = self.mount(requests.Session())
+            with self._lock:
+                self._session = self._session or session
+                session = self._session
+        return session
+
+    def async_transport(self) -> PooledAsyncTransport:
+        """The shared httpx transport for async clients, requires httpx."""
+        import httpx
+
+        with self._lock:
+            if self._async_transport is None:
+                limits = httpx.Limits(
+                    max_connections=conf.get("HTTP_POOL_AUTHORITIES") * conf.get("HTTP_POOL_MAX_CONNECTIONS"),
+                    max_keepalive_connections=conf.get("HTTP_POOL_MAX_CONNECTIONS"),
+                    keepalive_expiry=conf.get("HTTP_KEEPALIVE_EXPIRY"),
+                )
+                retries = conf.get("HTTP_MAX_RETRIES")
+                self._async_transport = PooledAsyncTransport(lambda: httpx.AsyncHTTPTransport(limits=limits, retries=retries))
+            return self._async_transport
+
+    def async_timeout(self):
+        """The httpx timeout for calls to an Identity Gateway, requires httpx."""
+        import httpx
+
+        connect, read = self.timeout()
+        return httpx.Timeout(read, connect=connect)
+
+    def async_event_hooks(self) -> dict:
+        """The httpx event hooks for calls to an Identity Gateway, recording responses on the current span."""
+        return {"response": [tracing.arecord_response]}
+
+    def async_client(self):
+        """An httpx.AsyncClient for unauthenticated calls over the shared transport, requires httpx."""
+        import httpx
+
+        return httpx.AsyncClient(
+            transport=self.async_transport(), timeout=self.async_timeout(), event_hooks=self.async_event_hooks()
+        )
+
+    def close(self) -> None:
+        """Close the shared sync connection pools, e.g. after forking; they are recreated on next use."""
+        with self._lock:
+            if self._adapter is not None:
+                self._adapter.shutdown()
+            self._adapter = None
+            self._session = None
+
+
+transport = Transport()
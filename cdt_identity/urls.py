@@ -1,9 +1,15 @@
 from django.urls import path
 from django.views.generic import TemplateView
 
-from . import views
+from . import conf
 from .routes import Routes
 
+if conf.get("ASYNC_VIEWS"):
+    # opt-in native async views for ASGI deployments, requires httpx
+    from . import async_views as views
+else:
+    from . import views
+
 app_name = "cdt"
 
 endpoints_template = [
@@ -14,6 +20,7 @@ endpoints_template = [
 ]
 endpoints_view = [
     Routes.authorize,
+    Routes.backchannel_logout,
     Routes.login,
     Routes.logout,
 ]
@@ -1,11 +1,15 @@
+import functools
+import inspect
 import logging
+import math
 
-from django.http import HttpRequest
-from django.shortcuts import redirect
-from django.urls import reverse
+from django.http import HttpRequest, HttpResponse, JsonResponse
+from django.shortcuts import redirect, render
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 
-from . import redirects
-from .claims import Claims
+from . import backchannel, callbacks, decisions, metrics, ratelimit, redirects, resilience, tracing
+from .claims import Claims, ClaimSchema
 from .client import create_client
 from .client import oauth as registry
 from .routes import Routes
@@ -22,23 +26,87 @@ def _client_or_error_redirect(request: HttpRequest):
     client = None
     session = Session(request)
 
-    config = session.oidc_config
-    if not config:
-        raise Exception("No oauth_config in session")
-
-    scheme = session.oidc_scheme
-    scopes = session.oidc_scopes
-    client = create_client(registry, config, scopes, scheme)
+    with metrics.phase("client"), tracing.span("client"):
+        config = session.oidc_config
+        if not config:
+            raise Exception("No oauth_config in session")
+
+        metrics.set_client_name(config.client_name)
+        scheme = session.oidc_scheme
+        scopes = session.oidc_scopes
+        tracing.set_attributes(
+            {
+                tracing.CLIENT_NAME: config.client_name,
+                tracing.AUTHORITY: config.authority,
+                tracing.SCHEME: scheme or config.scheme,
+            }
+        )
+        client = create_client(registry, config, scopes, scheme)
     if not client:
         raise Exception(f"oauth_client not registered: {config.client_name}")
 
     return client
 
 
+def _fail_fast(view):
+    """Decorate a sync or async view to run within the request deadline, redirecting to the authorize_fail route when
+    the Identity Gateway is unavailable or too slow."""
+
+    def unavailable(request: HttpRequest, exception: resilience.GatewayUnavailable):
+        logger.warning(f"Identity Gateway unavailable: {exception}")
+        tracing.set_attributes({"cdt_identity.unavailable": type(exception).__name__})
+        return redirect(Session(request).oidc_authorize_fail)
+
+    if inspect.iscoroutinefunction(view):
+
+        @functools.wraps(view)
+        async def async_wrapper(request: HttpRequest, *args, **kwargs):
+            with resilience.deadline():
+                try:
+                    return await view(request, *args, **kwargs)
+                except resilience.GatewayUnavailable as ex:
+                    # e.g. a repeated callback that timed out waiting has not loaded the session yet
+                    await Session(request).aload()
+                    return unavailable(request, ex)
+
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(request: HttpRequest, *args, **kwargs):
+        with resilience.deadline():
+            try:
+                return view(request, *args, **kwargs)
+            except resilience.GatewayUnavailable as ex:
+                return unavailable(request, ex)
+
+    return wrapper
+
+
+def _waiting_page(request: HttpRequest, retry_after: float):
+    """A page asking the user to wait, that retries the request after retry_after seconds."""
+    seconds = math.ceil(retry_after)
+    logger.info(f"Login rate limit reached, retrying in {seconds} seconds")
+    tracing.set_attributes({"cdt_identity.rate_limited": True})
+    context = {"retry_after": seconds, "retry_url": request.get_full_path()}
+    response = render(request, "cdt_identity/wait.html", context, status=429)
+    response["Retry-After"] = str(seconds)
+    return response
+
+
+@metrics.timed("authorize")
+@_fail_fast
 def authorize(request: HttpRequest):
     """View implementing OIDC token authorization."""
     logger.debug(Routes.route_authorize)
 
+    state = request.GET.get("state")
+    if not state:
+        return _authorize(request)
+    # repeats of this callback wait for, and redirect like, the first
+    return callbacks.coalesce(request, state, lambda: _authorize(request))
+
+
+def _authorize(request: HttpRequest):
     session = Session(request)
     client_result = _client_or_error_redirect(request)
 
@@ -67,31 +135,71 @@ def authorize(request: HttpRequest):
 
     logger.debug("OIDC access token authorized")
 
-    # Store the id_token in the user's session. This is the minimal amount of information needed later to log the user out.
+    # Store the id_token for the user's session. This is the minimal amount of information needed later to log the user out.
     session.oidc_token = token["id_token"]
+    backchannel.remember(request, session.oidc_config, token)
+
+    decision_key = decisions.key(session, session.oidc_config, token)
+    decision = decisions.get(decision_key)
+    if decision is None:
+        decision = _verify_claims(session, token)
+        decisions.remember(decision_key, decision)
+    return _redirect_decision(session, decision, decision_key)
+
+
+def _verify_claims(session: Session, token: dict) -> dict:
+    """Verify the authorized token's claims, returning the decision {"eligible": bool, "claims": dict}."""
 
     # Process the returned claims
     processed_claims = []
-    expected_claims = [claim for claim in session.oidc_expected_claims.split(" ") if claim]
+    # compiled once per distinct expected claims string, and reused across requests
+    expected_claims = ClaimSchema.from_string(session.oidc_expected_claims)
     if expected_claims:
         userinfo = token.get("userinfo", {})
-        processed_claims = Claims(userinfo, expected_claims)
+        with metrics.phase("claims"), tracing.span("claims"):
+            processed_claims = Claims(userinfo, expected_claims)
     # if we found the eligibility claim
     eligibility_claim = session.oidc_eligibility_claims
     if eligibility_claim and eligibility_claim in processed_claims:
-        # store and redirect to success
-        session.oidc_verified_claims = processed_claims.claims
-        return redirect(session.oidc_claims_authorize_success)
-    # else redirect to failure
+        return {"eligible": True, "claims": processed_claims.claims}
     if processed_claims and processed_claims.errors:
         logger.error(processed_claims.errors)
-    return redirect(session.oidc_claims_authorize_fail)
+    return {"eligible": False, "claims": {}}
+
+
+def _redirect_decision(session: Session, decision: dict, decision_key: str = ""):
+    """Store the decision's claims in the session, and redirect based on them."""
+    session.oidc_decision = decision_key
+    if decision["eligible"]:
+        # store and redirect to success
+        session.oidc_verified_claims = decision["claims"]
+        return redirect(session.oidc_authorize_success)
+    # else redirect to failure
+    return redirect(session.oidc_authorize_fail)
 
 
+def _recalled_decision(session: Session, decision: dict):
+    logger.debug("Eligibility was decided recently, skipping the Identity Gateway")
+    tracing.set_attributes({"cdt_identity.decision_cached": True})
+    return _redirect_decision(session, decision, session.oidc_decision)
+
+
+@metrics.timed("login")
+@_fail_fast
 def login(request: HttpRequest):
     """View implementing OIDC authorize_redirect."""
     logger.debug(Routes.route_login)
 
+    session = Session(request)
+    config = session.oidc_config
+    decision = decisions.recall(session, config)
+    if decision is not None:
+        return _recalled_decision(session, decision)
+
+    retry_after = ratelimit.admit(config) if config else 0
+    if retry_after:
+        return _waiting_page(request, retry_after)
+
     oauth_client_result = _client_or_error_redirect(request)
 
     if hasattr(oauth_client_result, "authorize_redirect"):
@@ -101,8 +209,7 @@ def login(request: HttpRequest):
         # this does not look like an oauth_client, it's an error redirect
         return oauth_client_result
 
-    route = reverse(Routes.route_authorize)
-    redirect_uri = redirects.generate_redirect_uri(request, route)
+    redirect_uri = redirects.redirect_uri(request, Routes.route_authorize)
 
     logger.debug(f"OAuth authorize_redirect with redirect_uri: {redirect_uri}")
 
@@ -110,7 +217,8 @@ def login(request: HttpRequest):
     result = None
 
     try:
-        result = oauth_client.authorize_redirect(request, redirect_uri)
+        with tracing.span("authorize_redirect", {tracing.AUTHORITY: getattr(oauth_client, "authority", None)}):
+            result = oauth_client.authorize_redirect(request, redirect_uri)
     except Exception as ex:
         exception = ex
 
@@ -125,6 +233,7 @@ def login(request: HttpRequest):
     return result
 
 
+@metrics.timed("logout")
 def logout(request: HttpRequest):
     """View handler for OIDC sign out."""
     logger.debug(Routes.route_logout)
@@ -143,9 +252,10 @@ def logout(request: HttpRequest):
     # overwrite the session token, the user is signed out of the app
     token = session.oidc_token
     session.clear_oidc_token()
+    session.oidc_decision = ""
+    backchannel.forget(request)
 
-    route = reverse(Routes.route_post_logout)
-    redirect_uri = redirects.generate_redirect_uri(request, route)
+    redirect_uri = redirects.redirect_uri(request, Routes.route_post_logout)
 
     logger.debug(f"OAuth end_session_endpoint with redirect_uri: {redirect_uri}")
 
@@ -153,3 +263,31 @@ def logout(request: HttpRequest):
     # the post_logout route
     return redirects.deauthorize_redirect(request, oauth_client, token, redirect_uri)
     return redirects.deauthorize_redirect(request, oauth_client, token, redirect_uri)
+
+
+@csrf_exempt
+@require_POST
+@metrics.timed("backchannel_logout")
+def backchannel_logout(request: HttpRequest):
+    """View implementing OIDC Back-Channel Logout, ending the sessions named by the Identity Gateway's logout token."""
+    logger.debug(Routes.route_backchannel_logout)
+
+    try:
+        with resilience.deadline():
+            if not backchannel.enabled():
+                raise backchannel.InvalidLogoutToken("Back-channel logout is not enabled")
+            config, claims = backchannel.verify(request.POST.get("logout_token"))
+    except backchannel.InvalidLogoutToken as ex:
+        logger.warning(f"Back-channel logout rejected: {ex}")
+        response = JsonResponse({"error": "invalid_request", "error_description": str(ex)}, status=400)
+    except resilience.GatewayUnavailable as ex:
+        # the Identity Gateway may retry
+        logger.warning(f"Identity Gateway unavailable: {ex}")
+        response = JsonResponse({"error": "temporarily_unavailable"}, status=503)
+    else:
+        ended = backchannel.invalidate(backchannel.sessions(config, claims))
+        logger.info(f"Back-channel logout ended {ended} sessions")
+        response = HttpResponse()
+
+    response["Cache-Control"] = "no-store"
+    return response
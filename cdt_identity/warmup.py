@@ -0,0 +1,106 @@
+"""
+Warm up the OAuth client registry, discovery metadata and JWKS caches for every ClientConfig.
+
+Run on startup with `CDT_IDENTITY_WARMUP_ON_STARTUP = True`, or with `python manage.py identity_warmup`.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.apps import apps
+from django.db import DatabaseError, connection
+
+from . import conf
+from .client import _jwks_uri, create_client, oauth
+from .jwks import key_sets
+from .metadata import metadata_store
+from .models import ClientConfig
+
+logger = logging.getLogger(__name__)
+
+OK = "ok"
+ERROR = "error"
+TIMEOUT = "timeout"
+
+
+def _prefetch(authority: str) -> None:
+    metadata = metadata_store.get(authority)
+    key_sets.get(authority, _jwks_uri(metadata))
+
+
+def _client_cls():
+    """The class of client the URLconf's views create."""
+    if conf.get("ASYNC_VIEWS"):
+        from .async_client import AsyncOAuth2App
+
+        return AsyncOAuth2App
+    from .oauth_app import OAuth2App
+
+    return OAuth2App
+
+
+def _scopes(config: ClientConfig) -> list[str]:
+    # the default scopes, as used by sessions that do not request more, then any configured for config
+    scopes = ["", *conf.get("WARMUP_SCOPES").get(config.client_name, ())]
+    return list(dict.fromkeys(scopes))
+
+
+def warm_up(budget: float = None, max_workers: int = None) -> dict:
+    """Register a client for each ClientConfig, then prefetch each authority's metadata and JWKS concurrently.
+
+    Returns once every authority is done or after `budget` seconds, leaving any slower prefetches to finish in the
+    background. The result maps each authority to `ok`, `error` or `timeout`.
+    """
+    budget = conf.get("WARMUP_BUDGET") if budget is None else budget
+    max_workers = max_workers or conf.get("WARMUP_MAX_WORKERS")
+
+    configs = list(ClientConfig.objects.all())
+    client_cls = _client_cls()
+    for config in configs:
+        for scopes in _scopes(config):
+            create_client(oauth, config, scopes, config.scheme, client_cls=client_cls)
+
+    authorities = sorted({authority for config in configs for authority in config.authorities})
+    results = {}
+    if not authorities:
+        return {"clients": len(configs), "authorities": results}
+
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(authorities)), thread_name_prefix="cdt_identity_warmup")
+    futures = {executor.submit(_prefetch, authority): authority for authority in authorities}
+    done, _ = wait(futures, timeout=budget)
+    # don't wait for slow authorities, their prefetches finish (or time out) in the background
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    for future, authority in futures.items():
+        if future not in done:
+            logger.warning(f"Warm-up of {authority} did not finish within {budget} seconds")
+            results[authority] = TIMEOUT
+        elif future.exception() is not None:
+            logger.warning(f"Warm-up of {authority} failed", exc_info=future.exception())
+            results[authority] = ERROR
+        else:
+            results[authority] = OK
+
+    return {"clients": len(configs), "authorities": results}
+
+
+def _warm_up_when_ready() -> None:
+    apps.ready_event.wait()
+    try:
+        results = warm_up()
+    except DatabaseError:
+        # e.g. before the first migration
+        logger.warning("Could not read ClientConfigs to warm up", exc_info=True)
+    else:
+        logger.info(f"Warmed up {results['clients']} clients: {results['authorities']}")
+    finally:
+        # this thread's connection isn't closed by a request finishing
+        connection.close()
+
+
+def warm_up_in_background() -> threading.Thread:
+    """Start warming up from a daemon thread once Django has finished loading, without blocking startup."""
+    thread = threading.Thread(target=_warm_up_when_ready, name="cdt_identity_warmup", daemon=True)
+    thread.start()
+    return thread
@@ -1,13 +1,31 @@
-from authlib.integrations.django_client import OAuth, DjangoOAuth2App
+from authlib.integrations.django_client import DjangoOAuth2App, OAuth
 
 from django.contrib.sessions.middleware import SessionMiddleware
 
 import pytest
+import requests
 from pytest_socket import disable_socket
 
+from cdt_identity.cache import client_configs
+from cdt_identity.client import oauth
+from cdt_identity.jwks import key_sets
+from cdt_identity.metadata import metadata_store
+from cdt_identity.models import ClientConfig
+from cdt_identity.session import Session
+from cdt_identity.stub import StubGateway
+from cdt_identity.transport import transport
+
 
 def pytest_runtest_setup():
-    disable_socket()
+    # unix sockets are allowed so async tests can create an event loop
+    disable_socket(allow_unix_socket=True)
+
+
+@pytest.fixture(autouse=True)
+def reset_client_configs():
+    client_configs.clear()
+    yield
+    client_configs.clear()
 
 
 @pytest.fixture
@@ -35,3 +53,42 @@ def mock_request(rf):
 
     request.session.save()
     return request
+
+
+@pytest.fixture
+def gateway():
+    return StubGateway(claims={"claim1": "1"})
+
+
+@pytest.fixture
+def http(gateway):
+    """A requests session reaching the stub gateway, standing in for the user's browser."""
+    session = requests.Session()
+    session.mount(gateway.authority, gateway.adapter())
+    return session
+
+
+@pytest.fixture
+def stub_transport(mocker, gateway):
+    """Route every call to an Identity Gateway to the stub gateway."""
+    mocker.patch.object(transport, "_adapter", gateway.adapter())
+    # the shared session has the adapter it was created with mounted
+    mocker.patch.object(transport, "_session", None)
+    yield
+    metadata_store.clear(gateway.authority)
+    key_sets.clear()
+    oauth.clear()
+
+
+@pytest.fixture
+def stub_session(client, gateway):
+    """Set up the test client's session to log in with the stub gateway, expecting claim1."""
+    config = ClientConfig.objects.create(client_name="stub", client_id="client", authority=gateway.authority, scheme="s")
+    request = client.get("/").wsgi_request
+    session = Session(request, authorize_fail="/fail", authorize_sucess="/success")
+    session.oidc_config = config
+    session.oidc_expected_claims = "claim1"
+    session.oidc_eligibility_claims = "claim1"
+    request.session.save()
+    client.cookies["sessionid"] = request.session.session_key
+    return session
@@ -0,0 +1,184 @@
+import time
+
+import httpx
+import pytest
+from asgiref.sync import async_to_sync
+from authlib.integrations.base_client import OAuthError
+from authlib.integrations.django_client.integration import DjangoIntegration
+from joserfc import jwt
+from joserfc.jwk import KeySet, RSAKey
+
+from cdt_identity import hedging
+from cdt_identity.async_client import AsyncOAuth2App
+from cdt_identity.transactions import CacheTransactionStore
+
+METADATA = {
+    "issuer": "https://example.com",
+    "authorization_endpoint": "https://example.com/authorize",
+    "token_endpoint": "https://example.com/token",
+    "jwks_uri": "https://example.com/jwks",
+    "id_token_signing_alg_values_supported": ["RS256"],
+}
+
+
+@pytest.fixture(scope="module")
+def signing_key():
+    return RSAKey.generate_key(2048, parameters={"kid": "kid1"})
+
+
+@pytest.fixture
+def mock_metadata_store(mocker):
+    mock_store = mocker.patch("cdt_identity.async_client.metadata_store")
+    mock_store.aget = mocker.AsyncMock(return_value=dict(METADATA))
+    return mock_store
+
+
+@pytest.fixture
+def client(mocker, mock_metadata_store):
+    framework = mocker.Mock(spec=DjangoIntegration)
+    return AsyncOAuth2App(
+        framework,
+        "client_name_1",
+        authority="https://example.com",
+        client_id="client_id_1",
+        client_kwargs={"code_challenge_method": "S256", "scope": "openid"},
+    )
+
+
+def _id_token(signing_key, **claims):
+    now = int(time.time())
+    payload = {"iss": "https://example.com", "aud": "client_id_1", "sub": "sub1", "iat": now, "exp": now + 60}
+    payload.update(claims)
+    return jwt.encode({"alg": "RS256", "kid": "kid1"}, payload, signing_key)
+
+
+def test_load_server_metadata(client, mock_metadata_store):
+    metadata = async_to_sync(client.load_server_metadata)()
+
+    mock_metadata_store.aget.assert_awaited_once_with("https://example.com")
+    assert metadata["issuer"] == "https://example.com"
+
+
+def test_parse_id_token(mocker, client, signing_key):
+    mock_key_sets = mocker.patch("cdt_identity.async_client.key_sets")
+    mock_key_sets.aget = mocker.AsyncMock(return_value=KeySet([signing_key]))
+    token = {"id_token": _id_token(signing_key, nonce="nonce1")}
+
+    userinfo = async_to_sync(client.parse_id_token)(token, nonce="nonce1")
+
+    assert userinfo["sub"] == "sub1"
+    mock_key_sets.aget.assert_awaited_once_with("https://example.com", "https://example.com/jwks", kid="kid1")
+
+
+@pytest.mark.django_db
+def test_authorize_redirect(client, mock_request):
+    response = async_to_sync(client.authorize_redirect)(mock_request, "https://testserver/authorize")
+
+    assert response.status_code == 302
+    assert response.url.startswith("https://example.com/authorize?")
+    client.framework.set_state_data.assert_called_once()
+    state_data = client.framework.set_state_data.call_args.args[2]
+    assert state_data["redirect_uri"] == "https://testserver/authorize"
+    assert "code_verifier" in state_data
+    assert "nonce" in state_data
+
+
+def test_authorize_access_token(mocker, rf, client, signing_key):
+    request = rf.get("/authorize", {"code": "code1", "state": "state1"})
+    request.session = {}
+    client.framework.get_state_data.return_value = {"redirect_uri": "https://testserver/authorize", "nonce": "nonce1"}
+    mock_fetch = mocker.patch.object(
+        client, "fetch_access_token", return_value={"access_token": "access", "id_token": "id_token"}
+    )
+    mock_parse = mocker.patch.object(client, "parse_id_token", return_value={"sub": "sub1"})
+
+    token = async_to_sync(client.authorize_access_token)(request)
+
+    mock_fetch.assert_awaited_once_with(code="code1", state="state1", redirect_uri="https://testserver/authorize")
+    mock_parse.assert_awaited_once()
+    client.framework.clear_state_data.assert_called_once_with(request.session, "state1")
+    assert token["userinfo"] == {"sub": "sub1"}
+
+
+@pytest.mark.django_db
+def test_authorize_transaction_store(mocker, rf, client, mock_request):
+    client.framework = CacheTransactionStore("client_name_1")
+    response = async_to_sync(client.authorize_redirect)(mock_request, "https://testserver/authorize")
+    state = response.url.split("state=")[1].split("&")[0]
+    request = rf.get("/authorize", {"code": "code1", "state": state})
+    request.session = mock_request.session
+    mock_fetch = mocker.patch.object(client, "fetch_access_token", return_value={"access_token": "access"})
+
+    async_to_sync(client.authorize_access_token)(request)
+
+    mock_fetch.assert_awaited_once_with(
+        code="code1", state=state, redirect_uri="https://testserver/authorize", code_verifier=mocker.ANY
+    )
+    assert async_to_sync(client.framework.aget_state_data)(request.session, state) is None
+
+
+def test_authorize_access_token_error(rf, client):
+    request = rf.get("/authorize", {"error": "access_denied", "error_description": "denied"})
+
+    with pytest.raises(Exception, match="access_denied"):
+        async_to_sync(client.authorize_access_token)(request)
+
+
+def test_sessions_use_transport(mocker, client):
+    mock_transport = mocker.patch("cdt_identity.async_client.transport")
+    mock_client_cls = mocker.patch.object(client, "client_cls")
+
+    client._get_session()
+    client._get_oauth_client()
+
+    assert mock_client_cls.call_count == 2
+    for call in mock_client_cls.call_args_list:
+        assert call.kwargs["transport"] == mock_transport.async_transport.return_value
+        assert call.kwargs["timeout"] == mock_transport.async_timeout.return_value
+
+
+@pytest.fixture
+def hedged_client(mocker, mock_metadata_store):
+    hedging.health.clear()
+    yield AsyncOAuth2App(
+        mocker.Mock(),
+        "client_name_1",
+        authority="https://example.com",
+        authorities=["https://example.com", "https://fallback.example.com"],
+        client_id="client_id_1",
+    )
+    hedging.health.clear()
+
+
+def test_load_server_metadata_hedged(mocker, hedged_client, mock_metadata_store):
+    mock_ahedge = mocker.patch("cdt_identity.hedging.ahedge", new_callable=mocker.AsyncMock, return_value=dict(METADATA))
+
+    metadata = async_to_sync(hedged_client.load_server_metadata)()
+
+    mock_ahedge.assert_awaited_once_with(hedged_client.authorities, mock_metadata_store.aget)
+    assert metadata["issuer"] == "https://example.com"
+
+
+def test_fetch_access_token_failover(mocker, hedged_client):
+    async def fetch(authority, redirect_uri=None, **kwargs):
+        if authority == "https://example.com":
+            raise httpx.ConnectError(authority)
+        return {"access_token": authority, **kwargs}
+
+    mocker.patch.object(hedged_client, "_fetch_access_token_from", side_effect=fetch)
+
+    token = async_to_sync(hedged_client.fetch_access_token)(code="code1")
+
+    assert token == {"access_token": "https://fallback.example.com", "code": "code1"}
+
+
+def test_fetch_access_token_rejected(mocker, hedged_client):
+    fetch = mocker.patch.object(
+        hedged_client, "_fetch_access_token_from", new_callable=mocker.AsyncMock, side_effect=OAuthError("invalid_grant")
+    )
+
+    with pytest.raises(OAuthError):
+        async_to_sync(hedged_client.fetch_access_token)(code="code1")
+
+    # the code is not sent to another authority
+    fetch.assert_awaited_once_with("https://example.com", None, code="code1")
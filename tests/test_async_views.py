@@ -0,0 +1,213 @@
+import re
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from cdt_identity import callbacks
+from cdt_identity.async_client import AsyncOAuth2App
+from cdt_identity.async_views import _client_or_error_redirect, authorize, login, logout
+from cdt_identity.resilience import DeadlineExceeded
+from cdt_identity.routes import Routes
+from cdt_identity.session import Session
+
+
+@pytest.fixture
+def mock_session(mocker):
+    session = mocker.Mock(spec=Session)
+    mocker.patch("cdt_identity.async_views.Session", return_value=session)
+    return session
+
+
+@pytest.fixture
+def mock_async_oauth_client(mocker):
+    return mocker.AsyncMock(spec=AsyncOAuth2App)
+
+
+@pytest.fixture
+def mock_oauth_create_client(mocker, mock_async_oauth_client):
+    return mocker.patch("cdt_identity.async_views.create_client", return_value=mock_async_oauth_client)
+
+
+@pytest.fixture
+def mock_client_or_error_redirect(mocker, mock_async_oauth_client):
+    return mocker.patch("cdt_identity.async_views._client_or_error_redirect", return_value=mock_async_oauth_client)
+
+
+@pytest.mark.django_db
+def test_client_or_error_redirect_no_config(mock_request, mock_oauth_create_client):
+    with pytest.raises(Exception, match="No oauth_config in session"):
+        async_to_sync(_client_or_error_redirect)(mock_request)
+
+    mock_oauth_create_client.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_client_or_error_redirect_no_client(mocker, mock_oauth_create_client, mock_request, mock_session):
+    mock_session.aoidc_config = mocker.AsyncMock(return_value=mocker.Mock(client_name="name"))
+    mock_oauth_create_client.return_value = None
+
+    with pytest.raises(Exception, match="oauth_client not registered: name"):
+        async_to_sync(_client_or_error_redirect)(mock_request)
+
+
+@pytest.mark.django_db
+def test_client_or_error_redirect_client(mocker, mock_oauth_create_client, mock_request, mock_session):
+    config = mocker.Mock(client_name="name")
+    mock_session.aoidc_config = mocker.AsyncMock(return_value=config)
+    mock_session.oidc_scheme = "scheme"
+    mock_session.oidc_scopes = "scopes"
+
+    result = async_to_sync(_client_or_error_redirect)(mock_request)
+
+    assert result == mock_oauth_create_client.return_value
+    mock_oauth_create_client.assert_called_once_with(mocker.ANY, config, "scopes", "scheme", client_cls=AsyncOAuth2App)
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("mock_client_or_error_redirect")
+def test_authorize_success(mocker, mock_async_oauth_client, mock_request, mock_session):
+    mock_async_oauth_client.authorize_access_token.return_value = {
+        "id_token": "test_token",
+        "userinfo": {"claim1": "1", "claim2": "value", "claim3": "value"},
+    }
+    mock_session.oidc_expected_claims = "claim1 claim2"
+    mock_session.oidc_eligibility_claims = "claim1"
+    mock_session.oidc_authorize_success = "/success"
+    mock_redirect = mocker.patch("cdt_identity.views.redirect")
+
+    async_to_sync(authorize)(mock_request)
+
+    mock_redirect.assert_called_once_with("/success")
+    mock_session.aset_oidc_token.assert_awaited_once_with("test_token")
+    assert mock_session.oidc_verified_claims == {"claim1": True, "claim2": "value"}
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("mock_client_or_error_redirect")
+def test_authorize_no_token(mock_async_oauth_client, mock_request):
+    mock_async_oauth_client.authorize_access_token.return_value = None
+
+    with pytest.raises(Exception, match="authorize_access_token returned None"):
+        async_to_sync(authorize)(mock_request)
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("mock_client_or_error_redirect")
+def test_authorize_token_exception(mock_async_oauth_client, mock_request):
+    mock_async_oauth_client.authorize_access_token.side_effect = Exception("authorize token failed")
+
+    with pytest.raises(Exception, match="authorize token failed"):
+        async_to_sync(authorize)(mock_request)
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("mock_client_or_error_redirect")
+def test_login_success(mocker, mock_async_oauth_client, mock_request):
+    mock_async_oauth_client.authorize_redirect.return_value = HttpResponse(status=302)
+    mock_redirect_uri = mocker.patch(
+        "cdt_identity.async_views.redirects.redirect_uri", return_value="https://testserver/authorize"
+    )
+
+    response = async_to_sync(login)(mock_request)
+
+    assert response.status_code == 302
+    mock_redirect_uri.assert_called_once_with(mock_request, Routes.route_authorize)
+    mock_async_oauth_client.authorize_redirect.assert_awaited_once_with(mock_request, "https://testserver/authorize")
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("mock_client_or_error_redirect")
+def test_login_failure(mock_async_oauth_client, mock_request):
+    mock_async_oauth_client.authorize_redirect.return_value = None
+
+    with pytest.raises(Exception, match="authorize_redirect returned None"):
+        async_to_sync(login)(mock_request)
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("mock_client_or_error_redirect")
+def test_login_authorize_redirect_error_response(mock_async_oauth_client, mock_request):
+    mock_async_oauth_client.authorize_redirect.return_value = HttpResponse(content="server error", status=500)
+
+    with pytest.raises(Exception, match=re.escape("authorize_redirect error response [500]: server error")):
+        async_to_sync(login)(mock_request)
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("mock_client_or_error_redirect")
+def test_logout(mocker, mock_request, mock_session):
+    mock_session.aoidc_token.return_value = "token"
+    mock_deauthorize = mocker.patch(
+        "cdt_identity.async_views.redirects.adeauthorize_redirect", return_value=HttpResponse(status=302)
+    )
+    mock_redirect_uri = mocker.patch("cdt_identity.async_views.redirects.redirect_uri", return_value="https://testserver/")
+
+    response = async_to_sync(logout)(mock_request)
+
+    assert response.status_code == 302
+    mock_deauthorize.assert_awaited_once()
+    mock_redirect_uri.assert_called_once_with(mock_request, Routes.route_post_logout)
+    mock_deauthorize.assert_awaited_once_with(mock_request, mocker.ANY, "token", "https://testserver/")
+    mock_session.aclear_oidc_token.assert_awaited_once()
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("mock_client_or_error_redirect")
+def test_authorize_gateway_unavailable(mocker, mock_async_oauth_client, mock_request):
+    mock_views_session = mocker.patch("cdt_identity.views.Session").return_value
+    mock_views_session.oidc_authorize_fail = "/fail"
+    mock_views_session.aload = mocker.AsyncMock()
+    mock_async_oauth_client.authorize_access_token.side_effect = DeadlineExceeded()
+
+    response = async_to_sync(authorize)(mock_request)
+
+    assert response.url == "/fail"
+
+
+@pytest.mark.django_db
+def test_authorize_repeat_timed_out(mocker, rf, mock_request, settings):
+    settings.CDT_IDENTITY_CALLBACK_WAIT = 0.1
+    mocker.patch.object(callbacks, "POLL_INTERVAL", 0.01)
+    Session(mock_request, authorize_fail="/fail")
+    mock_request.session.save()
+    # a repeat of the callback, whose session is not loaded until needed
+    request = rf.get("/authorize", {"state": "state1"})
+    request.session = SessionStore(mock_request.session.session_key)
+    cache.add(f"{callbacks._key(request, 'state1')}:lock", 1)
+
+    try:
+        response = async_to_sync(authorize)(request)
+    finally:
+        cache.clear()
+
+    assert response.url == "/fail"
+
+
+@pytest.mark.django_db
+def test_login_rate_limited(mocker, mock_client_or_error_redirect, mock_request, mock_session):
+    mock_session.aoidc_config = mocker.AsyncMock()
+    mocker.patch("cdt_identity.async_views.ratelimit.aadmit", new_callable=mocker.AsyncMock, return_value=3)
+
+    response = async_to_sync(login)(mock_request)
+
+    assert response.status_code == 429
+    assert response["Retry-After"] == "3"
+    mock_client_or_error_redirect.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_login_recalled_decision(mocker, mock_client_or_error_redirect, mock_request, mock_session):
+    mock_session.aoidc_config = mocker.AsyncMock()
+    mock_session.oidc_authorize_success = "/success"
+    decision = {"eligible": True, "claims": {"claim1": True}}
+    mocker.patch("cdt_identity.async_views.decisions.arecall", new_callable=mocker.AsyncMock, return_value=decision)
+    mocker.patch("cdt_identity.views.redirect", side_effect=lambda to: HttpResponse(to))
+
+    response = async_to_sync(login)(mock_request)
+
+    assert response.content == b"/success"
+    assert mock_session.oidc_verified_claims == {"claim1": True}
+    mock_client_or_error_redirect.assert_not_called()
@@ -0,0 +1,284 @@
+import io
+import time
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.sessions.backends.cache import SessionStore as CacheSessionStore
+from django.contrib.sessions.models import Session as DjangoSession
+from django.core.management import CommandError, call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from cdt_identity import backchannel
+from cdt_identity.backchannel import InvalidLogoutToken
+from cdt_identity.models import ClientConfig, SessionMapping
+from cdt_identity.resilience import CircuitOpen
+from cdt_identity.routes import Routes
+
+
+@pytest.fixture
+def enabled(settings):
+    settings.CDT_IDENTITY_BACKCHANNEL_LOGOUT = True
+
+
+@pytest.fixture
+def config(db, gateway):
+    return ClientConfig.objects.create(client_name="stub", client_id="client", authority=gateway.authority, scheme="s")
+
+
+def _mapping(config, session_key, sub="sub1", sid="sid1", expires=None):
+    return SessionMapping.objects.create(
+        client=config,
+        issuer=config.authority,
+        sub=sub,
+        sid=sid,
+        session_key=session_key,
+        expires=expires or timezone.now() + timedelta(hours=1),
+    )
+
+
+def _session(**data):
+    store = DjangoSession.get_session_store_class()()
+    store.update(data)
+    store.save()
+    return store.session_key
+
+
+def _log_in(client, http):
+    response = client.get(reverse(Routes.route_login))
+    response = http.get(response["Location"], allow_redirects=False)
+    callback = urlsplit(response.headers["Location"])
+    return client.get(f"{callback.path}?{callback.query}")
+
+
+def _post(client, logout_token):
+    return client.post(reverse(Routes.route_backchannel_logout), {"logout_token": logout_token})
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("enabled")
+def test_remember(mock_request, config):
+    token = {"userinfo": {"iss": config.authority, "sub": "sub1", "sid": "sid1"}}
+
+    backchannel.remember(mock_request, config, token)
+    backchannel.remember(mock_request, config, token)
+
+    mapping = SessionMapping.objects.get()
+    assert (mapping.issuer, mapping.sub, mapping.sid) == (config.authority, "sub1", "sid1")
+    assert mapping.session_key == mock_request.session.session_key
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("enabled")
+def test_remember_new_session(rf, config):
+    request = rf.get("/")
+    request.session = DjangoSession.get_session_store_class()()
+
+    async_to_sync(backchannel.aremember)(request, config, {"userinfo": {"iss": config.authority, "sub": "sub1"}})
+
+    assert SessionMapping.objects.get().session_key == request.session.session_key
+
+
+@pytest.mark.django_db
+def test_remember_disabled(mock_request, config):
+    backchannel.remember(mock_request, config, {"userinfo": {"sub": "sub1"}})
+
+    assert not SessionMapping.objects.exists()
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("enabled")
+def test_forget(mock_request, config):
+    _mapping(config, mock_request.session.session_key)
+    _mapping(config, "other")
+
+    backchannel.forget(mock_request)
+
+    assert list(SessionMapping.objects.values_list("session_key", flat=True)) == ["other"]
+
+
+@pytest.mark.django_db
+def test_invalidate(config, django_assert_num_queries):
+    session_keys = [_session(n=n) for n in range(5)]
+    for session_key in session_keys:
+        _mapping(config, session_key)
+    other = _session(n="other")
+
+    # 3 batches of a select, a session delete and a mapping delete, and the select finding none left
+    with django_assert_num_queries(10):
+        assert backchannel.invalidate(SessionMapping.objects.filter(sub="sub1"), batch_size=2) == 5
+
+    assert list(DjangoSession.objects.values_list("session_key", flat=True)) == [other]
+    assert not SessionMapping.objects.exists()
+
+
+@pytest.mark.django_db
+def test_invalidate_other_engine(settings, config):
+    settings.SESSION_ENGINE = "django.contrib.sessions.backends.cache"
+    store = CacheSessionStore()
+    store["key"] = "value"
+    store.save()
+    _mapping(config, store.session_key)
+
+    backchannel.invalidate(SessionMapping.objects.all())
+
+    assert not CacheSessionStore().exists(store.session_key)
+
+
+@pytest.mark.django_db
+def test_purge(config):
+    _mapping(config, "expired", expires=timezone.now() - timedelta(seconds=1))
+    _mapping(config, "live")
+
+    assert backchannel.purge() == 1
+    assert list(SessionMapping.objects.values_list("session_key", flat=True)) == ["live"]
+
+
+@pytest.mark.django_db
+def test_verify(gateway, stub_transport, config):
+    verified, claims = backchannel.verify(gateway.logout_token("client", sid="sid1"))
+
+    assert verified == config
+    assert (claims["sub"], claims["sid"]) == ("stub-user", "sid1")
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "claims",
+    [
+        {"events": {}},
+        {"sub": None, "sid": None},
+        {"nonce": "nonce1"},
+        {"aud": "other"},
+        {"iss": "https://other.example.com"},
+        {"iat": int(time.time()) + 3600},
+        {"exp": int(time.time()) - 3600},
+        {"jti": ""},
+    ],
+)
+@pytest.mark.usefixtures("config", "stub_transport")
+def test_verify_invalid(gateway, claims):
+    claims = dict(claims)
+    sub, sid = claims.pop("sub", "stub-user"), claims.pop("sid", "sid1")
+    logout_token = gateway.logout_token("client", sub=sub, sid=sid, **claims)
+
+    with pytest.raises(InvalidLogoutToken):
+        backchannel.verify(logout_token)
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("config", "stub_transport")
+def test_verify_other_key(gateway):
+    other = gateway.__class__(authority=gateway.authority)
+
+    with pytest.raises(InvalidLogoutToken):
+        backchannel.verify(other.logout_token("client", sid="sid1"))
+
+
+@pytest.mark.parametrize("logout_token", [None, "", "not a jwt", "a.b.c"])
+def test_verify_malformed(logout_token):
+    with pytest.raises(InvalidLogoutToken):
+        backchannel.verify(logout_token)
+
+
+@pytest.mark.django_db
+def test_sessions(config):
+    _mapping(config, "session1", sub="sub1", sid="sid1")
+    _mapping(config, "session2", sub="sub1", sid="sid2")
+    _mapping(config, "session3", sub="sub2", sid="sid3")
+    claims = {"iss": config.authority}
+
+    def session_keys(**extra):
+        return sorted(backchannel.sessions(config, dict(claims, **extra)).values_list("session_key", flat=True))
+
+    assert session_keys(sid="sid1") == ["session1"]
+    assert session_keys(sub="sub1") == ["session1", "session2"]
+    assert session_keys(sub="sub1", sid="sid3") == []
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("enabled")
+def test_views_backchannel_logout(client, gateway, http, stub_transport, stub_session):
+    assert _log_in(client, http)["Location"] == "/success"
+    mapping = SessionMapping.objects.get()
+    session_key = client.session.session_key
+    assert mapping.session_key == session_key
+
+    response = _post(client, gateway.logout_token("client", sub=None, sid=mapping.sid))
+
+    assert response.status_code == 200
+    assert response["Cache-Control"] == "no-store"
+    assert not DjangoSession.objects.filter(session_key=session_key).exists()
+    assert not SessionMapping.objects.exists()
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("enabled")
+def test_views_logout_forgets(client, http, stub_transport, stub_session):
+    _log_in(client, http)
+
+    client.get(reverse(Routes.route_logout))
+
+    assert not SessionMapping.objects.exists()
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("enabled", "config", "stub_transport")
+def test_views_backchannel_logout_invalid(client, gateway):
+    response = _post(client, gateway.logout_token("client", nonce="nonce1"))
+
+    assert response.status_code == 400
+    assert response.json()["error"] == "invalid_request"
+    assert response["Cache-Control"] == "no-store"
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("config", "stub_transport")
+def test_views_backchannel_logout_disabled(client, gateway):
+    response = _post(client, gateway.logout_token("client", sid="sid1"))
+
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("enabled", "config")
+def test_views_backchannel_logout_unavailable(mocker, client, gateway):
+    mocker.patch("cdt_identity.views.backchannel.verify", side_effect=CircuitOpen(gateway.authority))
+
+    response = _post(client, gateway.logout_token("client", sid="sid1"))
+
+    assert response.status_code == 503
+
+
+def test_views_backchannel_logout_get(client):
+    assert client.get(reverse(Routes.route_backchannel_logout)).status_code == 405
+
+
+@pytest.mark.django_db
+def test_identity_logout(config):
+    _mapping(config, _session(), sub="sub1")
+    _mapping(config, _session(), sub="sub2")
+    stdout = io.StringIO()
+
+    call_command("identity_logout", client="stub", sub="sub1", stdout=stdout)
+
+    assert stdout.getvalue().strip() == "Ended 1 sessions"
+    assert list(SessionMapping.objects.values_list("sub", flat=True)) == ["sub2"]
+    assert DjangoSession.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_identity_logout_expired(config):
+    _mapping(config, "expired", expires=timezone.now() - timedelta(seconds=1))
+    stdout = io.StringIO()
+
+    call_command("identity_logout", expired=True, stdout=stdout)
+
+    assert stdout.getvalue().strip() == "Forgot 1 expired sessions"
+
+
+def test_identity_logout_no_client():
+    with pytest.raises(CommandError):
+        call_command("identity_logout")
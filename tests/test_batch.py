@@ -0,0 +1,84 @@
+import io
+import json
+
+import pytest
+
+from cdt_identity.batch import ChunkResult, InvalidRecord, Summary, chunked, read_jsonl, verify_chunk, verify_claims
+from cdt_identity.claims import ClaimSchema
+
+RECORDS = [
+    {"claim1": "1", "claim2": "value1"},
+    {"claim1": "0", "claim2": "value2"},
+    {"claim1": "15"},
+    {"claim1": "true", "claim2": "false"},
+    {"claim1": "20", "claim2": "value3"},
+]
+
+
+def test_read_jsonl():
+    file = io.StringIO('{"claim1": "1"}\n\n{"claim1": "0"}\n')
+
+    assert list(read_jsonl(file)) == [{"claim1": "1"}, {"claim1": "0"}]
+
+
+@pytest.mark.parametrize("line", ["[1, 2]", "null", "{"])
+def test_read_jsonl_invalid(line):
+    file = io.StringIO(f'{{"claim1": "1"}}\n{line}\n')
+
+    with pytest.raises(InvalidRecord, match="Line 2"):
+        list(read_jsonl(file))
+
+
+def test_chunked():
+    assert list(chunked(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(chunked([], 2)) == []
+
+
+def test_verify_chunk():
+    result = verify_chunk({"claim1": "auto", "claim2": "value"}, RECORDS)
+
+    assert len(result) == 5
+    assert result.claims == {
+        "claim1": [True, None, None, True, None],
+        "claim2": ["value1", "value2", None, "false", "value3"],
+    }
+    assert result.errors == {"claim1": [None, None, 15, None, 20], "claim2": [None] * 5}
+
+
+def test_verify_chunk_no_warnings(caplog):
+    verify_chunk(ClaimSchema.from_string("claim3"), RECORDS)
+
+    assert "did not contain claim" not in caplog.text
+
+
+@pytest.mark.parametrize("processes", [None, 2])
+def test_verify_claims(processes):
+    chunks = list(verify_claims(iter(RECORDS), "claim1 claim2", chunk_size=2, processes=processes))
+
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert [value for chunk in chunks for value in chunk.claims["claim1"]] == [True, None, None, True, None]
+    assert [code for chunk in chunks for code in chunk.errors["claim1"]] == [None, None, 15, None, 20]
+
+
+def test_verify_claims_chunk_size():
+    with pytest.raises(ValueError, match="chunk_size"):
+        list(verify_claims(iter(RECORDS), "claim1", chunk_size=0))
+
+
+def test_summary():
+    summary = Summary(["claim1", "claim2"])
+
+    for chunk in verify_claims(RECORDS, "claim1 claim2", chunk_size=2):
+        summary.add(chunk)
+
+    assert summary.as_dict() == {
+        "records": 5,
+        "verified": {"claim1": 2, "claim2": 3},
+        "errors": {"claim1": {"15": 1, "20": 1}, "claim2": {}},
+    }
+
+
+def test_chunk_result_as_dict():
+    chunk = ChunkResult({"claim1": [True]}, {"claim1": [None]})
+
+    assert json.loads(json.dumps(chunk.as_dict())) == {"claims": {"claim1": [True]}, "errors": {"claim1": [None]}}
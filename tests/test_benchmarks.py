@@ -0,0 +1,40 @@
+from benchmarks.runner import Result, compare, load, measure, save
+
+
+def result(name, ops_per_sec):
+    return Result(name, ops_per_sec, alloc_bytes=0, alloc_blocks=0, rounds=1, iterations=1)
+
+
+def test_measure():
+    calls = []
+
+    measured = measure("append", lambda: calls.append(1), rounds=2, min_time=0.001)
+
+    assert measured.name == "append"
+    assert measured.ops_per_sec > 0
+    assert measured.iterations >= 1
+    assert measured.alloc_bytes >= 0
+    assert len(calls) >= measured.iterations * 2
+
+
+def test_save_load(tmp_path):
+    path = tmp_path / "results.json"
+    results = [result("claims", 1000.0), result("session", 500.0)]
+
+    save(results, path)
+
+    assert load(path) == results
+
+
+def test_compare():
+    baseline = [result("claims", 1000.0), result("session", 500.0)]
+    results = [result("claims", 850.0), result("session", 480.0), result("new", 1.0)]
+
+    regressions = compare(results, baseline, threshold=0.1)
+
+    assert len(regressions) == 1
+    assert regressions[0].startswith("claims: 850 ops/sec is 15.0% slower")
+
+
+def test_compare_threshold():
+    assert compare([result("claims", 850.0)], [result("claims", 1000.0)], threshold=0.2) == []
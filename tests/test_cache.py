@@ -0,0 +1,152 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.cache import cache as shared_cache
+from django.db import transaction
+
+from cdt_identity.cache import VERSION_KEY, ClientConfigCache, client_configs
+from cdt_identity.models import ClientConfig
+
+
+@pytest.fixture
+def config():
+    return ClientConfig.objects.create(
+        client_name="test-client", client_id="test-client-id", authority="https://auth.example.com", scheme="bearer"
+    )
+
+
+@pytest.fixture
+def shared(settings):
+    settings.CDT_IDENTITY_CLIENT_CONFIG_CACHE_SHARED = True
+    shared_cache.delete(VERSION_KEY)
+    yield
+    shared_cache.delete(VERSION_KEY)
+
+
+def test_get_none():
+    assert ClientConfigCache().get() is None
+
+
+@pytest.mark.django_db
+def test_get_by_id(config, django_assert_num_queries):
+    cache = ClientConfigCache()
+
+    with django_assert_num_queries(1):
+        assert cache.get(id=config.id) == config
+    with django_assert_num_queries(0):
+        assert cache.get(id=config.id) == config
+        assert cache.get(client_name=config.client_name) == config
+
+
+@pytest.mark.django_db
+def test_get_by_client_name(config, django_assert_num_queries):
+    cache = ClientConfigCache()
+
+    with django_assert_num_queries(1):
+        assert cache.get(client_name=config.client_name) == config
+    with django_assert_num_queries(0):
+        assert cache.get(id=config.id) == config
+
+
+@pytest.mark.django_db
+def test_get_missing(django_assert_num_queries):
+    cache = ClientConfigCache()
+
+    with django_assert_num_queries(1):
+        assert cache.get(id=999) is None
+
+
+@pytest.mark.django_db
+def test_get_expired(mocker, config, django_assert_num_queries):
+    cache = ClientConfigCache()
+    mock_time = mocker.patch("cdt_identity.cache.time").monotonic
+    mock_time.return_value = 1000
+    cache.get(id=config.id)
+
+    mock_time.return_value = 1000 + 301
+
+    with django_assert_num_queries(1):
+        assert cache.get(id=config.id) == config
+
+
+@pytest.mark.django_db
+def test_get_ttl_disabled(settings, config, django_assert_num_queries):
+    settings.CDT_IDENTITY_CLIENT_CONFIG_CACHE_TTL = 0
+    cache = ClientConfigCache()
+
+    with django_assert_num_queries(2):
+        cache.get(id=config.id)
+        cache.get(id=config.id)
+
+
+@pytest.mark.django_db
+def test_post_save_invalidates(config, django_assert_num_queries, django_capture_on_commit_callbacks):
+    client_configs.get(id=config.id)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        config.scheme = "updated"
+        config.save()
+
+    with django_assert_num_queries(1):
+        assert client_configs.get(id=config.id).scheme == "updated"
+
+
+@pytest.mark.django_db
+def test_post_save_invalidates_on_commit(config, django_assert_num_queries, django_capture_on_commit_callbacks):
+    client_configs.get(id=config.id)
+
+    with django_capture_on_commit_callbacks() as callbacks:
+        with transaction.atomic():
+            config.scheme = "updated"
+            config.save()
+
+        # not committed yet, so the cached row stays
+        with django_assert_num_queries(0):
+            assert client_configs.get(id=config.id).scheme == "bearer"
+
+    for callback in callbacks:
+        callback()
+    with django_assert_num_queries(1):
+        assert client_configs.get(id=config.id).scheme == "updated"
+
+
+@pytest.mark.django_db
+def test_post_delete_invalidates(config, django_capture_on_commit_callbacks):
+    config_id = config.id
+    client_configs.get(id=config_id)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        config.delete()
+
+    assert client_configs.get(id=config_id) is None
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("shared")
+def test_shared_version_invalidates_other_processes(config, django_assert_num_queries):
+    cache1 = ClientConfigCache()
+    cache2 = ClientConfigCache()
+    cache1.get(id=config.id)
+    cache2.get(id=config.id)
+    version = shared_cache.get(VERSION_KEY, 0)
+
+    cache2.invalidate()
+
+    assert shared_cache.get(VERSION_KEY) == version + 1
+    with django_assert_num_queries(1):
+        cache1.get(id=config.id)
+    with django_assert_num_queries(0):
+        cache1.get(id=config.id)
+
+
+@pytest.mark.django_db
+def test_aget(config, django_assert_num_queries):
+    cache = ClientConfigCache()
+
+    with django_assert_num_queries(1):
+        assert async_to_sync(cache.aget)(client_name=config.client_name) == config
+    with django_assert_num_queries(0):
+        assert async_to_sync(cache.aget)(id=config.id) == config
+
+
+def test_aget_none():
+    assert async_to_sync(ClientConfigCache().aget)() is None
@@ -0,0 +1,155 @@
+import asyncio
+import threading
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseRedirect
+
+from cdt_identity import callbacks
+from cdt_identity.callbacks import acoalesce, coalesce
+from cdt_identity.resilience import DeadlineExceeded
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def view(mocker):
+    return mocker.Mock(return_value=HttpResponseRedirect("/success"))
+
+
+@pytest.mark.django_db
+def test_coalesce_first(mock_request, view):
+    response = coalesce(mock_request, "state1", view)
+
+    assert response is view.return_value
+    view.assert_called_once()
+
+
+@pytest.mark.django_db
+def test_coalesce_repeat(mocker, mock_request, view):
+    coalesce(mock_request, "state1", view)
+    repeat = mocker.Mock()
+
+    response = coalesce(mock_request, "state1", repeat)
+
+    assert response.url == "/success"
+    repeat.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_coalesce_other_state(mock_request, view):
+    coalesce(mock_request, "state1", view)
+    coalesce(mock_request, "state2", view)
+
+    assert view.call_count == 2
+
+
+@pytest.mark.django_db
+def test_coalesce_other_session(mock_request, rf, view):
+    coalesce(mock_request, "state1", view)
+    other = rf.get("/")
+    other.session = mock_request.session.__class__()
+    other.session.save()
+
+    coalesce(other, "state1", view)
+
+    assert view.call_count == 2
+
+
+@pytest.mark.django_db
+def test_coalesce_concurrent(mock_request, settings):
+    settings.CDT_IDENTITY_CALLBACK_WAIT = 5
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def first():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return HttpResponseRedirect("/success")
+
+    results = {}
+    thread = threading.Thread(target=lambda: results.update(first=coalesce(mock_request, "state1", first)))
+    thread.start()
+    started.wait(5)
+
+    repeat = threading.Thread(target=lambda: results.update(repeat=coalesce(mock_request, "state1", first)))
+    repeat.start()
+    release.set()
+    thread.join(5)
+    repeat.join(5)
+
+    assert len(calls) == 1
+    assert results["first"].url == results["repeat"].url == "/success"
+
+
+@pytest.mark.django_db
+def test_coalesce_error_lets_repeat_handle(mocker, mock_request, view):
+    failing = mocker.Mock(side_effect=ValueError("exchange failed"))
+    with pytest.raises(ValueError):
+        coalesce(mock_request, "state1", failing)
+
+    assert coalesce(mock_request, "state1", view) is view.return_value
+
+
+@pytest.mark.django_db
+def test_coalesce_not_redirect_not_shared(mocker, mock_request, view):
+    coalesce(mock_request, "state1", mocker.Mock(return_value=HttpResponse("error")))
+
+    assert coalesce(mock_request, "state1", view) is view.return_value
+
+
+@pytest.mark.django_db
+def test_coalesce_wait_timeout(mocker, mock_request, settings, view):
+    settings.CDT_IDENTITY_CALLBACK_WAIT = 0.1
+    mocker.patch.object(callbacks, "POLL_INTERVAL", 0.01)
+    cache.add(f"{callbacks._key(mock_request, 'state1')}:lock", 1)
+
+    with pytest.raises(DeadlineExceeded):
+        coalesce(mock_request, "state1", view)
+    view.assert_not_called()
+
+
+@pytest.mark.parametrize("deadline,wait,expected", [(10, 10, 15), (30, 10, 35), (None, 10, 15), (5, 20, 25)])
+def test_lock_timeout(settings, deadline, wait, expected):
+    settings.CDT_IDENTITY_REQUEST_DEADLINE = deadline
+    settings.CDT_IDENTITY_CALLBACK_WAIT = wait
+
+    # the lock outlives a first callback that runs until its deadline
+    assert callbacks._lock_timeout() == expected
+
+
+@pytest.mark.django_db
+def test_coalesce_lock_outlives_deadline(mocker, mock_request, settings, view):
+    settings.CDT_IDENTITY_REQUEST_DEADLINE = 10
+    settings.CDT_IDENTITY_CALLBACK_WAIT = 10
+    add = mocker.spy(cache, "add")
+
+    coalesce(mock_request, "state1", view)
+
+    assert add.call_args.kwargs["timeout"] > 10
+
+
+@pytest.mark.django_db
+def test_acoalesce_concurrent(mocker, mock_request):
+    mocker.patch.object(callbacks, "POLL_INTERVAL", 0.01)
+    calls = []
+
+    async def first():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return HttpResponseRedirect("/success")
+
+    async def both():
+        return await asyncio.gather(acoalesce(mock_request, "state1", first), acoalesce(mock_request, "state1", first))
+
+    responses = async_to_sync(both)()
+
+    assert len(calls) == 1
+    assert [response.url for response in responses] == ["/success", "/success"]
@@ -1,6 +1,6 @@
 import pytest
 
-from cdt_identity.claims import Claims
+from cdt_identity.claims import AUTO, VALUE, Claims, ClaimSchema
 
 
 @pytest.mark.parametrize(
@@ -46,3 +46,92 @@ def test_claims(userinfo, expected_claims, claims, errors):
         assert obj[key] == value
         assert obj.get(key) == value
         assert key in obj
+
+
+@pytest.mark.parametrize(
+    "userinfo, expected_claims, claims, errors",
+    [
+        # typed boolean claims ignore other values
+        (
+            {"claim1": "1", "claim2": "TRUE", "claim3": "value", "claim4": "12"},
+            "claim1:boolean claim2:boolean claim3:boolean claim4:boolean",
+            {"claim1": True, "claim2": True},
+            {"claim4": 12},
+        ),
+        # typed error-code claims only report errors
+        (
+            {"claim1": "1", "claim2": "15", "claim3": 20},
+            "claim1:error-code claim2:error-code claim3:error-code",
+            {},
+            {"claim2": 15, "claim3": 20},
+        ),
+        # typed value claims are stored as-is
+        (
+            {"claim1": "1", "claim2": "true", "claim3": "007", "claim4": 1},
+            "claim1:value claim2:value claim3:value claim4:value",
+            {"claim1": "1", "claim2": "true", "claim3": "007"},
+            {},
+        ),
+        # untyped claims in a string are auto
+        (
+            {"claim1": "1", "claim2": "value", "claim3": "15"},
+            "claim1  claim2 claim3",
+            {"claim1": True, "claim2": "value"},
+            {"claim3": 15},
+        ),
+    ],
+)
+def test_claims_schema(userinfo, expected_claims, claims, errors):
+    obj = Claims(userinfo, ClaimSchema.from_string(expected_claims))
+
+    assert obj.claims == claims
+    assert obj.errors == errors
+
+
+@pytest.mark.parametrize(
+    "value, claims, errors",
+    [
+        (1, {"claim": True}, {}),
+        (True, {"claim": True}, {}),
+        (False, {}, {}),
+        (" 1 ", {"claim": True}, {}),
+        ("+10", {}, {"claim": 10}),
+        ("1_0", {}, {"claim": 10}),
+        (1.0, {"claim": True}, {}),
+        (float("nan"), {}, {}),
+        (None, {}, {}),
+        (["1"], {}, {}),
+        ("", {"claim": ""}, {}),
+    ],
+)
+def test_claims_auto_matches_int_coercion(value, claims, errors):
+    obj = Claims({"claim": value}, ["claim"])
+
+    assert obj.claims == claims
+    assert obj.errors == errors
+
+
+def test_claim_schema_cached():
+    schema = ClaimSchema.from_string("claim1 claim2:value")
+
+    assert ClaimSchema.from_string("claim1 claim2:value") is schema
+    assert ClaimSchema.from_claims(["claim1", "claim2:value"]) is schema
+    assert schema.claims == {"claim1": AUTO, "claim2": VALUE}
+    assert list(schema) == ["claim1", "claim2"]
+
+
+def test_claim_schema_uri_names():
+    schema = ClaimSchema.from_string("https://example.com/claims/claim1 https://example.com/claims/claim2:value")
+
+    assert schema.claims == {"https://example.com/claims/claim1": AUTO, "https://example.com/claims/claim2": VALUE}
+    obj = Claims({"https://example.com/claims/claim1": "1", "https://example.com/claims/claim2": "007"}, schema)
+    assert obj.claims == {"https://example.com/claims/claim1": True, "https://example.com/claims/claim2": "007"}
+
+
+def test_claim_schema_empty():
+    assert not ClaimSchema.from_string("")
+
+
+def test_claim_schema_unknown_type():
+    with pytest.raises(ValueError, match="Unknown type for claim claim1: other"):
+        ClaimSchema({"claim1": "other"})
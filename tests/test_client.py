@@ -1,7 +1,17 @@
+import subprocess
+import sys
+
 import pytest
 
-from cdt_identity.client import _authorize_params, _client_kwargs, _server_metadata_url, create_client
+from cdt_identity.client import (
+    ClientRegistry,
+    _authorize_params,
+    _client_kwargs,
+    _server_metadata_url,
+    create_client,
+)
 from cdt_identity.models import ClientConfig
+from cdt_identity.oauth_app import OAuth2App
 
 
 def test_client_kwargs():
@@ -39,37 +49,188 @@ def test_authorize_params(scheme, expected):
     assert params == expected
 
 
-@pytest.mark.django_db
-def test_create_client_registered(mocker, mock_oauth_registry):
+@pytest.fixture
+def mock_config(mocker):
     mock_config = mocker.Mock(spec=ClientConfig)
     mock_config.client_name = "client_name_1"
     mock_config.client_id = "client_id_1"
+    mock_config.authority = "https://example.com"
+    mock_config.fallback_authorities = ""
+    mock_config.authorities = ["https://example.com"]
+    mock_config.scheme = "config_scheme"
+    return mock_config
 
-    create_client(mock_oauth_registry, mock_config, "scopes")
 
-    mock_oauth_registry.create_client.assert_any_call("client_name_1")
-    mock_oauth_registry.register.assert_not_called()
+def test_create_client_registered(mocker, mock_config):
+    registry = ClientRegistry()
+    mock_register = mocker.patch("authlib.integrations.django_client.OAuth.register")
 
+    client = create_client(registry, mock_config, "scopes")
+
+    assert create_client(registry, mock_config, "scopes") is client
+    mock_register.assert_called_once()
+    assert registry.stats()["hits"] == 1
+    assert registry.stats()["misses"] == 1
 
-@pytest.mark.django_db
-def test_create_client_not_registered(mocker, mock_oauth_registry):
-    mock_config = mocker.Mock(spec=ClientConfig)
-    mock_config.client_name = "client_name_1"
-    mock_config.client_id = "client_id_1"
 
+def test_create_client_not_registered(mocker, mock_config):
     mocker.patch("cdt_identity.client._client_kwargs", return_value={"client": "kwargs"})
     mocker.patch("cdt_identity.client._server_metadata_url", return_value="https://metadata.url")
     mocker.patch("cdt_identity.client._authorize_params", return_value={"scheme": "test_scheme"})
+    mock_register = mocker.patch("authlib.integrations.django_client.OAuth.register")
+
+    client = create_client(ClientRegistry(), mock_config, "scopes")
+
+    assert client == mock_register.return_value
+    mock_register.assert_called_once_with(
+        "client_name_1",
+        client_cls=OAuth2App,
+        authority="https://example.com",
+        authorities=["https://example.com"],
+        client_id="client_id_1",
+        server_metadata_url="https://metadata.url",
+        client_kwargs={"client": "kwargs"},
+        authorize_params={"scheme": "test_scheme"},
+    )
+
+
+def test_create_client_authlib_registered(mock_oauth_registry, mock_config):
+    client = create_client(mock_oauth_registry, mock_config, "scopes")
 
+    assert client == mock_oauth_registry.create_client.return_value
+    mock_oauth_registry.create_client.assert_called_once_with("client_name_1")
+    mock_oauth_registry.register.assert_not_called()
+
+
+def test_create_client_authlib_not_registered(mocker, mock_oauth_registry, mock_config):
+    mocker.patch("cdt_identity.client._client_kwargs", return_value={"client": "kwargs"})
+    mocker.patch("cdt_identity.client._server_metadata_url", return_value="https://metadata.url")
+    mocker.patch("cdt_identity.client._authorize_params", return_value={"scheme": "test_scheme"})
     mock_oauth_registry.create_client.return_value = None
 
-    create_client(mock_oauth_registry, mock_config, "scopes")
+    client = create_client(mock_oauth_registry, mock_config, "scopes")
 
-    mock_oauth_registry.create_client.assert_any_call("client_name_1")
-    mock_oauth_registry.register.assert_any_call(
+    assert client == mock_oauth_registry.register.return_value
+    mock_oauth_registry.register.assert_called_once_with(
         "client_name_1",
+        client_cls=OAuth2App,
+        authority="https://example.com",
+        authorities=["https://example.com"],
         client_id="client_id_1",
         server_metadata_url="https://metadata.url",
         client_kwargs={"client": "kwargs"},
         authorize_params={"scheme": "test_scheme"},
     )
+
+
+def test_create_client_authlib_real(mock_config):
+    from authlib.integrations.django_client import OAuth
+
+    registry = OAuth()
+    client = create_client(registry, mock_config, "scopes", "scheme")
+
+    assert isinstance(client, OAuth2App)
+    assert create_client(registry, mock_config, "other scopes") is client
+
+
+def test_create_client_real(mock_config):
+    client = create_client(ClientRegistry(), mock_config, "scopes", "scheme")
+
+    assert isinstance(client, OAuth2App)
+    assert client.name == "client_name_1"
+    assert client.authority == "https://example.com"
+    assert client.authorities == ["https://example.com"]
+    assert client.authorize_params == {"scheme": "scheme"}
+    assert client.framework.name == "client_name_1"
+
+
+@pytest.mark.parametrize(
+    "scopes, scheme, config_changes",
+    [
+        ("other_scopes", "", {}),
+        ("scopes", "other_scheme", {}),
+        ("scopes", "", {"authority": "https://other.example.com"}),
+        ("scopes", "", {"client_id": "other_client_id"}),
+    ],
+)
+def test_create_client_key(mock_config, scopes, scheme, config_changes):
+    registry = ClientRegistry()
+    client = create_client(registry, mock_config, "scopes")
+
+    for attr, value in config_changes.items():
+        setattr(mock_config, attr, value)
+
+    assert create_client(registry, mock_config, scopes, scheme) is not client
+    assert len(registry) == 2
+
+
+def test_create_client_key_client_cls(mocker, mock_config):
+    registry = ClientRegistry()
+
+    client = create_client(registry, mock_config, "scopes")
+    other = create_client(registry, mock_config, "scopes", client_cls=mocker.Mock(OAUTH_APP_CONFIG=None))
+
+    assert other is not client
+
+
+def test_registry_get_or_create(mocker):
+    registry = ClientRegistry(max_size=2)
+    factory = mocker.Mock(side_effect=lambda: object())
+
+    client = registry.get_or_create("key", factory)
+
+    assert registry.get_or_create("key", factory) is client
+    factory.assert_called_once()
+
+
+def test_registry_evicts_least_recently_used(mocker):
+    registry = ClientRegistry(max_size=2)
+    clients = {key: registry.get_or_create(key, object) for key in ("a", "b")}
+    registry.get_or_create("a", object)
+
+    registry.get_or_create("c", object)
+
+    assert len(registry) == 2
+    assert registry.get_or_create("a", object) is clients["a"]
+    assert registry.get_or_create("b", object) is not clients["b"]
+    assert registry.stats() == {"size": 2, "max_size": 2, "hits": 2, "misses": 4, "evictions": 2}
+
+
+def test_registry_max_size_setting(settings):
+    settings.CDT_IDENTITY_CLIENT_REGISTRY_MAX_SIZE = 1
+    registry = ClientRegistry()
+
+    registry.get_or_create("a", object)
+    registry.get_or_create("b", object)
+
+    assert len(registry) == 1
+    assert registry.evictions == 1
+
+
+def test_registry_clear():
+    registry = ClientRegistry()
+    registry.get_or_create("a", object)
+
+    registry.clear()
+
+    assert len(registry) == 0
+
+
+def test_oauth2_app_reexported():
+    from cdt_identity import client
+
+    assert client.OAuth2App is OAuth2App
+    with pytest.raises(AttributeError):
+        client.missing
+
+
+def test_import_defers_authlib():
+    code = (
+        "import os, sys, django; os.environ['DJANGO_SETTINGS_MODULE'] = 'tests.settings'; django.setup();"
+        "import cdt_identity.client, cdt_identity.redirects, cdt_identity.urls;"
+        "print(any(m.startswith(('authlib', 'joserfc')) for m in sys.modules))"
+    )
+
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+
+    assert result.stdout.strip() == "False"
@@ -0,0 +1,74 @@
+import io
+import json
+from datetime import timedelta
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.utils import timezone
+
+from cdt_identity.models import ClientConfig, IdToken
+
+
+def test_verify_claims(tmp_path):
+    input_path = tmp_path / "userinfo.jsonl"
+    input_path.write_text('{"claim1": "1", "claim2": "value"}\n{"claim1": "15"}\n{"claim1": "0"}\n')
+    output_path = tmp_path / "results.jsonl"
+    stdout = io.StringIO()
+
+    call_command(
+        "verify_claims",
+        str(input_path),
+        claims="claim1 claim2:value",
+        chunk_size=2,
+        output=str(output_path),
+        stdout=stdout,
+    )
+
+    summary = json.loads(stdout.getvalue())
+    assert summary == {"records": 3, "verified": {"claim1": 1, "claim2": 1}, "errors": {"claim1": {"15": 1}, "claim2": {}}}
+    chunks = [json.loads(line) for line in output_path.read_text().splitlines()]
+    assert len(chunks) == 2
+    assert chunks[0]["claims"] == {"claim1": [True, None], "claim2": ["value", None]}
+
+
+@pytest.mark.parametrize("options", [{"chunk_size": 0}, {"chunk_size": -1}, {"processes": 0}])
+def test_verify_claims_invalid_options(tmp_path, options):
+    input_path = tmp_path / "userinfo.jsonl"
+    input_path.write_text('{"claim1": "1"}\n')
+
+    with pytest.raises(CommandError, match="must be at least 1"):
+        call_command("verify_claims", str(input_path), claims="claim1", stdout=io.StringIO(), **options)
+
+
+@pytest.mark.parametrize("line", ["[1, 2]", '"claim1"', "not json"])
+def test_verify_claims_invalid_record(tmp_path, line):
+    input_path = tmp_path / "userinfo.jsonl"
+    input_path.write_text(f'{{"claim1": "1"}}\n\n{line}\n')
+
+    with pytest.raises(CommandError, match="Line 3 is not"):
+        call_command("verify_claims", str(input_path), claims="claim1", stdout=io.StringIO())
+
+
+@pytest.mark.django_db
+def test_identity_warmup(gateway, stub_transport):
+    ClientConfig.objects.create(client_name="stub", client_id="client", authority=gateway.authority, scheme="s")
+    stdout = io.StringIO()
+
+    call_command("identity_warmup", budget=5, stdout=stdout)
+
+    assert json.loads(stdout.getvalue()) == {"clients": 1, "authorities": {gateway.authority: "ok"}}
+
+
+@pytest.mark.django_db
+def test_identity_purge_tokens():
+    now = timezone.now()
+    IdToken.objects.bulk_create(
+        [IdToken(handle=f"expired{i}", token="token", expires=now - timedelta(seconds=1)) for i in range(3)]
+        + [IdToken(handle="live", token="token", expires=now + timedelta(hours=1))]
+    )
+    stdout = io.StringIO()
+
+    call_command("identity_purge_tokens", batch_size=2, stdout=stdout)
+
+    assert stdout.getvalue().strip() == "Deleted 3 expired id_tokens"
+    assert list(IdToken.objects.values_list("handle", flat=True)) == ["live"]
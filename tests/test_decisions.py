@@ -0,0 +1,228 @@
+import pickle
+from urllib.parse import urlsplit
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.urls import reverse
+
+from cdt_identity import decisions
+from cdt_identity.models import ClientConfig
+from cdt_identity.routes import Routes
+from cdt_identity.session import Session
+
+TOKEN = {"id_token": "token", "userinfo": {"sub": "user1", "claim1": "1"}}
+
+ELIGIBLE = {"eligible": True, "claims": {"claim1": True}}
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def enabled(settings):
+    settings.CDT_IDENTITY_ELIGIBILITY_CACHE_TTL = 60
+
+
+@pytest.fixture
+def config(db):
+    return ClientConfig.objects.create(client_name="client", client_id="id", authority="https://example.com", scheme="s")
+
+
+@pytest.fixture
+def session(db, mock_request):
+    session = Session(mock_request)
+    session.oidc_expected_claims = "claim1"
+    session.oidc_eligibility_claims = "claim1"
+    return session
+
+
+def test_key_disabled(session, config):
+    assert decisions.key(session, config, TOKEN) == ""
+
+
+@pytest.mark.usefixtures("enabled")
+def test_key(session, config):
+    key = decisions.key(session, config, TOKEN)
+
+    assert key
+    assert "user1" not in key
+    assert key == decisions.key(session, config, TOKEN)
+    assert key != decisions.key(session, config, {"userinfo": {"sub": "user2"}})
+
+
+@pytest.mark.usefixtures("enabled")
+def test_key_no_sub(session, config):
+    assert decisions.key(session, config, {"id_token": "token"}) == ""
+
+
+@pytest.mark.usefixtures("enabled")
+def test_key_context(session, config):
+    key = decisions.key(session, config, TOKEN)
+
+    session.oidc_eligibility_claims = "claim2"
+
+    assert decisions.key(session, config, TOKEN) != key
+
+
+@pytest.mark.usefixtures("enabled")
+def test_key_salted(settings, session, config):
+    key = decisions.key(session, config, TOKEN)
+
+    settings.SECRET_KEY = "another secret key"
+
+    assert decisions.key(session, config, TOKEN) != key
+
+
+@pytest.mark.usefixtures("enabled")
+def test_remember_get(session, config):
+    key = decisions.key(session, config, TOKEN)
+
+    decisions.remember(key, ELIGIBLE)
+
+    assert decisions.get(key) == ELIGIBLE
+    assert async_to_sync(decisions.aget)(key) == ELIGIBLE
+
+
+@pytest.mark.usefixtures("enabled")
+def test_remember_claim_values(session, config):
+    key = decisions.key(session, config, TOKEN)
+
+    decisions.remember(key, {"eligible": True, "claims": {"claim1": True, "name": "A Person"}})
+
+    assert decisions.get(key) is None
+
+
+@pytest.mark.usefixtures("enabled")
+def test_aremember(session, config):
+    key = decisions.key(session, config, TOKEN)
+
+    async_to_sync(decisions.aremember)(key, ELIGIBLE)
+
+    assert decisions.get(key) == ELIGIBLE
+
+
+@pytest.mark.usefixtures("enabled")
+def test_remember_ineligible(session, config):
+    key = decisions.key(session, config, TOKEN)
+
+    decisions.remember(key, {"eligible": False, "claims": {}})
+    async_to_sync(decisions.aremember)(key, {"eligible": False, "claims": {}})
+
+    assert decisions.get(key) is None
+
+
+@pytest.mark.usefixtures("enabled")
+def test_get_ineligible_entry(session, config):
+    key = decisions.key(session, config, TOKEN)
+    # e.g. cached by an earlier version
+    cache.set(f"{decisions.KEY_PREFIX}:{key}", {"eligible": False, "claims": []})
+
+    assert decisions.get(key) is None
+
+
+def test_remember_no_key():
+    decisions.remember("", ELIGIBLE)
+
+    assert decisions.get("") is None
+
+
+@pytest.mark.usefixtures("enabled")
+def test_recall(session, config):
+    key = decisions.key(session, config, TOKEN)
+    decisions.remember(key, ELIGIBLE)
+    session.oidc_decision = key
+
+    assert decisions.recall(session, config) == ELIGIBLE
+    assert async_to_sync(decisions.arecall)(session, config) == ELIGIBLE
+
+
+@pytest.mark.usefixtures("enabled")
+def test_recall_other_claims(session, config):
+    key = decisions.key(session, config, TOKEN)
+    decisions.remember(key, ELIGIBLE)
+    session.oidc_decision = key
+
+    session.oidc_expected_claims = "claim1 claim2"
+
+    assert decisions.recall(session, config) is None
+
+
+@pytest.mark.usefixtures("enabled")
+def test_recall_edited_config(session, config):
+    key = decisions.key(session, config, TOKEN)
+    decisions.remember(key, ELIGIBLE)
+    session.oidc_decision = key
+
+    config.authority = "https://other.example.com"
+
+    assert decisions.recall(session, config) is None
+
+
+def test_recall_disabled(settings, session, config):
+    settings.CDT_IDENTITY_ELIGIBILITY_CACHE_TTL = 60
+    key = decisions.key(session, config, TOKEN)
+    decisions.remember(key, ELIGIBLE)
+    session.oidc_decision = key
+
+    settings.CDT_IDENTITY_ELIGIBILITY_CACHE_TTL = 0
+
+    assert decisions.recall(session, config) is None
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("enabled")
+def test_views_skip_gateway(client, gateway, http, stub_transport, stub_session):
+    response = client.get(reverse(Routes.route_login))
+    response = http.get(response["Location"], allow_redirects=False)
+    callback = urlsplit(response.headers["Location"])
+    response = client.get(f"{callback.path}?{callback.query}")
+    assert response["Location"] == "/success"
+
+    # the user comes back, and the app starts over
+    request = client.get("/").wsgi_request
+    session = Session(request, reset=True)
+    session.oidc_expected_claims = "claim1"
+    session.oidc_eligibility_claims = "claim1"
+    request.session.save()
+
+    response = client.get(reverse(Routes.route_login))
+
+    assert response["Location"] == "/success"
+    assert client.session["cdt_identity"]["verified_claims"] == {"claim1": True}
+    # no personal information in the cache
+    assert all(b"stub-user" not in pickle.dumps(entry) for entry in cache._cache.values())
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("enabled")
+def test_views_ineligible_retries(client, gateway, http, stub_transport, stub_session):
+    gateway.claims = {}
+    response = client.get(reverse(Routes.route_login))
+    response = http.get(response["Location"], allow_redirects=False)
+    callback = urlsplit(response.headers["Location"])
+    response = client.get(f"{callback.path}?{callback.query}")
+    assert response["Location"] == "/fail"
+
+    # the user tries again, e.g. with another account
+    response = client.get(reverse(Routes.route_login))
+
+    assert response["Location"].startswith(f"{gateway.authority}/authorize?")
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("enabled")
+def test_views_logout_forgets(client, gateway, http, stub_transport, stub_session):
+    response = client.get(reverse(Routes.route_login))
+    response = http.get(response["Location"], allow_redirects=False)
+    callback = urlsplit(response.headers["Location"])
+    client.get(f"{callback.path}?{callback.query}")
+
+    client.get(reverse(Routes.route_logout))
+    response = client.get(reverse(Routes.route_login))
+
+    assert response["Location"].startswith(f"{gateway.authority}/authorize?")
@@ -0,0 +1,283 @@
+import asyncio
+import threading
+import time
+from urllib.parse import urlsplit
+
+import pytest
+import requests
+from asgiref.sync import async_to_sync
+from authlib.integrations.base_client import OAuthError
+from django.urls import reverse
+
+from cdt_identity import hedging
+from cdt_identity.hedging import AuthorityHealth, afailover, ahedge, failover, hedge, health
+from cdt_identity.metadata import metadata_store
+from cdt_identity.resilience import CircuitOpen, DeadlineExceeded, GatewayUnavailable
+from cdt_identity.routes import Routes
+from cdt_identity.transport import transport
+
+
+@pytest.fixture(autouse=True)
+def hedge_settings(settings):
+    settings.CDT_IDENTITY_HEDGE_DELAY = 0.05
+    health.clear()
+    yield
+    drain()
+    health.clear()
+
+
+def drain():
+    # wait for calls that lost, so they don't fill caches after the test
+    if hedging._executor is not None:
+        hedging._executor.shutdown(wait=True)
+        hedging._executor = None
+
+
+@pytest.fixture
+def replica(gateway):
+    return gateway.replica("https://replica.identity-gateway.test")
+
+
+def test_health_order():
+    authority_health = AuthorityHealth()
+    authority_health.record("slow", 1.0, ok=True)
+    authority_health.record("fast", 0.1, ok=True)
+
+    assert authority_health.order(["slow", "fast", "unknown"]) == ["unknown", "fast", "slow"]
+
+
+def test_health_failures(settings):
+    settings.CDT_IDENTITY_HEALTH_FAILURE_PENALTY = 10
+    authority_health = AuthorityHealth()
+    authority_health.record("failing", 0.1, ok=False)
+    authority_health.record("slow", 1.0, ok=True)
+
+    assert authority_health.score("failing") == pytest.approx(10.1)
+    assert authority_health.order(["failing", "slow"]) == ["slow", "failing"]
+
+
+def test_health_moving_average(settings):
+    settings.CDT_IDENTITY_HEALTH_WEIGHT = 0.5
+    authority_health = AuthorityHealth()
+    authority_health.record("a", 1.0, ok=True)
+    authority_health.record("a", 0.0, ok=False)
+
+    assert authority_health.stats() == {"a": {"latency": 0.5, "failures": 0.5}}
+
+
+def test_hedge_first():
+    assert hedge(["a", "b"], lambda authority: authority) == "a"
+    assert set(health.stats()) == {"a"}
+
+
+def test_hedge_slow():
+    # the hedged call to b answers first, the call to a is left to finish in the background
+    released = threading.Event()
+
+    def call(authority):
+        if authority == "a":
+            assert released.wait(5)
+        return authority
+
+    start = time.monotonic()
+    try:
+        assert hedge(["a", "b"], call) == "b"
+        assert time.monotonic() - start < 0.5
+    finally:
+        released.set()
+    drain()
+    assert health.order(["a", "b"]) == ["b", "a"]
+
+
+def test_hedge_fastest_wins():
+    def call(authority):
+        time.sleep(1 if authority == "a" else 0.01)
+        return authority
+
+    start = time.monotonic()
+    assert hedge(["a", "b"], call) == "b"
+    assert time.monotonic() - start < 0.5
+
+
+def test_hedge_slow_then_fails():
+    def call(authority):
+        if authority == "a":
+            time.sleep(0.3)
+            raise ValueError(authority)
+        return authority
+
+    start = time.monotonic()
+    assert hedge(["a", "b"], call) == "b"
+    # b was called while a was slow, not after it failed
+    assert time.monotonic() - start < 0.3 + 0.25
+
+
+def test_hedge_workers_busy(mocker):
+    hedging._get_executor()
+    mocker.patch.object(hedging, "_slots", threading.BoundedSemaphore(1))
+    hedging._slots.acquire()
+    threads = []
+
+    def call(authority):
+        threads.append(threading.current_thread())
+        if authority == "a":
+            raise ValueError(authority)
+        return authority
+
+    assert hedge(["a", "b"], call) == "b"
+    # no worker was free, so b was called once a failed, on the calling thread
+    assert threads == [threading.current_thread()] * 2
+
+
+def test_hedge_failover(mocker):
+    sleep = mocker.spy(time, "sleep")
+
+    def call(authority):
+        if authority == "a":
+            raise ValueError(authority)
+        return authority
+
+    assert hedge(["a", "b"], call) == "b"
+    sleep.assert_not_called()
+    assert health.stats()["a"]["failures"] == 1
+
+
+def test_hedge_all_fail():
+    def call(authority):
+        raise ValueError(authority)
+
+    with pytest.raises(ValueError, match="a"):
+        hedge(["a", "b"], call)
+
+
+def test_hedge_steered_by_health():
+    health.record("a", 1.0, ok=False)
+
+    assert hedge(["a", "b"], lambda authority: authority) == "b"
+
+
+def test_ahedge_slow():
+    async def call(authority):
+        if authority == "a":
+            await asyncio.sleep(5)
+        return authority
+
+    start = time.monotonic()
+    assert async_to_sync(ahedge)(["a", "b"], call) == "b"
+    assert time.monotonic() - start < 1
+    # the cancelled call still counts towards the health of a
+    assert set(health.stats()) == {"a", "b"}
+
+
+def test_ahedge_all_fail():
+    async def call(authority):
+        raise ValueError(authority)
+
+    with pytest.raises(ValueError, match="a"):
+        async_to_sync(ahedge)(["a", "b"], call)
+
+
+@pytest.mark.django_db
+def test_views_slow_authority(client, gateway, replica, http, mocker, stub_transport, stub_session):
+    gateway.latency = 0.5
+    mocker.patch.object(transport, "_adapter", gateway.adapter(replica))
+    http.mount(replica.authority, replica.adapter())
+    config = stub_session.oidc_config
+    config.fallback_authorities = replica.authority
+    config.save()
+
+    start = time.monotonic()
+    response = client.get(reverse(Routes.route_login))
+    # the hedged call to the replica answered first
+    assert response["Location"].startswith(f"{replica.authority}/authorize?")
+    assert time.monotonic() - start < 0.5
+    drain()
+    # so later calls go to the replica first
+    assert health.order(config.authorities) == [replica.authority, gateway.authority]
+
+    response = http.get(response["Location"], allow_redirects=False)
+    callback = urlsplit(response.headers["Location"])
+    response = client.get(f"{callback.path}?{callback.query}")
+    assert response["Location"] == "/success"
+
+    drain()
+    metadata_store.clear(gateway.authority)
+    metadata_store.clear(replica.authority)
+
+
+def test_failover():
+    calls = []
+
+    def call(authority):
+        calls.append(authority)
+        if authority == "a":
+            raise requests.ConnectionError(authority)
+        return authority
+
+    assert failover(["a", "b"], call) == "b"
+    assert calls == ["a", "b"]
+    assert health.stats()["a"]["failures"] == 1
+
+
+@pytest.mark.parametrize("exception", [CircuitOpen("a"), GatewayUnavailable("a")])
+def test_failover_unavailable(exception):
+    def call(authority):
+        if authority == "a":
+            raise exception
+        return authority
+
+    assert failover(["a", "b"], call) == "b"
+
+
+def test_failover_deadline_exceeded():
+    def call(authority):
+        raise DeadlineExceeded(authority)
+
+    with pytest.raises(DeadlineExceeded, match="a"):
+        failover(["a", "b"], call)
+
+
+def test_failover_rejected():
+    calls = []
+
+    def call(authority):
+        calls.append(authority)
+        raise OAuthError("invalid_grant")
+
+    with pytest.raises(OAuthError):
+        failover(["a", "b"], call)
+    assert calls == ["a"]
+
+
+def test_failover_all_unavailable():
+    def call(authority):
+        raise requests.ConnectionError(authority)
+
+    with pytest.raises(requests.ConnectionError, match="a"):
+        failover(["a", "b"], call)
+
+
+def test_afailover():
+    calls = []
+
+    async def call(authority):
+        calls.append(authority)
+        if authority == "a":
+            raise requests.Timeout(authority)
+        return authority
+
+    assert async_to_sync(afailover)(["a", "b"], call) == "b"
+    assert calls == ["a", "b"]
+
+
+def test_afailover_rejected():
+    async def call(authority):
+        raise OAuthError("invalid_grant")
+
+    with pytest.raises(OAuthError):
+        async_to_sync(afailover)(["a", "b"], call)
+    assert set(health.stats()) == {"a"}
+
+
+def test_executor_reused():
+    assert hedging._get_executor() is hedging._get_executor()
@@ -0,0 +1,104 @@
+import pytest
+from asgiref.sync import async_to_sync
+from joserfc.jwk import KeySet, RSAKey
+
+from cdt_identity.jwks import KeySetCache
+
+AUTHORITY = "https://example.com"
+JWKS_URI = "https://example.com/jwks"
+
+
+@pytest.fixture(scope="module")
+def key_set():
+    return KeySet([RSAKey.generate_key(2048, parameters={"kid": "kid1"})])
+
+
+@pytest.fixture(scope="module")
+def rotated_key_set():
+    return KeySet([RSAKey.generate_key(2048, parameters={"kid": "kid2"})])
+
+
+@pytest.fixture
+def mock_time(mocker):
+    mock_time = mocker.patch("cdt_identity.jwks.time").monotonic
+    mock_time.return_value = 1000
+    return mock_time
+
+
+@pytest.fixture
+def mock_fetch(mocker, key_set):
+    return mocker.patch.object(KeySetCache, "_fetch", return_value=key_set)
+
+
+def test_fetch(mocker, key_set):
+    mock_transport = mocker.patch("cdt_identity.jwks.transport")
+    mock_transport.timeout.return_value = (5, 15)
+    mock_get = mock_transport.session.return_value.get
+    mock_get.return_value.json.return_value = key_set.as_dict()
+
+    result = KeySetCache()._fetch(JWKS_URI)
+
+    assert isinstance(result, KeySet)
+    assert [key.kid for key in result] == ["kid1"]
+    mock_get.assert_called_once_with(JWKS_URI, timeout=(5, 15))
+
+
+@pytest.mark.usefixtures("mock_time")
+def test_get_cached(mock_fetch, key_set):
+    cache = KeySetCache()
+
+    assert cache.get(AUTHORITY, JWKS_URI, kid="kid1") is key_set
+    assert cache.get(AUTHORITY, JWKS_URI, kid="kid1") is key_set
+    assert cache.get(AUTHORITY, JWKS_URI) is key_set
+    mock_fetch.assert_called_once_with(JWKS_URI)
+
+
+def test_get_unknown_kid_refreshes(mock_time, mock_fetch, rotated_key_set):
+    cache = KeySetCache()
+    cache.get(AUTHORITY, JWKS_URI, kid="kid1")
+    mock_time.return_value = 1000 + 60
+    mock_fetch.return_value = rotated_key_set
+
+    assert cache.get(AUTHORITY, JWKS_URI, kid="kid2") is rotated_key_set
+    assert mock_fetch.call_count == 2
+
+
+def test_get_unknown_kid_rate_limited(mock_time, mock_fetch, key_set):
+    cache = KeySetCache()
+    cache.get(AUTHORITY, JWKS_URI, kid="kid1")
+    mock_time.return_value = 1000 + 59
+
+    assert cache.get(AUTHORITY, JWKS_URI, kid="unknown") is key_set
+    assert cache.get(AUTHORITY, JWKS_URI, kid="unknown") is key_set
+    mock_fetch.assert_called_once()
+
+
+@pytest.mark.usefixtures("mock_time")
+def test_get_by_authority(mock_fetch):
+    cache = KeySetCache()
+
+    cache.get(AUTHORITY, JWKS_URI)
+    cache.get("https://other.example.com", "https://other.example.com/jwks")
+
+    assert mock_fetch.call_count == 2
+
+
+@pytest.mark.usefixtures("mock_time")
+def test_clear(mock_fetch):
+    cache = KeySetCache()
+    cache.get(AUTHORITY, JWKS_URI)
+
+    cache.clear(AUTHORITY)
+    cache.get(AUTHORITY, JWKS_URI)
+
+    assert mock_fetch.call_count == 2
+
+
+@pytest.mark.usefixtures("mock_time")
+def test_aget(mocker, key_set):
+    mock_afetch = mocker.patch.object(KeySetCache, "_afetch", return_value=key_set)
+    cache = KeySetCache()
+
+    assert async_to_sync(cache.aget)(AUTHORITY, JWKS_URI, kid="kid1") is key_set
+    assert async_to_sync(cache.aget)(AUTHORITY, JWKS_URI, kid="kid1") is key_set
+    mock_afetch.assert_awaited_once_with(JWKS_URI)
@@ -0,0 +1,183 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.cache import cache as shared_cache
+
+from cdt_identity.metadata import MetadataStore, _server_metadata_url
+
+AUTHORITY = "https://example.com"
+
+
+@pytest.fixture(autouse=True)
+def clear_shared_cache():
+    shared_cache.clear()
+    yield
+    shared_cache.clear()
+
+
+@pytest.fixture
+def mock_time(mocker):
+    mock_time = mocker.patch("cdt_identity.metadata.time").time
+    mock_time.return_value = 1000
+    return mock_time
+
+
+@pytest.fixture
+def mock_fetch(mocker):
+    return mocker.patch.object(MetadataStore, "_fetch", return_value={"issuer": AUTHORITY})
+
+
+@pytest.fixture
+def mock_thread(mocker):
+    return mocker.patch("cdt_identity.metadata.threading.Thread")
+
+
+def test_server_metadata_url():
+    assert _server_metadata_url(AUTHORITY) == "https://example.com/.well-known/openid-configuration"
+
+
+def test_fetch(mocker):
+    mock_transport = mocker.patch("cdt_identity.metadata.transport")
+    mock_transport.timeout.return_value = (5, 15)
+    mock_get = mock_transport.session.return_value.get
+    mock_get.return_value.json.return_value = {"issuer": AUTHORITY}
+
+    assert MetadataStore()._fetch(AUTHORITY) == {"issuer": AUTHORITY}
+    mock_get.assert_called_once_with(_server_metadata_url(AUTHORITY), timeout=(5, 15))
+    mock_get.return_value.raise_for_status.assert_called_once()
+
+
+@pytest.mark.usefixtures("mock_time")
+def test_get_cold(mock_fetch):
+    metadata = MetadataStore().get(AUTHORITY)
+
+    assert metadata == {"issuer": AUTHORITY, "_loaded_at": 1000}
+    mock_fetch.assert_called_once_with(AUTHORITY)
+
+
+@pytest.mark.usefixtures("mock_time")
+def test_get_cached_locally(mock_fetch, mocker):
+    store = MetadataStore()
+    store.get(AUTHORITY)
+    spy = mocker.spy(shared_cache, "get")
+
+    store.get(AUTHORITY)
+
+    mock_fetch.assert_called_once()
+    spy.assert_not_called()
+
+
+@pytest.mark.usefixtures("mock_time")
+def test_get_shared_between_processes(mock_fetch):
+    MetadataStore().get(AUTHORITY)
+
+    metadata = MetadataStore().get(AUTHORITY)
+
+    assert metadata["issuer"] == AUTHORITY
+    mock_fetch.assert_called_once()
+
+
+def test_get_stale_refreshes_in_background(mock_time, mock_fetch, mock_thread):
+    store = MetadataStore()
+    store.get(AUTHORITY)
+    mock_time.return_value = 1000 + 3600
+
+    metadata = store.get(AUTHORITY)
+    store.get(AUTHORITY)
+
+    assert metadata["_loaded_at"] == 1000
+    mock_fetch.assert_called_once()
+    # only one refresh runs at a time
+    mock_thread.assert_called_once_with(target=store._refresh, args=(AUTHORITY,), daemon=True)
+    mock_thread.return_value.start.assert_called_once()
+
+
+def test_get_ttl_by_authority(settings, mock_time, mock_fetch, mock_thread):
+    settings.CDT_IDENTITY_METADATA_CACHE_TTL_BY_AUTHORITY = {AUTHORITY: 60}
+    store = MetadataStore()
+    store.get(AUTHORITY)
+    mock_time.return_value = 1000 + 60
+
+    store.get(AUTHORITY)
+
+    mock_thread.assert_called_once()
+
+
+def test_get_expired_fetches(mock_time, mock_fetch, mock_thread):
+    store = MetadataStore()
+    store.get(AUTHORITY)
+    mock_time.return_value = 1000 + 3600 + 86400
+
+    metadata = store.get(AUTHORITY)
+
+    assert metadata["_loaded_at"] == 1000 + 3600 + 86400
+    assert mock_fetch.call_count == 2
+    mock_thread.assert_not_called()
+
+
+def test_refresh(mock_time, mock_fetch):
+    store = MetadataStore()
+    store.get(AUTHORITY)
+    mock_time.return_value = 2000
+    mock_fetch.return_value = {"issuer": "updated"}
+
+    store._refresh(AUTHORITY)
+
+    assert store.get(AUTHORITY) == {"issuer": "updated", "_loaded_at": 2000}
+
+
+@pytest.mark.usefixtures("mock_thread")
+def test_refresh_error_keeps_stale(mock_time, mock_fetch):
+    store = MetadataStore()
+    store.get(AUTHORITY)
+    mock_time.return_value = 1000 + 3600
+    mock_fetch.side_effect = Exception("fetch failed")
+
+    store._refresh(AUTHORITY)
+
+    assert store.get(AUTHORITY)["_loaded_at"] == 1000
+
+
+@pytest.mark.usefixtures("mock_time")
+def test_clear(mock_fetch):
+    store = MetadataStore()
+    store.get(AUTHORITY)
+
+    store.clear()
+    store.get(AUTHORITY)
+
+    assert mock_fetch.call_count == 2
+
+
+@pytest.mark.usefixtures("mock_time")
+def test_aget_cold(mocker):
+    mock_afetch = mocker.patch.object(MetadataStore, "_afetch", return_value={"issuer": AUTHORITY})
+    store = MetadataStore()
+
+    metadata = async_to_sync(store.aget)(AUTHORITY)
+    async_to_sync(store.aget)(AUTHORITY)
+
+    assert metadata == {"issuer": AUTHORITY, "_loaded_at": 1000}
+    mock_afetch.assert_awaited_once_with(AUTHORITY)
+
+
+@pytest.mark.usefixtures("mock_time")
+def test_aget_shared_between_processes(mocker, mock_fetch):
+    mock_afetch = mocker.patch.object(MetadataStore, "_afetch")
+    MetadataStore().get(AUTHORITY)
+
+    metadata = async_to_sync(MetadataStore().aget)(AUTHORITY)
+
+    assert metadata["issuer"] == AUTHORITY
+    mock_afetch.assert_not_called()
+
+
+def test_aget_stale_refreshes_in_background(mocker, mock_time, mock_fetch):
+    store = MetadataStore()
+    store.get(AUTHORITY)
+    mock_time.return_value = 1000 + 3600
+    mock_refresh = mocker.patch.object(store, "_refresh_in_background")
+
+    metadata = async_to_sync(store.aget)(AUTHORITY)
+
+    assert metadata["_loaded_at"] == 1000
+    mock_refresh.assert_called_once_with(AUTHORITY)
@@ -0,0 +1,191 @@
+from urllib.parse import urlsplit
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.urls import reverse
+
+from cdt_identity import metrics
+from cdt_identity.metrics import BUCKETS, HistogramSink, Sink, phase, prometheus, render, set_client_name, sink, timed
+from cdt_identity.routes import Routes
+
+
+@pytest.fixture
+def metrics_enabled(settings):
+    settings.CDT_IDENTITY_METRICS_ENABLED = True
+    sink().reset()
+    yield sink()
+    sink().reset()
+
+
+class ListSink(Sink):
+    def __init__(self):
+        self.records = []
+
+    def record(self, view, phase, client_name, seconds):
+        self.records.append((view, phase, client_name))
+
+
+def test_sink_abstract():
+    with pytest.raises(TypeError):
+        Sink()
+
+    assert ListSink().snapshot() == {}
+
+
+def test_histogram_sink():
+    histogram = HistogramSink(buckets=(0.1, 1.0))
+
+    histogram.record("login", "client", "name", 0.05)
+    histogram.record("login", "client", "name", 0.1)
+    histogram.record("login", "client", "name", 0.5)
+    histogram.record("login", "client", "name", 5)
+
+    snapshot = histogram.snapshot()[("login", "client", "name")]
+    assert snapshot["buckets"] == [2, 1, 1]
+    assert snapshot["count"] == 4
+    assert snapshot["sum"] == pytest.approx(5.65)
+
+
+def test_histogram_sink_reset():
+    histogram = HistogramSink()
+    histogram.record("login", "client", "name", 0.05)
+
+    histogram.reset()
+
+    assert histogram.snapshot() == {}
+
+
+def test_render():
+    histogram = HistogramSink(buckets=(0.1, 1.0))
+    histogram.record("login", "client", 'a "name"', 0.5)
+
+    text = render(histogram.snapshot(), histogram.buckets)
+
+    assert "# TYPE cdt_identity_phase_seconds histogram" in text
+    labels = 'view="login",phase="client",client_name="a \\"name\\""'
+    assert f'cdt_identity_phase_seconds_bucket{{{labels},le="0.1"}} 0\n' in text
+    assert f'cdt_identity_phase_seconds_bucket{{{labels},le="1.0"}} 1\n' in text
+    assert f'cdt_identity_phase_seconds_bucket{{{labels},le="+Inf"}} 1\n' in text
+    assert f"cdt_identity_phase_seconds_sum{{{labels}}} 0.5\n" in text
+    assert f"cdt_identity_phase_seconds_count{{{labels}}} 1\n" in text
+
+
+def test_prometheus(rf, metrics_enabled):
+    metrics_enabled.record("logout", "total", "name", 0.2)
+
+    response = prometheus(rf.get("/metrics"))
+
+    assert response.status_code == 200
+    assert response["Content-Type"].startswith("text/plain; version=0.0.4")
+    assert 'cdt_identity_phase_seconds_count{view="logout",phase="total",client_name="name"} 1' in response.content.decode()
+
+
+def test_sink_custom(settings):
+    settings.CDT_IDENTITY_METRICS_SINK = "tests.test_metrics.ListSink"
+
+    assert isinstance(sink(), ListSink)
+    assert sink() is sink()
+
+
+def test_phase_outside_view():
+    with phase("client"):
+        set_client_name("name")
+
+    assert sink().snapshot() == {}
+
+
+@pytest.mark.django_db
+def test_timed_disabled(mocker, mock_request):
+    record = mocker.spy(sink(), "record")
+
+    @timed("login")
+    def view(request):
+        with phase("client"):
+            return "response"
+
+    assert view(mock_request) == "response"
+    record.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_timed(mock_request, metrics_enabled):
+    @timed("login")
+    def view(request):
+        with phase("client"):
+            set_client_name("name")
+        return "response"
+
+    assert view(mock_request) == "response"
+
+    assert set(metrics_enabled.snapshot()) == {("login", "client", "name"), ("login", "total", "name")}
+
+
+@pytest.mark.django_db
+def test_timed_exception(mock_request, metrics_enabled):
+    @timed("login")
+    def view(request):
+        raise ValueError()
+
+    with pytest.raises(ValueError):
+        view(mock_request)
+
+    assert set(metrics_enabled.snapshot()) == {("login", "total", "")}
+    assert metrics._flow.get() is None
+
+
+@pytest.mark.django_db
+def test_timed_session_save(mock_request, metrics_enabled):
+    @timed("authorize")
+    def view(request):
+        set_client_name("name")
+        request.session["key"] = "value"
+
+    view(mock_request)
+    mock_request.session.save()
+
+    assert ("authorize", "session_save", "name") in metrics_enabled.snapshot()
+
+
+@pytest.mark.django_db
+def test_timed_async(mock_request, metrics_enabled):
+    @timed("logout")
+    async def view(request):
+        with phase("client"):
+            set_client_name("name")
+        return "response"
+
+    assert async_to_sync(view)(mock_request) == "response"
+
+    assert set(metrics_enabled.snapshot()) == {("logout", "client", "name"), ("logout", "total", "name")}
+
+
+def test_buckets():
+    assert list(BUCKETS) == sorted(BUCKETS)
+
+
+@pytest.mark.django_db
+def test_views(client, http, stub_transport, stub_session, metrics_enabled):
+    response = client.get(reverse(Routes.route_login))
+    response = http.get(response["Location"], allow_redirects=False)
+    callback = urlsplit(response.headers["Location"])
+    client.get(f"{callback.path}?{callback.query}")
+    client.get(reverse(Routes.route_logout))
+
+    phases = {(view, phase) for view, phase, client_name in metrics_enabled.snapshot() if client_name == "stub"}
+    assert phases == {
+        ("login", "client"),
+        ("login", "metadata"),
+        ("login", "session_save"),
+        ("login", "total"),
+        ("authorize", "client"),
+        ("authorize", "metadata"),
+        ("authorize", "token"),
+        ("authorize", "id_token"),
+        ("authorize", "claims"),
+        ("authorize", "session_save"),
+        ("authorize", "total"),
+        ("logout", "client"),
+        ("logout", "metadata"),
+        ("logout", "session_save"),
+        ("logout", "total"),
+    }
@@ -61,3 +61,24 @@ def test_scheme_max_length(config_data):
     with pytest.raises(ValidationError):
         client = ClientConfig(**config_data)
         client.full_clean()
+
+
+@pytest.mark.parametrize("field,value", [("login_rate_limit", 0), ("login_rate_limit", -1), ("login_burst", 0)])
+def test_login_rate_limit_positive(config_data, field, value):
+    config_data[field] = value
+    with pytest.raises(ValidationError, match=field):
+        ClientConfig(**config_data).full_clean(validate_unique=False)
+
+
+def test_login_rate_limit_blank(config_data):
+    ClientConfig(**config_data, login_rate_limit=None, login_burst=None).full_clean(validate_unique=False)
+    ClientConfig(**config_data, login_rate_limit=0.5, login_burst=1).full_clean(validate_unique=False)
+
+
+def test_authorities(config_data):
+    config = ClientConfig(**config_data, fallback_authorities="https://auth2.example.com\n\n https://auth3.example.com \n")
+    assert config.authorities == ["https://auth.example.com", "https://auth2.example.com", "https://auth3.example.com"]
+
+
+def test_authorities_no_fallbacks(config_data):
+    assert ClientConfig(**config_data).authorities == ["https://auth.example.com"]
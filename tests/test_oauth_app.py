@@ -0,0 +1,96 @@
+import time
+
+import pytest
+from joserfc import jwt
+from joserfc.jwk import KeySet, RSAKey
+
+from cdt_identity.oauth_app import OAuth2App
+
+
+def test_oauth2_app_load_server_metadata(mocker):
+    mock_store = mocker.patch("cdt_identity.oauth_app.metadata_store")
+    mock_store.get.return_value = {"issuer": "https://example.com", "_loaded_at": 1}
+    client = OAuth2App(mocker.Mock(), "client_name_1", authority="https://example.com", client_id="client_id_1")
+
+    metadata = client.load_server_metadata()
+
+    mock_store.get.assert_called_once_with("https://example.com")
+    assert metadata["issuer"] == "https://example.com"
+    assert client.server_metadata["issuer"] == "https://example.com"
+
+
+def test_oauth2_app_load_server_metadata_no_authority(mocker):
+    mock_store = mocker.patch("cdt_identity.oauth_app.metadata_store")
+    client = OAuth2App(mocker.Mock(), "client_name_1", client_id="client_id_1", issuer="https://example.com")
+
+    metadata = client.load_server_metadata()
+
+    mock_store.get.assert_not_called()
+    assert metadata["issuer"] == "https://example.com"
+
+
+@pytest.fixture(scope="module")
+def signing_key():
+    return RSAKey.generate_key(2048, parameters={"kid": "kid1"})
+
+
+@pytest.fixture
+def oauth2_app(mocker, signing_key):
+    mock_store = mocker.patch("cdt_identity.oauth_app.metadata_store")
+    mock_store.get.return_value = {
+        "issuer": "https://example.com",
+        "jwks_uri": "https://example.com/jwks",
+        "id_token_signing_alg_values_supported": ["RS256"],
+    }
+    return OAuth2App(mocker.Mock(), "client_name_1", authority="https://example.com", client_id="client_id_1")
+
+
+def _id_token(signing_key, **claims):
+    now = int(time.time())
+    payload = {"iss": "https://example.com", "aud": "client_id_1", "sub": "sub1", "iat": now, "exp": now + 60}
+    payload.update(claims)
+    return jwt.encode({"alg": "RS256", "kid": "kid1"}, payload, signing_key)
+
+
+def test_oauth2_app_parse_id_token(mocker, oauth2_app, signing_key):
+    mock_key_sets = mocker.patch("cdt_identity.oauth_app.key_sets")
+    mock_key_sets.get.return_value = KeySet([signing_key])
+    token = {"id_token": _id_token(signing_key, nonce="nonce1")}
+
+    userinfo = oauth2_app.parse_id_token(token, nonce="nonce1")
+
+    assert userinfo["sub"] == "sub1"
+    mock_key_sets.get.assert_called_once_with("https://example.com", "https://example.com/jwks", kid="kid1")
+
+
+def test_oauth2_app_parse_id_token_invalid_nonce(mocker, oauth2_app, signing_key):
+    mocker.patch("cdt_identity.oauth_app.key_sets").get.return_value = KeySet([signing_key])
+    token = {"id_token": _id_token(signing_key, nonce="nonce1")}
+
+    with pytest.raises(Exception):
+        oauth2_app.parse_id_token(token, nonce="nonce2")
+
+
+def test_oauth2_app_parse_id_token_no_jwks_uri(mocker, oauth2_app):
+    mocker.patch("cdt_identity.oauth_app.metadata_store").get.return_value = {"issuer": "https://example.com"}
+
+    with pytest.raises(RuntimeError, match="jwks_uri"):
+        oauth2_app.parse_id_token({"id_token": "token"}, nonce="nonce1")
+
+
+def test_oauth2_app_parse_id_token_no_id_token(oauth2_app):
+    assert oauth2_app.parse_id_token({}, nonce="nonce1") is None
+
+
+def test_oauth2_app_sessions_use_transport(mocker):
+    mock_transport = mocker.patch("cdt_identity.oauth_app.transport")
+    mock_transport.mount.side_effect = lambda session: session
+    mock_transport.timeout.return_value = (5, 15)
+    client = OAuth2App(mocker.Mock(), "client_name_1", authority="https://example.com", client_id="client_id_1")
+
+    session = client._get_session()
+    oauth_client = client._get_oauth_client()
+
+    assert mock_transport.mount.call_count == 2
+    assert session.default_timeout == (5, 15)
+    assert oauth_client.default_timeout == (5, 15)
@@ -0,0 +1,114 @@
+import threading
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+
+from cdt_identity import ratelimit
+from cdt_identity.models import ClientConfig
+from cdt_identity.ratelimit import _window, aadmit, admit
+
+
+@pytest.fixture
+def config():
+    return ClientConfig(client_name="limited", client_id="id", authority="https://example.com", scheme="scheme")
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def mock_time(mocker):
+    mock_time = mocker.patch("cdt_identity.ratelimit.time")
+    mock_time.time.return_value = 1000.0
+    return mock_time
+
+
+def test_window():
+    assert _window(10.0, rate=2, burst=3) == (6, 0.5)
+    assert _window(10.5, rate=2, burst=3) == (7, 1.5)
+
+
+def test_take_concurrent(mock_time):
+    results = []
+    barrier = threading.Barrier(20)
+
+    def take():
+        # e.g. a process of its own, sharing only the cache
+        limiter = ratelimit.LoginCounters()
+        barrier.wait()
+        results.append(limiter.take("limited", 1, 5))
+
+    threads = [threading.Thread(target=take) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results.count(0) == 5
+
+
+def test_admit_no_limit(config):
+    assert admit(config) == 0
+
+
+def test_admit_setting(settings, mock_time, config):
+    settings.CDT_IDENTITY_LOGIN_RATE_LIMIT = 1
+    settings.CDT_IDENTITY_LOGIN_BURST = 2
+
+    assert admit(config) == 0
+    assert admit(config) == 0
+    assert admit(config) == 2
+
+    mock_time.time.return_value += 1
+    assert admit(config) == 1
+    mock_time.time.return_value += 1
+    assert admit(config) == 0
+
+
+def test_admit_per_client(settings, mock_time, config):
+    settings.CDT_IDENTITY_LOGIN_RATE_LIMIT = 100
+    config.login_rate_limit = 0.5
+    config.login_burst = 1
+
+    assert admit(config) == 0
+    assert admit(config) == 2
+
+
+def test_admit_per_client_unlimited(settings, config):
+    settings.CDT_IDENTITY_LOGIN_RATE_LIMIT = 1
+    settings.CDT_IDENTITY_LOGIN_BURST = 1
+    config.login_rate_limit = 0
+
+    assert admit(config) == 0
+    assert admit(config) == 0
+
+
+def test_admit_per_client_negative(settings, config):
+    settings.CDT_IDENTITY_LOGIN_RATE_LIMIT = 1
+    config.login_rate_limit = -1
+
+    assert admit(config) == 0
+    assert admit(config) == 0
+
+
+def test_admit_shared_through_cache(settings, mock_time, config):
+    settings.CDT_IDENTITY_LOGIN_RATE_LIMIT = 1
+    settings.CDT_IDENTITY_LOGIN_BURST = 1
+
+    assert admit(config) == 0
+    # e.g. another process
+    assert ratelimit.LoginCounters().take(config.client_name, 1, 1) == 1
+
+
+def test_aadmit(settings, mock_time, config):
+    settings.CDT_IDENTITY_LOGIN_RATE_LIMIT = 1
+    settings.CDT_IDENTITY_LOGIN_BURST = 1
+
+    assert async_to_sync(aadmit)(config) == 0
+    assert async_to_sync(aadmit)(config) == 1
+    assert admit(config) == 1
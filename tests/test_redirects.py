@@ -1,6 +1,17 @@
 import pytest
+from asgiref.sync import async_to_sync
+from django.core.exceptions import DisallowedHost
+from django.urls import reverse, set_script_prefix
 
-from cdt_identity.redirects import deauthorize_redirect, generate_redirect_uri
+from cdt_identity import redirects
+from cdt_identity.redirects import (
+    adeauthorize_redirect,
+    deauthorize_redirect,
+    end_session_url,
+    generate_redirect_uri,
+    redirect_uri,
+)
+from cdt_identity.routes import Routes
 
 
 @pytest.mark.django_db
@@ -42,3 +53,116 @@ def test_generate_redirect_uri_localhost(rf, settings):
     redirect_uri = generate_redirect_uri(request, path)
 
     assert redirect_uri == "http://localhost/test"
+
+
+@pytest.mark.django_db
+def test_adeauthorize_redirect(mocker, mock_request):
+    mock_client = mocker.Mock()
+    mock_client.load_server_metadata = mocker.AsyncMock(return_value={"end_session_endpoint": "https://server/endsession"})
+
+    result = async_to_sync(adeauthorize_redirect)(mock_request, mock_client, "token", "https://localhost/redirect_uri")
+
+    mock_client.load_server_metadata.assert_awaited_once()
+    assert result.status_code == 302
+    assert (
+        result.url
+        == "https://server/endsession?id_token_hint=token&post_logout_redirect_uri=https%3A%2F%2Flocalhost%2Fredirect_uri"
+    )
+
+
+@pytest.fixture(autouse=True)
+def clear_redirects():
+    redirects.clear()
+    yield
+    redirects.clear()
+
+
+@pytest.fixture
+def hosts(settings):
+    settings.ALLOWED_HOSTS = ["one.example.com", "two.example.com", "localhost"]
+
+
+@pytest.mark.usefixtures("hosts")
+def test_redirect_uri_per_host(rf):
+    one = rf.get("/", HTTP_HOST="one.example.com")
+    two = rf.get("/", HTTP_HOST="two.example.com")
+    local = rf.get("/", HTTP_HOST="localhost")
+
+    assert redirect_uri(one, Routes.route_authorize) == f"https://one.example.com{reverse(Routes.route_authorize)}"
+    assert redirect_uri(two, Routes.route_authorize) == f"https://two.example.com{reverse(Routes.route_authorize)}"
+    assert redirect_uri(local, Routes.route_authorize) == f"http://localhost{reverse(Routes.route_authorize)}"
+    assert redirect_uri(one, Routes.route_post_logout) == f"https://one.example.com{reverse(Routes.route_post_logout)}"
+
+
+@pytest.mark.usefixtures("hosts")
+def test_redirect_uri_per_scheme(rf):
+    http = rf.get("/", HTTP_HOST="localhost")
+    https = rf.get("/", HTTP_HOST="localhost", secure=True)
+
+    assert redirect_uri(http, Routes.route_authorize).startswith("http://localhost/")
+    assert redirect_uri(https, Routes.route_authorize).startswith("https://localhost/")
+
+
+@pytest.mark.usefixtures("hosts")
+def test_redirect_uri_cached(mocker, rf):
+    spy = mocker.spy(redirects, "generate_redirect_uri")
+
+    for _ in range(3):
+        redirect_uri(rf.get("/a", HTTP_HOST="one.example.com"), Routes.route_authorize)
+        redirect_uri(rf.get("/b", HTTP_HOST="two.example.com"), Routes.route_authorize)
+
+    assert spy.call_count == 2
+
+
+@pytest.mark.usefixtures("hosts")
+def test_redirect_uri_script_prefix(rf):
+    default = redirect_uri(rf.get("/", HTTP_HOST="one.example.com"), Routes.route_authorize)
+
+    # as set up by Django's handlers for an app served under /prefix
+    set_script_prefix("/prefix/")
+    try:
+        prefixed = redirect_uri(rf.get("/", HTTP_HOST="one.example.com", SCRIPT_NAME="/prefix"), Routes.route_authorize)
+    finally:
+        set_script_prefix("/")
+
+    assert prefixed == default.replace("https://one.example.com/", "https://one.example.com/prefix/")
+
+
+def test_redirect_uri_disallowed_host(rf):
+    with pytest.raises(DisallowedHost):
+        redirect_uri(rf.get("/", HTTP_HOST="evil.example.com"), Routes.route_authorize)
+
+
+@pytest.mark.usefixtures("hosts")
+def test_redirect_uri_bounded(mocker, rf):
+    mocker.patch.object(redirects, "MAX_CACHED", 1)
+
+    redirect_uri(rf.get("/", HTTP_HOST="one.example.com"), Routes.route_authorize)
+    redirect_uri(rf.get("/", HTTP_HOST="two.example.com"), Routes.route_authorize)
+
+    assert len(redirects._redirect_uris) == 1
+
+
+def test_end_session_url():
+    url = end_session_url("https://server/endsession", "a.b+c", "https://one.example.com/logout")
+
+    assert (
+        url
+        == "https://server/endsession?id_token_hint=a.b%2Bc&post_logout_redirect_uri=https%3A%2F%2Fone.example.com%2Flogout"
+    )
+
+
+def test_end_session_url_metadata_changes():
+    first = end_session_url("https://server/endsession", "token", "https://one.example.com/logout")
+    second = end_session_url("https://server/v2/endsession", "token", "https://one.example.com/logout")
+
+    assert first.startswith("https://server/endsession?")
+    assert second.startswith("https://server/v2/endsession?")
+
+
+def test_redirect_uri_disallowed_host_after_allowed(rf, settings):
+    settings.ALLOWED_HOSTS = ["one.example.com"]
+    redirect_uri(rf.get("/", HTTP_HOST="one.example.com"), Routes.route_authorize)
+
+    with pytest.raises(DisallowedHost):
+        redirect_uri(rf.get("/", HTTP_HOST="one.example.com.evil.example.com"), Routes.route_authorize)
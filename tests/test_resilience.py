@@ -0,0 +1,220 @@
+import time
+
+import httpx
+import pytest
+import requests
+from asgiref.sync import async_to_sync
+from authlib.integrations.base_client import OAuthError
+from django.core.cache import cache
+
+from cdt_identity import resilience
+from cdt_identity.resilience import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitOpen,
+    DeadlineExceeded,
+    GatewayUnavailable,
+    aguard,
+    breaker,
+    deadline,
+    guard,
+)
+from cdt_identity.transport import transport
+
+AUTHORITY = "https://example.com"
+
+
+@pytest.fixture(autouse=True)
+def breaker_settings(settings):
+    settings.CDT_IDENTITY_BREAKER_FAILURE_THRESHOLD = 2
+    breaker.clear(AUTHORITY)
+    yield
+    breaker.clear(AUTHORITY)
+
+
+def trip(circuit_breaker=breaker):
+    circuit_breaker.failure(AUTHORITY)
+    circuit_breaker.failure(AUTHORITY)
+
+
+def test_closed():
+    assert breaker.state(AUTHORITY) == CLOSED
+    assert breaker.allow(AUTHORITY) is True
+
+
+def test_opens_after_threshold():
+    breaker.failure(AUTHORITY)
+    assert breaker.state(AUTHORITY) == CLOSED
+
+    breaker.failure(AUTHORITY)
+    assert breaker.state(AUTHORITY) == OPEN
+    assert breaker.allow(AUTHORITY) is False
+
+
+def test_open_shared_between_processes():
+    trip(CircuitBreaker())
+
+    assert breaker.allow(AUTHORITY) is False
+
+
+def test_open_known_locally(mocker):
+    trip()
+    get_many = mocker.spy(cache, "get_many")
+
+    assert breaker.allow(AUTHORITY) is False
+    get_many.assert_not_called()
+
+
+def test_half_open_trial_success():
+    trip(CircuitBreaker())
+    cache.delete(f"{resilience.KEY_PREFIX}:{AUTHORITY}:open")
+
+    assert breaker.state(AUTHORITY) == HALF_OPEN
+    allowed = breaker.allow(AUTHORITY)
+    assert allowed == HALF_OPEN
+    # a single trial at a time
+    assert breaker.allow(AUTHORITY) is False
+
+    breaker.success(AUTHORITY, allowed)
+    assert breaker.state(AUTHORITY) == CLOSED
+    assert breaker.allow(AUTHORITY) is True
+
+
+def test_half_open_trial_failure():
+    trip(CircuitBreaker())
+    cache.delete(f"{resilience.KEY_PREFIX}:{AUTHORITY}:open")
+
+    breaker.failure(AUTHORITY, breaker.allow(AUTHORITY))
+
+    assert breaker.state(AUTHORITY) == OPEN
+
+
+@pytest.mark.parametrize(
+    "exception, outage",
+    [
+        (requests.ConnectionError(), True),
+        (requests.Timeout(), True),
+        (httpx.ConnectTimeout("timeout"), True),
+        (OAuthError(error="temporarily_unavailable"), True),
+        (OAuthError(error="invalid_grant"), False),
+        (ValueError(), False),
+        (DeadlineExceeded(), False),
+    ],
+)
+def test_is_outage(exception, outage):
+    assert resilience._is_outage(exception) is outage
+
+
+def test_is_outage_status(mocker):
+    assert resilience._is_outage(requests.HTTPError(response=mocker.Mock(status_code=503)))
+    assert not resilience._is_outage(requests.HTTPError(response=mocker.Mock(status_code=404)))
+
+
+def test_guard_counts_outages():
+    for _ in range(2):
+        with pytest.raises(GatewayUnavailable), guard(f"{AUTHORITY}/token"):
+            raise requests.ConnectionError()
+
+    with pytest.raises(CircuitOpen, match=AUTHORITY), guard(f"{AUTHORITY}/.well-known/openid-configuration"):
+        pytest.fail("called while the circuit is open")
+
+
+def test_guard_ignores_rejections():
+    for _ in range(2):
+        with pytest.raises(OAuthError), guard(f"{AUTHORITY}/token"):
+            raise OAuthError(error="invalid_grant")
+
+    assert breaker.state(AUTHORITY) == CLOSED
+
+
+@pytest.mark.parametrize(
+    "exception",
+    [requests.ConnectionError("refused"), requests.ReadTimeout(), OAuthError(error="temporarily_unavailable")],
+)
+def test_guard_raises_unavailable(exception):
+    with pytest.raises(GatewayUnavailable) as raised, guard(f"{AUTHORITY}/token"):
+        raise exception
+
+    assert not isinstance(raised.value, DeadlineExceeded)
+    assert raised.value.__cause__ is exception
+
+
+def test_guard_raises_deadline_exceeded():
+    with deadline(0.001), pytest.raises(DeadlineExceeded) as raised, guard(f"{AUTHORITY}/token"):
+        time.sleep(0.002)
+        raise requests.ReadTimeout()
+
+    assert isinstance(raised.value.__cause__, requests.ReadTimeout)
+
+
+def test_aguard_raises_unavailable():
+    async def call():
+        async with aguard(f"{AUTHORITY}/token"):
+            raise httpx.ConnectError("refused")
+
+    with pytest.raises(GatewayUnavailable) as raised:
+        async_to_sync(call)()
+
+    assert isinstance(raised.value.__cause__, httpx.ConnectError)
+
+
+def test_guard_disabled(settings):
+    settings.CDT_IDENTITY_BREAKER_ENABLED = False
+    trip()
+
+    with guard(f"{AUTHORITY}/token"):
+        pass
+
+
+def test_aguard():
+    trip()
+
+    async def call():
+        async with aguard(f"{AUTHORITY}/token"):
+            pass
+
+    with pytest.raises(CircuitOpen):
+        async_to_sync(call)()
+
+
+def test_deadline():
+    assert resilience.remaining() is None
+
+    with deadline(10):
+        assert 9 < resilience.remaining() <= 10
+        with deadline(20):
+            # a nested deadline never extends the outer one
+            assert resilience.remaining() <= 10
+        assert resilience.timeout(15) <= 10
+        assert resilience.timeout(1) == 1
+
+    assert resilience.remaining() is None
+
+
+def test_deadline_disabled(settings):
+    settings.CDT_IDENTITY_REQUEST_DEADLINE = None
+
+    with deadline():
+        assert resilience.remaining() is None
+
+
+def test_deadline_exceeded():
+    with deadline(0.001):
+        time.sleep(0.002)
+        with pytest.raises(DeadlineExceeded):
+            resilience.check()
+        with pytest.raises(DeadlineExceeded):
+            guard(f"{AUTHORITY}/token").__enter__()
+
+
+def test_transport_timeout_capped(settings):
+    settings.CDT_IDENTITY_HTTP_CONNECT_TIMEOUT = 5
+    settings.CDT_IDENTITY_HTTP_READ_TIMEOUT = 15
+
+    assert transport.timeout() == (5, 15)
+    with deadline(8):
+        connect, read = transport.timeout()
+    assert connect == 5
+    assert 7 < read <= 8
@@ -1,8 +1,18 @@
+from datetime import timedelta
+
 import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.sessions.middleware import SessionMiddleware
 from django.http import HttpRequest
+from django.utils import timezone
+
+from cdt_identity.models import ClientConfig, IdToken
+from cdt_identity.session import KEY, Session
+
 
-from cdt_identity.models import ClientConfig
-from cdt_identity.session import Session
+@pytest.fixture
+def id_token_store(settings):
+    settings.CDT_IDENTITY_ID_TOKEN_STORE = True
 
 
 @pytest.fixture
@@ -12,6 +22,15 @@ def mock_request(mocker):
     return request
 
 
+@pytest.fixture
+def db_request(rf):
+    request = rf.get("/")
+    SessionMiddleware(lambda x: x).process_request(request)
+    request.session.save()
+    request.session.modified = False
+    return request
+
+
 @pytest.fixture
 def mock_config(mocker):
     return mocker.MagicMock(spec=ClientConfig)
@@ -28,6 +47,7 @@ def test_session_init(mock_request):
     assert session.oidc_scopes == "scopes"
 
 
+@pytest.mark.django_db
 def test_session_init_with_reset(mock_request):
     s1 = Session(mock_request, "auth:fail", "auth:success", "scopes", "scheme")
     s1.oidc_expected_claims = "claim1"
@@ -46,11 +66,57 @@ def test_session_init_with_reset(mock_request):
 
 
 def test_session_property_string(mock_request):
+    session = Session(mock_request)
+    session.oidc_scopes = "scopes"
+
+    assert session.oidc_scopes == "scopes"
+    assert mock_request.session[KEY] == {"scopes": "scopes"}
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("id_token_store")
+def test_session_oidc_token_stored(mock_request):
     session = Session(mock_request)
     session.oidc_token = "test_token"
 
+    handle = mock_request.session[KEY]["token_id"]
+    assert mock_request.session[KEY] == {"token_id": handle}
+    assert IdToken.objects.get(handle=handle).token == "test_token"
     assert session.oidc_token == "test_token"
-    assert mock_request.session["oidc_token"] == "test_token"
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("id_token_store")
+def test_session_oidc_token_replaced(mock_request):
+    session = Session(mock_request)
+    session.oidc_token = "token1"
+    session.oidc_token = "token2"
+
+    assert session.oidc_token == "token2"
+    assert IdToken.objects.count() == 1
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("id_token_store")
+def test_session_oidc_token_async(mock_request):
+    session = Session(mock_request)
+    async_to_sync(session.aset_oidc_token)("test_token")
+
+    assert async_to_sync(session.aoidc_token)() == "test_token"
+
+    async_to_sync(session.aclear_oidc_token)()
+
+    assert async_to_sync(session.aoidc_token)() == ""
+    assert not IdToken.objects.exists()
+
+
+def test_session_oidc_token_in_session(mock_request, settings):
+    settings.CDT_IDENTITY_ID_TOKEN_STORE = False
+    session = Session(mock_request)
+    session.oidc_token = "test_token"
+
+    assert session.oidc_token == "test_token"
+    assert mock_request.session[KEY] == {"token": "test_token"}
 
 
 def test_session_config(mocker, mock_config, mock_request):
@@ -58,7 +124,7 @@ def test_session_config(mocker, mock_config, mock_request):
 
     session = Session(mock_request)
     session.oidc_config = mock_config
-    assert mock_request.session["oidc_config"] == "123"
+    assert mock_request.session[KEY] == {"config": "123"}
 
     mock_filter = mocker.patch.object(ClientConfig.objects, "filter")
     mock_filter.return_value.first.return_value = mock_config
@@ -66,7 +132,22 @@ def test_session_config(mocker, mock_config, mock_request):
     assert session.oidc_config == mock_config
     mock_filter.assert_called_once_with(id="123")
 
+    # subsequent reads come from the cache
+    assert session.oidc_config == mock_config
+    mock_filter.assert_called_once()
+
+
+def test_session_config_none(mocker, mock_request):
+    mock_filter = mocker.patch.object(ClientConfig.objects, "filter")
+
+    session = Session(mock_request)
+
+    assert session.oidc_config is None
+    mock_filter.assert_not_called()
 
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("id_token_store")
 def test_clear_oidc_token(mock_request):
     session = Session(mock_request)
     session.oidc_token = "test_token"
@@ -74,6 +155,8 @@ def test_clear_oidc_token(mock_request):
 
     session.clear_oidc_token()
 
+    assert not IdToken.objects.exists()
+
     assert session.oidc_token == ""
     assert not session.has_oidc_token()
 
@@ -81,9 +164,96 @@ def test_clear_oidc_token(mock_request):
     assert not session.has_oidc_verified_claims()
 
 
-def test_has_oidc_token(mock_request):
+@pytest.mark.django_db
+@pytest.mark.usefixtures("id_token_store")
+def test_has_oidc_token(mocker, mock_request):
     session = Session(mock_request)
     assert not session.has_oidc_token()
 
     session.oidc_token = "test_token"
+    mock_get = mocker.patch("cdt_identity.session.id_tokens.get")
     assert session.has_oidc_token()
+    mock_get.assert_not_called()
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("id_token_store")
+def test_has_oidc_token_expired(mock_request):
+    session = Session(mock_request)
+    session.oidc_token = "test_token"
+
+    # e.g. a session kept alive by each request, outliving its stored id_token
+    IdToken.objects.update(expires=timezone.now() - timedelta(seconds=1))
+
+    assert not session.has_oidc_token()
+    assert session.oidc_token == ""
+
+
+@pytest.mark.django_db
+def test_session_aoidc_config(db_request):
+    config = ClientConfig.objects.create(client_name="client", client_id="id", authority="https://example.com")
+    db_request.session[KEY] = {"config": config.id}
+    db_request.session.save()
+
+    session = Session(db_request)
+
+    assert async_to_sync(session.aoidc_config)() == config
+
+
+@pytest.mark.django_db
+def test_session_reset_unchanged_not_modified(db_request):
+    Session(db_request, reset=True)
+
+    assert not db_request.session.modified
+    assert KEY not in db_request.session
+
+
+@pytest.mark.django_db
+def test_session_set_unchanged_not_modified(db_request):
+    Session(db_request, scopes="scopes", scheme="scheme")
+    db_request.session.save()
+    db_request.session.modified = False
+
+    session = Session(db_request, scopes="scopes", scheme="scheme")
+    session.oidc_token = ""
+
+    assert not db_request.session.modified
+
+
+@pytest.mark.django_db
+def test_session_set_changed_modified(db_request):
+    session = Session(db_request)
+
+    session.oidc_scopes = "scopes"
+
+    assert db_request.session.modified
+    assert db_request.session[KEY] == {"scopes": "scopes"}
+
+
+def test_session_wrappers_share_payload(mock_request):
+    s1 = Session(mock_request)
+    s2 = Session(mock_request)
+
+    s1.oidc_scopes = "scopes"
+    s2.oidc_scheme = "scheme"
+
+    assert s1.oidc_scheme == s2.oidc_scheme == "scheme"
+    assert mock_request.session[KEY] == {"scopes": "scopes", "scheme": "scheme"}
+
+
+def test_session_migrates_legacy_keys(mock_request):
+    mock_request.session.update({"oidc_token": "test_token", "oidc_scopes": "scopes", "oidc_config": "123"})
+
+    session = Session(mock_request)
+
+    assert session.oidc_token == "test_token"
+    assert session.oidc_scopes == "scopes"
+    assert mock_request.session == {"session_id": 123, KEY: {"token": "test_token", "scopes": "scopes", "config": "123"}}
+
+
+def test_session_default_verified_claims_not_shared(mock_request):
+    session = Session(mock_request)
+
+    session.oidc_verified_claims["claim"] = True
+
+    assert session.oidc_verified_claims == {}
@@ -0,0 +1,270 @@
+import base64
+import hashlib
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+import requests
+from django.core.cache import cache
+from django.urls import reverse
+from joserfc import jwt
+from joserfc.jwk import KeySet
+
+from cdt_identity.metadata import metadata_store
+from cdt_identity.resilience import breaker
+from cdt_identity.routes import Routes
+from cdt_identity.stub import StubGateway
+
+
+def authorize(gateway, http, **params):
+    params = {"client_id": "client", "redirect_uri": "https://app/callback", "state": "state", **params}
+    response = http.get(f"{gateway.authority}/authorize", params=params, allow_redirects=False)
+    return parse_qs(urlsplit(response.headers["Location"]).query)["code"][0]
+
+
+def exchange(gateway, http, code, **data):
+    data = {
+        "grant_type": "authorization_code",
+        "code": code,
+        "client_id": "client",
+        "redirect_uri": "https://app/callback",
+        **data,
+    }
+    return http.post(f"{gateway.authority}/token", data=data)
+
+
+def test_discovery(gateway, http):
+    response = http.get(f"{gateway.authority}/.well-known/openid-configuration")
+
+    assert response.status_code == 200
+    assert response.json()["issuer"] == gateway.authority
+    assert response.json()["jwks_uri"] == f"{gateway.authority}/jwks"
+
+
+def test_jwks(gateway, http):
+    response = http.get(f"{gateway.authority}/jwks")
+
+    key_set = KeySet.import_key_set(response.json())
+    assert key_set.get_by_kid(gateway.key.kid)
+    assert "d" not in response.json()["keys"][0]
+
+
+def test_not_found(gateway, http):
+    assert http.get(f"{gateway.authority}/missing").status_code == 404
+
+
+def test_authorize(gateway, http):
+    response = http.get(
+        f"{gateway.authority}/authorize",
+        params={"client_id": "client", "redirect_uri": "https://app/callback", "state": "state"},
+        allow_redirects=False,
+    )
+
+    assert response.status_code == 302
+    location = urlsplit(response.headers["Location"])
+    assert location.netloc == "app"
+    assert location.path == "/callback"
+    assert parse_qs(location.query)["state"] == ["state"]
+
+
+def test_authorize_invalid(gateway, http):
+    response = http.get(f"{gateway.authority}/authorize", params={"client_id": "client"}, allow_redirects=False)
+
+    assert response.status_code == 400
+
+
+def test_token(gateway, http):
+    code = authorize(gateway, http, nonce="nonce")
+
+    response = exchange(gateway, http, code)
+
+    assert response.status_code == 200
+    id_token = jwt.decode(response.json()["id_token"], KeySet([gateway.key]))
+    assert id_token.claims["iss"] == gateway.authority
+    assert id_token.claims["aud"] == "client"
+    assert id_token.claims["nonce"] == "nonce"
+    assert id_token.claims["claim1"] == "1"
+
+
+def test_token_code_used_once(gateway, http):
+    code = authorize(gateway, http)
+    exchange(gateway, http, code)
+
+    response = exchange(gateway, http, code)
+
+    assert response.status_code == 400
+    assert response.json()["error"] == "invalid_grant"
+
+
+def test_token_basic_auth(gateway, http):
+    code = authorize(gateway, http)
+
+    response = http.post(
+        f"{gateway.authority}/token",
+        data={"grant_type": "authorization_code", "code": code, "redirect_uri": "https://app/callback"},
+        auth=("client", ""),
+    )
+
+    assert response.status_code == 200
+
+
+def test_token_pkce(gateway, http):
+    verifier = "verifier" * 6
+    challenge = base64.urlsafe_b64encode(hashlib.sha256(verifier.encode()).digest()).rstrip(b"=").decode()
+
+    code = authorize(gateway, http, code_challenge=challenge, code_challenge_method="S256")
+    assert exchange(gateway, http, code, code_verifier="wrong").status_code == 400
+
+    code = authorize(gateway, http, code_challenge=challenge, code_challenge_method="S256")
+    assert exchange(gateway, http, code, code_verifier=verifier).status_code == 200
+
+
+def test_token_error(gateway, http):
+    gateway.token_error = "access_denied"
+
+    response = exchange(gateway, http, authorize(gateway, http))
+
+    assert response.status_code == 400
+    assert response.json() == {"error": "access_denied"}
+
+
+def test_userinfo(gateway, http):
+    access_token = exchange(gateway, http, authorize(gateway, http)).json()["access_token"]
+
+    response = http.get(f"{gateway.authority}/userinfo", headers={"Authorization": f"Bearer {access_token}"})
+
+    assert response.json() == {"sub": "stub-user", "claim1": "1"}
+
+
+def test_userinfo_invalid(gateway, http):
+    response = http.get(f"{gateway.authority}/userinfo", headers={"Authorization": "Bearer invalid"})
+
+    assert response.status_code == 401
+
+
+def test_end_session(gateway, http):
+    response = http.get(
+        f"{gateway.authority}/logout", params={"post_logout_redirect_uri": "https://app/done"}, allow_redirects=False
+    )
+
+    assert response.status_code == 302
+    assert response.headers["Location"] == "https://app/done"
+
+
+def test_latency(mocker, gateway, http):
+    time = mocker.patch("cdt_identity.stub.time")
+    gateway.latency = 0.5
+    gateway.jitter = 0.1
+
+    http.get(f"{gateway.authority}/jwks")
+
+    delay = time.sleep.call_args.args[0]
+    assert 0.5 <= delay <= 0.6
+
+
+def test_failure_rate(gateway, http):
+    gateway.failure_rate = 1
+
+    response = http.get(f"{gateway.authority}/jwks")
+
+    assert response.status_code == 503
+    assert response.json() == {"error": "temporarily_unavailable"}
+
+
+def test_failure_rate_seeded():
+    statuses = []
+    for _ in range(2):
+        gateway = StubGateway(failure_rate=0.5, seed=1)
+        http = requests.Session()
+        http.mount(gateway.authority, gateway.adapter())
+        statuses.append([http.get(f"{gateway.authority}/jwks").status_code for _ in range(10)])
+
+    assert statuses[0] == statuses[1]
+    assert set(statuses[0]) == {200, 503}
+
+
+def test_serve(socket_enabled, gateway):
+    server = gateway.serve()
+    try:
+        assert gateway.authority == f"http://127.0.0.1:{server.server_port}"
+        response = requests.get(f"{gateway.authority}/.well-known/openid-configuration", timeout=5)
+        assert response.json()["issuer"] == gateway.authority
+    finally:
+        server.stop()
+
+
+@pytest.mark.django_db
+def test_views_end_to_end(settings, client, gateway, http, stub_transport, stub_session):
+    settings.CDT_IDENTITY_ID_TOKEN_STORE = True
+    response = client.get(reverse(Routes.route_login))
+    assert response["Location"].startswith(f"{gateway.authority}/authorize?")
+
+    response = http.get(response["Location"], allow_redirects=False)
+    callback = urlsplit(response.headers["Location"])
+    response = client.get(f"{callback.path}?{callback.query}")
+    assert response["Location"] == "/success"
+    assert client.session["cdt_identity"]["verified_claims"] == {"claim1": True}
+    # only a handle to the id_token is kept in the session
+    assert "token" not in client.session["cdt_identity"]
+
+    response = client.get(reverse(Routes.route_logout))
+    assert response["Location"].startswith(f"{gateway.authority}/logout?id_token_hint=ey")
+
+
+@pytest.mark.django_db
+def test_views_circuit_open(client, gateway, stub_transport, stub_session):
+    # not served from cached metadata, e.g. saved by a slower hedged call from another test
+    metadata_store.clear(gateway.authority)
+    breaker.clear(gateway.authority)
+    breaker._open(gateway.authority)
+    try:
+        response = client.get(reverse(Routes.route_login))
+    finally:
+        breaker.clear(gateway.authority)
+
+    assert response["Location"] == "/fail"
+
+
+@pytest.fixture
+def served(socket_enabled, gateway):
+    """Serve the stub gateway over HTTP, so that calls to it time out like calls to a real one."""
+    server = gateway.serve()
+    yield server
+    server.stop()
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("served")
+def test_views_slow_gateway(settings, client, gateway, stub_session):
+    settings.CDT_IDENTITY_REQUEST_DEADLINE = 0.5
+    gateway.latency = 2
+
+    start = time.monotonic()
+    response = client.get(reverse(Routes.route_login))
+
+    assert response["Location"] == "/fail"
+    assert time.monotonic() - start < 1.5
+
+
+@pytest.mark.django_db
+def test_views_gateway_down(served, client, stub_session):
+    served.stop()
+
+    response = client.get(reverse(Routes.route_login))
+
+    assert response["Location"] == "/fail"
+
+
+@pytest.mark.django_db
+def test_views_repeated_callback(client, gateway, http, stub_transport, stub_session):
+    cache.clear()
+    response = client.get(reverse(Routes.route_login))
+    response = http.get(response["Location"], allow_redirects=False)
+    callback = urlsplit(response.headers["Location"])
+
+    first = client.get(f"{callback.path}?{callback.query}")
+    # the code was used, exchanging it again would fail
+    repeat = client.get(f"{callback.path}?{callback.query}")
+
+    assert first["Location"] == repeat["Location"] == "/success"
+    assert client.session["cdt_identity"]["verified_claims"] == {"claim1": True}
@@ -0,0 +1,100 @@
+from datetime import timedelta
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.utils import timezone
+
+from cdt_identity.models import IdToken
+from cdt_identity.tokens import IdTokenStore
+
+
+@pytest.fixture
+def store():
+    return IdTokenStore()
+
+
+@pytest.mark.django_db
+def test_put_get(store):
+    handle = store.put("header.payload.signature")
+
+    assert len(handle) < 30
+    assert store.get(handle) == "header.payload.signature"
+
+
+@pytest.mark.django_db
+def test_put_expires(settings, store):
+    settings.CDT_IDENTITY_ID_TOKEN_TTL = 60
+
+    handle = store.put("token")
+
+    expires = IdToken.objects.get(handle=handle).expires
+    assert timezone.now() + timedelta(seconds=55) < expires <= timezone.now() + timedelta(seconds=60)
+
+
+@pytest.mark.django_db
+def test_put_expires_session_age(settings, store):
+    settings.SESSION_COOKIE_AGE = 120
+
+    handle = store.put("token")
+
+    assert IdToken.objects.get(handle=handle).expires <= timezone.now() + timedelta(seconds=120)
+
+
+@pytest.mark.django_db
+def test_get_unknown(store):
+    assert store.get("unknown") == ""
+
+
+@pytest.mark.django_db
+def test_get_expired(store):
+    handle = store.put("token")
+    IdToken.objects.filter(handle=handle).update(expires=timezone.now() - timedelta(seconds=1))
+
+    assert store.get(handle) == ""
+
+
+@pytest.mark.django_db
+def test_exists(store):
+    handle = store.put("token")
+    assert store.exists(handle)
+    assert not store.exists("unknown")
+
+    IdToken.objects.filter(handle=handle).update(expires=timezone.now() - timedelta(seconds=1))
+
+    assert not store.exists(handle)
+
+
+@pytest.mark.django_db
+def test_delete(store):
+    handle = store.put("token")
+
+    store.delete(handle)
+    store.delete(handle)
+
+    assert store.get(handle) == ""
+
+
+@pytest.mark.django_db
+def test_async(store):
+    handle = async_to_sync(store.aput)("token")
+
+    assert async_to_sync(store.aget)(handle) == "token"
+
+    async_to_sync(store.adelete)(handle)
+
+    assert async_to_sync(store.aget)(handle) == ""
+
+
+@pytest.mark.django_db
+def test_purge(store, django_assert_num_queries):
+    now = timezone.now()
+    IdToken.objects.bulk_create(
+        [IdToken(handle=f"expired{i}", token="token", expires=now - timedelta(seconds=1)) for i in range(5)]
+        + [IdToken(handle="live", token="token", expires=now + timedelta(hours=1))]
+    )
+
+    # 3 batches and the select finding none left
+    with django_assert_num_queries(7):
+        assert store.purge(batch_size=2, now=now) == 5
+
+    assert list(IdToken.objects.values_list("handle", flat=True)) == ["live"]
@@ -0,0 +1,128 @@
+import sys
+from urllib.parse import urlsplit
+
+import pytest
+from django.urls import reverse
+from opentelemetry import trace
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from cdt_identity import tracing
+from cdt_identity.routes import Routes
+from cdt_identity.tracing import NoopTracer, OpenTelemetryTracer, record_response, set_attributes, span, tracer
+
+_exporter = InMemorySpanExporter()
+
+
+@pytest.fixture(scope="module", autouse=True)
+def tracer_provider():
+    # OpenTelemetry's global provider can only be set once per process
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(_exporter))
+    trace.set_tracer_provider(provider)
+    return provider
+
+
+@pytest.fixture
+def exporter():
+    _exporter.clear()
+    yield _exporter
+    _exporter.clear()
+
+
+class ListTracer(NoopTracer):
+    pass
+
+
+def test_tracer():
+    assert isinstance(tracer(), OpenTelemetryTracer)
+    assert tracer() is tracer()
+
+
+def test_tracer_disabled(settings):
+    settings.CDT_IDENTITY_TRACING_ENABLED = False
+
+    assert isinstance(tracer(), NoopTracer)
+
+
+def test_tracer_custom(settings):
+    settings.CDT_IDENTITY_TRACER = "tests.test_tracing.ListTracer"
+
+    assert isinstance(tracer(), ListTracer)
+
+
+def test_tracer_not_installed(mocker):
+    mocker.patch.dict(sys.modules, {"opentelemetry": None})
+    mocker.patch.dict(tracing._tracers, clear=True)
+
+    assert isinstance(tracer(), NoopTracer)
+
+
+def test_span(exporter):
+    with span("name", {"key": "value", "none": None}):
+        set_attributes({tracing.AUTHORITY: "https://example.com"})
+
+    (finished,) = exporter.get_finished_spans()
+    assert finished.name == "cdt_identity.name"
+    assert dict(finished.attributes) == {"key": "value", tracing.AUTHORITY: "https://example.com"}
+
+
+def test_span_disabled(settings, exporter):
+    settings.CDT_IDENTITY_TRACING_ENABLED = False
+
+    with span("name"):
+        set_attributes({"key": "value"})
+
+    assert exporter.get_finished_spans() == ()
+
+
+def test_cache_result(exporter):
+    with span("name"):
+        tracing.cache_result("metadata", True)
+        tracing.cache_result("jwks", False)
+
+    (finished,) = exporter.get_finished_spans()
+    assert finished.attributes["cdt_identity.metadata.cache"] == "hit"
+    assert finished.attributes["cdt_identity.jwks.cache"] == "miss"
+
+
+def test_record_response(mocker, exporter):
+    response = mocker.Mock(status_code=201)
+
+    with span("name"):
+        assert record_response(response) is response
+
+    (finished,) = exporter.get_finished_spans()
+    assert finished.attributes[tracing.HTTP_STATUS] == 201
+
+
+@pytest.mark.django_db
+def test_views(client, gateway, http, stub_transport, stub_session, exporter):
+    response = client.get(reverse(Routes.route_login))
+    response = http.get(response["Location"], allow_redirects=False)
+    callback = urlsplit(response.headers["Location"])
+    client.get(f"{callback.path}?{callback.query}")
+    client.get(reverse(Routes.route_logout))
+
+    spans = exporter.get_finished_spans()
+    names = {s.name.removeprefix("cdt_identity.") for s in spans}
+    assert names == {"client", "authorize_redirect", "metadata", "token", "id_token", "claims"}
+
+    client_span = next(s for s in spans if s.name == "cdt_identity.client")
+    assert client_span.attributes[tracing.CLIENT_NAME] == "stub"
+    assert client_span.attributes[tracing.AUTHORITY] == gateway.authority
+    assert client_span.attributes[tracing.SCHEME] == "s"
+    assert client_span.attributes["cdt_identity.client.cache"] in ("hit", "miss")
+
+    token_span = next(s for s in spans if s.name == "cdt_identity.token")
+    assert token_span.attributes[tracing.AUTHORITY] == gateway.authority
+    assert token_span.attributes[tracing.HTTP_STATUS] == 200
+
+    metadata_spans = [s for s in spans if s.name == "cdt_identity.metadata"]
+    assert metadata_spans[0].attributes["cdt_identity.metadata.cache"] == "miss"
+    assert metadata_spans[0].attributes[tracing.HTTP_STATUS] == 200
+    assert metadata_spans[-1].attributes["cdt_identity.metadata.cache"] == "hit"
+
+    id_token_span = next(s for s in spans if s.name == "cdt_identity.id_token")
+    assert id_token_span.attributes["cdt_identity.jwks.cache"] == "miss"
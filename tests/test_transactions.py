@@ -0,0 +1,194 @@
+import pytest
+from django.apps import apps
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.urls import reverse
+
+from cdt_identity import transactions
+from cdt_identity.client import ClientRegistry, create_client
+from cdt_identity.routes import Routes
+from cdt_identity.transactions import CacheTransactionStore
+
+DATA = {"redirect_uri": "https://testserver/authorize", "nonce": "nonce1", "code_verifier": "verifier1"}
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def enabled(settings):
+    settings.CDT_IDENTITY_TRANSACTION_STORE = "cdt_identity.transactions.CacheTransactionStore"
+
+
+@pytest.fixture
+def store():
+    return CacheTransactionStore("client_name_1")
+
+
+@pytest.fixture
+def session(mock_request):
+    return mock_request.session
+
+
+@pytest.mark.django_db
+def test_get_state_data(store, session):
+    session.modified = False
+    store.set_state_data(session, "state1", DATA)
+
+    assert store.get_state_data(session, "state1") == DATA
+    assert not session.modified
+
+
+@pytest.mark.django_db
+def test_get_state_data_consumed(store, session):
+    store.set_state_data(session, "state1", DATA)
+    store.get_state_data(session, "state1")
+
+    assert store.get_state_data(session, "state1") is None
+
+
+@pytest.mark.django_db
+def test_get_state_data_unknown(store, session):
+    assert store.get_state_data(session, "state1") is None
+    assert store.get_state_data(session, None) is None
+
+
+@pytest.mark.django_db
+def test_get_state_data_other_client(store, session):
+    store.set_state_data(session, "state1", DATA)
+
+    assert CacheTransactionStore("client_name_2").get_state_data(session, "state1") is None
+
+
+@pytest.mark.django_db
+def test_get_state_data_other_session(store, session):
+    store.set_state_data(session, "state1", DATA)
+    other = session.__class__()
+    other.save()
+
+    assert store.get_state_data(other, "state1") is None
+    # and the state is left for the session it belongs to
+    assert store.get_state_data(session, "state1") == DATA
+
+
+@pytest.mark.django_db
+def test_set_state_data_new_session(store, session):
+    session = session.__class__()
+
+    store.set_state_data(session, "state1", DATA)
+
+    assert session.session_key is not None
+    assert store.get_state_data(session, "state1") == DATA
+
+
+@pytest.mark.django_db
+def test_get_state_data_no_session(store, session):
+    store.set_state_data(session, "state1", DATA)
+
+    assert store.get_state_data(session.__class__(), "state1") is None
+    assert store.get_state_data(session, "state1") == DATA
+
+
+@pytest.mark.django_db
+def test_aset_state_data_new_session(store, session):
+    session = session.__class__()
+
+    async_to_sync(store.aset_state_data)(session, "state1", DATA)
+
+    assert async_to_sync(store.aget_state_data)(session, "state1") == DATA
+
+
+@pytest.mark.django_db
+def test_get_state_data_lost_race(mocker, store, session):
+    store.set_state_data(session, "state1", DATA)
+    # another request consumed the state between this one's get and delete
+    mocker.patch.object(transactions.shared_cache, "delete", return_value=False)
+
+    assert store.get_state_data(session, "state1") is None
+
+
+@pytest.mark.django_db
+def test_set_state_data_ttl(mocker, settings, store, session):
+    settings.CDT_IDENTITY_TRANSACTION_TTL = 30
+    spy = mocker.spy(transactions.shared_cache, "set")
+
+    store.set_state_data(session, "state1", DATA)
+
+    assert spy.call_args.kwargs["timeout"] == 30
+
+
+@pytest.mark.django_db
+def test_clear_state_data(store, session):
+    store.set_state_data(session, "state1", DATA)
+    store.clear_state_data(session, "state1")
+    store.clear_state_data(session, "state1")
+
+    assert store.get_state_data(session, "state1") is None
+
+
+@pytest.mark.django_db
+def test_aget_state_data(store, session):
+    async_to_sync(store.aset_state_data)(session, "state1", DATA)
+
+    assert async_to_sync(store.aget_state_data)(session, "state1") == DATA
+    assert async_to_sync(store.aget_state_data)(session, "state1") is None
+    async_to_sync(store.aclear_state_data)(session, "state1")
+
+
+@pytest.mark.django_db
+def test_create_client_uses_store(mocker):
+    config = mocker.Mock(client_name="name", authority="https://example.com", authorities=["https://example.com"])
+
+    client = create_client(ClientRegistry(), config, "scopes", "scheme")
+
+    assert isinstance(client.framework, CacheTransactionStore)
+
+
+@pytest.mark.django_db
+def test_create_client_session_store(mocker, settings):
+    settings.CDT_IDENTITY_TRANSACTION_STORE = None
+    config = mocker.Mock(client_name="name", authority="https://example.com", authorities=["https://example.com"])
+
+    client = create_client(ClientRegistry(), config, "scopes", "scheme")
+
+    assert not isinstance(client.framework, CacheTransactionStore)
+
+
+@pytest.mark.django_db
+def test_views_login_no_session_write(client, stub_transport, stub_session):
+    session_before = dict(client.session)
+
+    response = client.get(reverse(Routes.route_login))
+
+    assert response.status_code == 302
+    assert dict(client.session) == session_before
+
+
+def test_ready_warns_local_cache(mocker):
+    logger = mocker.patch("cdt_identity.apps.logger")
+
+    apps.get_app_config("cdt_identity").ready()
+
+    logger.warning.assert_called_once()
+
+
+def test_ready_shared_cache(mocker, settings):
+    settings.CACHES = {"default": {"BACKEND": "django.core.cache.backends.db.DatabaseCache", "LOCATION": "cache"}}
+    logger = mocker.patch("cdt_identity.apps.logger")
+
+    apps.get_app_config("cdt_identity").ready()
+
+    logger.warning.assert_not_called()
+
+
+def test_ready_session_store(mocker, settings):
+    settings.CDT_IDENTITY_TRANSACTION_STORE = None
+    logger = mocker.patch("cdt_identity.apps.logger")
+
+    apps.get_app_config("cdt_identity").ready()
+
+    logger.warning.assert_not_called()
@@ -0,0 +1,131 @@
+import asyncio
+
+import httpx
+import pytest
+import requests
+from asgiref.sync import async_to_sync
+
+from cdt_identity.transport import PooledAdapter, PooledAsyncTransport, Transport
+
+
+@pytest.fixture
+def transport():
+    transport = Transport()
+    yield transport
+    transport.close()
+
+
+def test_timeout(settings, transport):
+    settings.CDT_IDENTITY_HTTP_CONNECT_TIMEOUT = 1
+    settings.CDT_IDENTITY_HTTP_READ_TIMEOUT = 2
+
+    assert transport.timeout() == (1, 2)
+
+
+def test_adapter(settings, transport):
+    settings.CDT_IDENTITY_HTTP_POOL_AUTHORITIES = 3
+    settings.CDT_IDENTITY_HTTP_POOL_MAX_CONNECTIONS = 7
+
+    adapter = transport.adapter()
+
+    assert isinstance(adapter, PooledAdapter)
+    assert adapter is transport.adapter()
+    assert adapter._pool_connections == 3
+    assert adapter._pool_maxsize == 7
+
+
+def test_mount(transport):
+    session = transport.mount(requests.Session())
+
+    assert session.get_adapter("https://example.com") is transport.adapter()
+    assert session.get_adapter("http://localhost") is transport.adapter()
+
+
+def test_session_shared(transport):
+    session = transport.session()
+
+    assert session is transport.session()
+    assert session.get_adapter("https://example.com") is transport.adapter()
+
+
+def test_adapter_survives_session_close(mocker, transport):
+    adapter = transport.adapter()
+    spy = mocker.spy(adapter.poolmanager, "clear")
+
+    with transport.mount(requests.Session()):
+        pass
+
+    spy.assert_not_called()
+
+
+def test_close(mocker, transport):
+    adapter = transport.adapter()
+    spy = mocker.spy(adapter.poolmanager, "clear")
+
+    transport.close()
+
+    spy.assert_called_once()
+    assert transport.adapter() is not adapter
+
+
+def test_async_transport(settings, transport):
+    settings.CDT_IDENTITY_HTTP_POOL_MAX_CONNECTIONS = 7
+
+    async_transport = transport.async_transport()
+
+    assert isinstance(async_transport, PooledAsyncTransport)
+    assert async_transport is transport.async_transport()
+
+
+def test_async_transport_survives_client_close(mocker, transport):
+    spy = mocker.spy(httpx.AsyncHTTPTransport, "aclose")
+
+    async def use_client():
+        async with transport.async_client():
+            pass
+
+    async_to_sync(use_client)()
+
+    spy.assert_not_called()
+
+
+def test_async_transport_per_event_loop(transport):
+    async_transport = transport.async_transport()
+
+    async def current():
+        return async_transport.transport
+
+    async def same():
+        return async_transport.transport is async_transport.transport
+
+    first, second = asyncio.run(current()), asyncio.run(current())
+
+    assert first is not second
+    assert asyncio.run(same())
+
+
+def test_async_transport_across_event_loops(socket_enabled, gateway, transport):
+    server = gateway.serve()
+
+    async def get():
+        async with transport.async_client() as client:
+            return (await client.get(f"{gateway.authority}/.well-known/openid-configuration")).status_code
+
+    try:
+        # pooled connections from a closed loop are not reused
+        assert [asyncio.run(get()) for _ in range(3)] == [200, 200, 200]
+    finally:
+        server.stop()
+
+
+def test_async_transport_shutdown(mocker, transport):
+    async_transport = transport.async_transport()
+    spy = mocker.spy(httpx.AsyncHTTPTransport, "aclose")
+
+    async def shutdown():
+        first = async_transport.transport
+        await async_transport.shutdown()
+        return first is not async_transport.transport
+
+    assert asyncio.run(shutdown())
+    spy.assert_called_once()
@@ -1,6 +1,25 @@
-from cdt_identity import urls, views
+from importlib import reload
+
+from cdt_identity import async_views, urls, views
 
 
 def test_endpoints_view():
     for endpoint in urls.endpoints_view:
         assert hasattr(views, endpoint)
+
+
+def test_endpoints_async_view():
+    for endpoint in urls.endpoints_view:
+        assert hasattr(async_views, endpoint)
+
+
+def test_async_views_setting(settings):
+    settings.CDT_IDENTITY_ASYNC_VIEWS = True
+    try:
+        reload(urls)
+        patterns = {pattern.name: pattern.callback for pattern in urls.urlpatterns}
+        for endpoint in urls.endpoints_view:
+            assert patterns[endpoint] is getattr(async_views, endpoint)
+    finally:
+        settings.CDT_IDENTITY_ASYNC_VIEWS = False
+        reload(urls)
@@ -1,8 +1,11 @@
 import re
+import time
 
 import pytest
 from django.http import HttpResponse
 
+from cdt_identity import resilience
+from cdt_identity.resilience import CircuitOpen
 from cdt_identity.routes import Routes
 from cdt_identity.session import Session
 from cdt_identity.views import _client_or_error_redirect, authorize, login, logout
@@ -65,7 +68,7 @@ def test_authorize_success(mocker, mock_oauth_client, mock_request, mock_session
     }
     mock_session.oidc_expected_claims = "claim1 claim2"
     mock_session.oidc_eligibility_claims = "claim1"
-    mock_session.oidc_claims_authorize_success = "/success"
+    mock_session.oidc_authorize_success = "/success"
     mock_redirect = mocker.patch("cdt_identity.views.redirect")
 
     authorize(mock_request)
@@ -111,7 +114,7 @@ def test_authorize_no_expected_claims(mocker, mock_oauth_client, mock_request, m
     }
     mock_session.oidc_expected_claims = ""
     mock_session.oidc_eligibility_claims = "claim1"
-    mock_session.oidc_claims_authorize_fail = "/fail"
+    mock_session.oidc_authorize_fail = "/fail"
     mock_redirect = mocker.patch("cdt_identity.views.redirect")
 
     authorize(mock_request)
@@ -128,7 +131,7 @@ def test_authorize_no_token_claims(mocker, mock_oauth_client, mock_request, mock
     }
     mock_session.oidc_expected_claims = "claim1 claim2"
     mock_session.oidc_eligibility_claims = "claim1"
-    mock_session.oidc_claims_authorize_fail = "/fail"
+    mock_session.oidc_authorize_fail = "/fail"
     mock_redirect = mocker.patch("cdt_identity.views.redirect")
 
     authorize(mock_request)
@@ -145,7 +148,7 @@ def test_authorize_token_error_claims(mocker, mock_oauth_client, mock_request, m
     }
     mock_session.oidc_expected_claims = "claim1 claim2"
     mock_session.oidc_eligibility_claims = "claim1"
-    mock_session.oidc_claims_authorize_fail = "/fail"
+    mock_session.oidc_authorize_fail = "/fail"
     mock_redirect = mocker.patch("cdt_identity.views.redirect")
 
     authorize(mock_request)
@@ -157,12 +160,13 @@ def test_authorize_token_error_claims(mocker, mock_oauth_client, mock_request, m
 @pytest.mark.usefixtures("mock_client_or_error_redirect")
 def test_login_success(mocker, mock_oauth_client, mock_request):
     mock_oauth_client.authorize_redirect.return_value = HttpResponse(status=200)
-    mock_reverse = mocker.patch("cdt_identity.views.reverse", return_value="authorize")
+    mock_redirect_uri = mocker.patch("cdt_identity.views.redirects.redirect_uri", return_value="https://testserver/authorize")
 
     response = login(mock_request)
 
     assert response.status_code == 200
-    mock_reverse.assert_called_once_with(Routes.route_authorize)
+    mock_redirect_uri.assert_called_once_with(mock_request, Routes.route_authorize)
+    mock_oauth_client.authorize_redirect.assert_called_once_with(mock_request, "https://testserver/authorize")
 
 
 @pytest.mark.django_db
@@ -215,13 +219,12 @@ def test_login_authorize_redirect_error_response(mock_oauth_client, mock_request
 def test_logout(mocker, mock_request, mock_session):
     mock_redirects = mocker.patch("cdt_identity.views.redirects")
     mock_redirects.deauthorize_redirect.return_value = HttpResponse(status=200)
-    mock_reverse = mocker.patch("cdt_identity.views.reverse", return_value="deauthorize")
 
     response = logout(mock_request)
 
     assert response.status_code == 200
     mock_redirects.deauthorize_redirect.assert_called_once()
-    mock_reverse.assert_called_once_with(Routes.route_post_logout)
+    mock_redirects.redirect_uri.assert_called_once_with(mock_request, Routes.route_post_logout)
     mock_session.clear_oidc_token.assert_called_once()
 
 
@@ -235,3 +238,46 @@ def test_logout_no_client(mocker, mock_client_or_error_redirect, mock_request):
 
     assert response == error_redirect
     assert response == error_redirect
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("mock_client_or_error_redirect")
+def test_authorize_gateway_unavailable(mock_oauth_client, mock_request, mock_session):
+    mock_session.oidc_authorize_fail = "/fail"
+    mock_oauth_client.authorize_access_token.side_effect = CircuitOpen("https://example.com")
+
+    response = authorize(mock_request)
+
+    assert response.status_code == 302
+    assert response.url == "/fail"
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("mock_client_or_error_redirect")
+def test_login_deadline_exceeded(mock_oauth_client, mock_request, mock_session, settings):
+    settings.CDT_IDENTITY_REQUEST_DEADLINE = 0.01
+    mock_session.oidc_config = None
+    mock_session.oidc_authorize_fail = "/fail"
+
+    def authorize_redirect(request, redirect_uri):
+        time.sleep(0.02)
+        resilience.check()
+
+    mock_oauth_client.authorize_redirect.side_effect = authorize_redirect
+
+    response = login(mock_request)
+
+    assert response.url == "/fail"
+
+
+@pytest.mark.django_db
+def test_login_rate_limited(mocker, mock_client_or_error_redirect, mock_request, mock_session):
+    mock_admit = mocker.patch("cdt_identity.views.ratelimit.admit", return_value=1.5)
+
+    response = login(mock_request)
+
+    assert response.status_code == 429
+    assert response["Retry-After"] == "2"
+    assert b'content="2;url=/some/arbitrary/path"' in response.content
+    mock_admit.assert_called_once_with(mock_session.oidc_config)
+    mock_client_or_error_redirect.assert_not_called()
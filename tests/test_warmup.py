@@ -0,0 +1,111 @@
+import threading
+
+import pytest
+from django.apps import apps
+from django.db import DatabaseError
+
+from cdt_identity.async_client import AsyncOAuth2App
+from cdt_identity.client import oauth
+from cdt_identity.jwks import key_sets
+from cdt_identity.metadata import metadata_store
+from cdt_identity.models import ClientConfig
+from cdt_identity.warmup import ERROR, OK, TIMEOUT, warm_up, warm_up_in_background
+
+
+@pytest.fixture
+def config(gateway):
+    return ClientConfig.objects.create(client_name="stub", client_id="client", authority=gateway.authority, scheme="s")
+
+
+@pytest.mark.django_db
+def test_warm_up(gateway, stub_transport, config):
+    results = warm_up()
+
+    assert results == {"clients": 1, "authorities": {gateway.authority: OK}}
+    assert len(oauth) == 1
+    assert gateway.authority in metadata_store._local
+    assert key_sets._cached(gateway.authority, gateway.key.kid) is not None
+
+
+@pytest.mark.django_db
+def test_warm_up_scopes(settings, gateway, stub_transport, config):
+    settings.CDT_IDENTITY_WARMUP_SCOPES = {"stub": ["profile", "", "profile"], "other": ["email"]}
+
+    warm_up()
+
+    assert len(oauth) == 2
+    assert {key[3] for key in oauth._clients} == {"", "profile"}
+
+
+@pytest.mark.django_db
+def test_warm_up_async_views(settings, gateway, stub_transport, config):
+    settings.CDT_IDENTITY_ASYNC_VIEWS = True
+
+    warm_up()
+
+    assert [key[0] for key in oauth._clients] == [AsyncOAuth2App]
+
+
+@pytest.mark.django_db
+def test_warm_up_no_configs():
+    assert warm_up() == {"clients": 0, "authorities": {}}
+
+
+@pytest.mark.django_db
+def test_warm_up_error(gateway, stub_transport, config):
+    gateway.failure_rate = 1
+
+    results = warm_up()
+
+    assert results["authorities"] == {gateway.authority: ERROR}
+    # the client is still registered
+    assert len(oauth) == 1
+
+
+@pytest.mark.django_db
+def test_warm_up_budget(mocker, gateway, stub_transport, config):
+    release = threading.Event()
+    mocker.patch("cdt_identity.warmup._prefetch", side_effect=lambda authority: release.wait(5))
+
+    try:
+        results = warm_up(budget=0.01)
+    finally:
+        release.set()
+
+    assert results["authorities"] == {gateway.authority: TIMEOUT}
+
+
+def test_warm_up_in_background(mocker):
+    warm_up = mocker.patch("cdt_identity.warmup.warm_up", return_value={"clients": 0, "authorities": {}})
+
+    warm_up_in_background().join(5)
+
+    warm_up.assert_called_once_with()
+
+
+def test_warm_up_in_background_closes_connection(mocker):
+    mocker.patch("cdt_identity.warmup.warm_up", return_value={"clients": 0, "authorities": {}})
+    connection = mocker.patch("cdt_identity.warmup.connection")
+
+    warm_up_in_background().join(5)
+
+    connection.close.assert_called_once_with()
+
+
+def test_warm_up_in_background_database_error(mocker):
+    mocker.patch("cdt_identity.warmup.warm_up", side_effect=DatabaseError())
+
+    thread = warm_up_in_background()
+    thread.join(5)
+
+    assert not thread.is_alive()
+
+
+@pytest.mark.parametrize("enabled", [True, False])
+def test_ready(mocker, settings, enabled):
+    settings.CDT_IDENTITY_WARMUP_ON_STARTUP = enabled
+    background = mocker.patch("cdt_identity.warmup.warm_up_in_background")
+
+    apps.get_app_config("cdt_identity").ready()
+
+    assert background.called is enabled